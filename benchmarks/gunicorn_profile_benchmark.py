@@ -0,0 +1,113 @@
+"""
+Boot time and per-worker memory of gunicorn under the dev profile (every worker imports the app)
+and the prod profile (the master preloads it and freezes its objects before forking).
+
+    python -m benchmarks.gunicorn_profile_benchmark [--workers 4] [--requests 400] [--profile dev --profile prod ...]
+
+Each run starts `gunicorn -c gunicorn_config.py core.server:app` on the app's database and times it
+until every worker logged that it is initialized. It then sends listing requests from as many
+threads as there are workers, and reads every worker's memory from /proc (Linux only):
+RSS, PSS (shared pages divided among the processes sharing them) and the private pages.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_INITIALIZED = re.compile(r'Worker initialized \(pid: (\d+)\)')
+PRINCIPAL = json.dumps({'principal_id': 1, 'user_id': 5})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory_kib(pid):
+    """RSS, PSS and private KiB of a process"""
+    fields = {}
+    with open('/proc/{0}/smaps_rollup'.format(pid)) as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0])
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+
+def send_requests(port, count, concurrency):
+    def get(index):
+        request = urllib.request.Request(
+            'http://127.0.0.1:{0}/principal/assignments?limit=50&content=preview&n={1}'.format(port, index),
+            headers={'X-Principal': PRINCIPAL},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(get, range(count)))
+
+
+def run(profile, workers, requests):
+    port = free_port()
+    env = dict(
+        os.environ, APP_ENV=profile, GUNICORN_PORT=str(port), GUNICORN_NUMBER_WORKERS=str(workers),
+        GUNICORN_LOG_LEVEL='info',
+    )
+    with tempfile.TemporaryFile() as log:
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'core.server:app'],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            while True:
+                if server.poll() is not None:
+                    log.seek(0)
+                    raise RuntimeError('gunicorn exited:\n' + log.read().decode(errors='replace'))
+                log.seek(0)
+                worker_pids = [int(pid) for pid in WORKER_INITIALIZED.findall(log.read().decode(errors='replace'))]
+                if len(worker_pids) >= workers:
+                    break
+                time.sleep(0.01)
+            boot_seconds = time.perf_counter() - started
+
+            send_requests(port, requests, workers)
+            master = memory_kib(server.pid)
+            per_worker = [memory_kib(pid) for pid in worker_pids]
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return boot_seconds, master, per_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--profile', action='append', choices=('dev', 'prod'))
+    args = parser.parse_args()
+
+    print('{0} workers, {1} requests'.format(args.workers, args.requests))
+    print('{0:<8}{1:>10}{2:>14}{3:>14}{4:>14}{5:>14}{6:>14}'.format(
+        'profile', 'boot s', 'master RSS', 'worker RSS', 'worker PSS', 'worker priv', 'total PSS'
+    ))
+    for profile in args.profile or ['dev', 'prod']:
+        boot_seconds, master, per_worker = run(profile, args.workers, args.requests)
+        mean = [sum(values) / len(per_worker) / 1024 for values in zip(*per_worker)]
+        total_pss = (master[1] + sum(pss for _, pss, _ in per_worker)) / 1024
+        print('{0:<8}{1:>10.2f}{2:>10.1f} MiB{3:>10.1f} MiB{4:>10.1f} MiB{5:>10.1f} MiB{6:>10.1f} MiB'.format(
+            profile, boot_seconds, master[0] / 1024, mean[0], mean[1], mean[2], total_pss
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Rows per second and peak memory of reading a principal listing, from the query to the dumped dicts.
+
+    python -m benchmarks.listing_benchmark [--rows 20000] [--repeat 5]
+
+Compares loading Assignment instances through the ORM (the listings before AssignmentRecord),
+with their contents selected in, against the Core select of AssignmentRecords the listings use.
+The rows are inserted into the configured database inside a transaction that is rolled back.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import selectinload
+from core import db
+from core.apis.assignments import serializer
+from core.models.assignments import Assignment, AssignmentStateEnum, ContentModeEnum, GradeEnum
+from core.server import app
+
+
+def make_rows(count):
+    created_at = datetime(2021, 9, 17, 3, 14, 1, 580126)
+    return [
+        {
+            'student_id': 1 + _id % 2, 'teacher_id': 1 + _id % 2, 'content': 'ESSAY {0} '.format(_id) * 50,
+            'state': AssignmentStateEnum.GRADED, 'grade': list(GradeEnum)[_id % 4],
+            'created_at': created_at, 'updated_at': created_at + timedelta(seconds=_id)
+        }
+        for _id in range(count)
+    ]
+
+
+def orm_listing():
+    db.session.expunge_all()
+    assignments = Assignment.query_by_principal().order_by(Assignment.updated_at, Assignment.id).options(
+        selectinload(Assignment._content)
+    ).all()
+    return [serializer.dump(assignment) for assignment in assignments]
+
+
+def record_listing():
+    db.session.expunge_all()
+    return serializer.dump_many(Assignment.get_page(Assignment.query_by_principal(), content_mode=ContentModeEnum.FULL))
+
+
+def measure(listing, repeat):
+    """(best rows per second, peak bytes allocated while reading and dumping)"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(listing())
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    listing()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows / best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            Assignment.insert_many(make_rows(args.rows))
+            db.session.flush()
+            assert record_listing() == orm_listing()
+
+            print('{0} more rows, best of {1}'.format(args.rows, args.repeat))
+            for name, listing in [('ORM Assignments', orm_listing), ('AssignmentRecords', record_listing)]:
+                rows_per_second, peak = measure(listing, args.repeat)
+                print('{0:<20} {1:>10,.0f} rows/s {2:>8.1f} MiB peak'.format(name, rows_per_second, peak / 2 ** 20))
+        finally:
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
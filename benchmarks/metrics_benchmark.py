@@ -0,0 +1,53 @@
+"""
+Cost of the request metrics: requests per second of the same listing with METRICS_ENABLED on and off.
+
+    python -m benchmarks.metrics_benchmark [--requests 3000] [--limit 10]
+
+Both apps run on the app's database with the response cache off, so every request authenticates,
+reads its page and serializes it. The metrics files go to a temporary directory.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+PRINCIPAL = json.dumps({'principal_id': 1, 'user_id': 5})
+
+
+def requests_per_second(app, requests, limit):
+    client = app.test_client()
+    headers = {'X-Principal': PRINCIPAL}
+    for _ in range(100):
+        client.get('/principal/assignments', headers=headers, query_string={'limit': limit})
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/principal/assignments', headers=headers, query_string={'limit': limit})
+        assert response.status_code == 200
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='fyle-metrics-benchmark-')
+    from core import create_app  # pylint: disable=import-outside-toplevel
+    from core.config import load_config  # pylint: disable=import-outside-toplevel
+
+    rates = {}
+    for enabled in ('false', 'true', 'false', 'true'):
+        app = create_app(load_config(dict(os.environ, METRICS_ENABLED=enabled, RESPONSE_CACHE_BACKEND='null')))
+        rate = requests_per_second(app, args.requests, args.limit)
+        rates[enabled] = max(rates.get(enabled, 0), rate)
+
+    print('{0:<10}{1:>14}{2:>14}'.format('metrics', 'requests/s', 'us/request'))
+    for enabled, label in (('false', 'off'), ('true', 'on')):
+        print('{0:<10}{1:>14.0f}{2:>14.1f}'.format(label, rates[enabled], 1e6 / rates[enabled]))
+    print('overhead: {0:.1f} us/request'.format(1e6 / rates['true'] - 1e6 / rates['false']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Rows per second of the assignment listing serialization, from the rows to the response bytes.
+
+    python -m benchmarks.serializer_benchmark [--rows 20000] [--repeat 5]
+
+Compares the marshmallow schema the student and principal endpoints used, the hand built dicts
+teacher.py used, and the shared precompiled serializer dumping AssignmentRecords with the standard
+library and the orjson encoder (when installed). The rows are built in memory, no database is needed,
+see benchmarks.listing_benchmark for reading them.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+from flask import jsonify
+from core.apis import responses
+from core.apis.assignments import serializer
+from core.apis.assignments.schema import AssignmentSchema
+from core.models.assignments import Assignment, AssignmentRecord, AssignmentStateEnum, GradeEnum
+from core.server import app
+
+
+def make_assignments(count):
+    created_at = datetime(2021, 9, 17, 3, 14, 1, 580126)
+    return [
+        Assignment(
+            id=_id, student_id=1 + _id % 2, teacher_id=1 + _id % 2, content='ESSAY {0} '.format(_id) * 50,
+            state=AssignmentStateEnum.GRADED, grade=list(GradeEnum)[_id % 4],
+            created_at=created_at, updated_at=created_at + timedelta(seconds=_id)
+        )
+        for _id in range(1, count + 1)
+    ]
+
+
+def make_records(assignments):
+    return [
+        AssignmentRecord(
+            assignment.id, assignment.created_at, assignment.updated_at, assignment.grade, assignment.state,
+            assignment.student_id, assignment.teacher_id, assignment.content
+        )
+        for assignment in assignments
+    ]
+
+
+def schema_listing(assignments):
+    return jsonify(data=AssignmentSchema().dump(assignments, many=True), next_cursor=None).get_data()
+
+
+def teacher_listing(assignments):
+    return jsonify({
+        "data": [
+            {
+                "id": assignment.id,
+                "content": assignment.content,
+                "grade": assignment.grade,
+                "state": assignment.state,
+                "student_id": assignment.student_id,
+                "teacher_id": assignment.teacher_id,
+                "created_at": assignment.created_at.isoformat(),
+                "updated_at": assignment.updated_at.isoformat()
+            }
+            for assignment in assignments
+        ],
+        "next_cursor": None
+    }).get_data()
+
+
+def serializer_listing(records):
+    return responses.APIResponse.respond(data=serializer.dump_many(records), next_cursor=None).get_data()
+
+
+def serializer_stdlib_listing(records):
+    with mock.patch.object(responses, 'orjson', None):
+        return serializer_listing(records)
+
+
+def rows_per_second(listing, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        listing(rows)
+        best = min(best, time.perf_counter() - started)
+    return len(rows) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    assignments = make_assignments(args.rows)
+    records = make_records(assignments)
+    with app.test_request_context():
+        expected = schema_listing(assignments)
+        candidates = [
+            ('AssignmentSchema + jsonify', schema_listing, assignments),
+            ('teacher.py dicts + jsonify', teacher_listing, assignments),
+            ('serializer + json', serializer_stdlib_listing, records),
+        ]
+        assert serializer_stdlib_listing(records) == expected
+        if responses.orjson is not None:
+            assert serializer_listing(records) == expected
+            candidates.append(('serializer + orjson', serializer_listing, records))
+
+        print('{0} rows, best of {1}'.format(args.rows, args.repeat))
+        for name, listing, rows in candidates:
+            print('{0:<30} {1:>12,.0f} rows/s'.format(name, rows_per_second(listing, rows, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Throughput and p99 latency of concurrent readers and writers under each SQLite PRAGMA profile.
+
+    python -m benchmarks.sqlite_profile_benchmark [--rows 20000] [--readers 4] [--writers 2] [--seconds 5]
+                                                  [--profile wal --profile default ...]
+
+Every profile gets a fresh database file holding the assignments table and indexes of the app.
+Reader processes read principal listing pages from a random point of the (updated_at, id) key and
+writer processes grade random assignments, one transaction each, the way gunicorn workers would.
+Statements failing with "database is locked" are counted as errors.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects import sqlite as sqlite_dialect
+from sqlalchemy.schema import CreateIndex, CreateTable
+from core.libs import sqlite
+from core.models.assignments import Assignment
+
+PAGE_SIZE = 100
+START = datetime(2021, 9, 17, 3, 14, 1)
+
+LISTING_PAGE = (
+    "SELECT id, created_at, updated_at, grade, state, student_id, teacher_id FROM assignments "
+    "WHERE state != 'DRAFT' AND updated_at >= ? ORDER BY updated_at, id LIMIT {0}".format(PAGE_SIZE)
+)
+GRADE = (
+    "UPDATE assignments SET grade = ?, state = 'GRADED', updated_at = ?, version = version + 1 "
+    "WHERE id = ? AND state != 'DRAFT'"
+)
+
+
+def create_database(path, rows):
+    table = Assignment.__table__
+    dialect = sqlite_dialect.dialect()
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(str(CreateTable(table).compile(dialect=dialect)))
+        for index in table.indexes:
+            connection.execute(str(CreateIndex(index).compile(dialect=dialect)))
+        connection.executemany(
+            'INSERT INTO assignments (id, student_id, teacher_id, grade, state, created_at, updated_at, version) '
+            'VALUES (?, ?, ?, NULL, ?, ?, ?, 1)',
+            (
+                (_id, 1 + _id % 2, 1 + _id % 2, 'DRAFT' if _id % 5 == 0 else 'SUBMITTED',
+                 START.isoformat(' '), (START + timedelta(seconds=_id)).isoformat(' '))
+                for _id in range(1, rows + 1)
+            )
+        )
+    connection.close()
+
+
+def connect(path, pragmas):
+    # timeout=0 leaves waiting on locks to the profile's busy_timeout
+    connection = sqlite3.connect(path, timeout=0)
+    sqlite.apply_pragmas(connection, pragmas)
+    return connection
+
+
+def read(connection, rows):
+    after = START + timedelta(seconds=random.randint(1, rows))
+    connection.execute(LISTING_PAGE, (after.isoformat(' '),)).fetchall()
+
+
+def write(connection, rows):
+    now = datetime.utcnow().isoformat(' ')
+    connection.execute(GRADE, (random.choice('ABCD'), now, random.randint(1, rows)))
+    connection.commit()
+
+
+def worker(operation, path, pragmas, rows, seconds, barrier, results):
+    connection = connect(path, pragmas)
+    latencies = []
+    errors = 0
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        try:
+            operation(connection, rows)
+        except sqlite3.OperationalError:
+            errors += 1
+            connection.rollback()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put((operation.__name__, latencies, errors))
+
+
+def p99(latencies):
+    if not latencies:
+        return float('nan')
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def run_profile(profile, args):
+    context = multiprocessing.get_context('fork')
+    pragmas = sqlite.get_pragmas(profile)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.sqlite3')
+        create_database(path, args.rows)
+        connect(path, pragmas).close()  # switches the journal mode before the workers connect
+
+        operations = [read] * args.readers + [write] * args.writers
+        barrier = context.Barrier(len(operations))
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(operation, path, pragmas, args.rows, args.seconds, barrier, results))
+            for operation in operations
+        ]
+        for process in processes:
+            process.start()
+        collected = {'read': ([], 0), 'write': ([], 0)}
+        for _ in processes:
+            name, latencies, errors = results.get()
+            collected[name] = (collected[name][0] + latencies, collected[name][1] + errors)
+        for process in processes:
+            process.join()
+    return collected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--profile', action='append', choices=list(sqlite.PROFILES))
+    args = parser.parse_args()
+
+    print('{0} rows, {1} readers, {2} writers, {3:g}s per profile'.format(
+        args.rows, args.readers, args.writers, args.seconds
+    ))
+    print('{0:<12} {1:>10} {2:>12} {3:>10} {4:>12} {5:>8}'.format(
+        'profile', 'reads/s', 'read p99 ms', 'writes/s', 'write p99 ms', 'errors'
+    ))
+    for profile in args.profile or list(sqlite.PROFILES):
+        collected = run_profile(profile, args)
+        (reads, read_errors), (writes, write_errors) = collected['read'], collected['write']
+        print('{0:<12} {1:>10,.0f} {2:>12.2f} {3:>10,.0f} {4:>12.2f} {5:>8}'.format(
+            profile, len(reads) / args.seconds, p99(reads) * 1000,
+            len(writes) / args.seconds, p99(writes) * 1000, read_errors + write_errors
+        ))
+
+
+if __name__ == '__main__':
+    main()
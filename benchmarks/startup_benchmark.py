@@ -0,0 +1,63 @@
+"""
+Startup times of the app's entry points, each measured in fresh interpreters.
+
+    python -m benchmarks.startup_benchmark [--runs 7]
+
+- models: `import core.models.assignments`, what scripts and the migrations pay
+- app: `import core.server`, what a gunicorn worker pays before it accepts requests
+- first request: `import core.server` and answer one listing, what the first client of a worker waits for
+- cli: `flask rebuild-grade-counts --help`, the CLI's app registers the API for `flask routes`
+- migrations: `flask db current`, loads the app for Flask-Migrate and alembic
+
+Times are the median wall clock of --runs runs, with the interpreter's own startup included.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = '''
+import json
+from core.server import app
+response = app.test_client().get(
+    '/principal/assignments?limit=10', headers={'X-Principal': json.dumps({'principal_id': 1, 'user_id': 5})}
+)
+assert response.status_code == 200, response.data
+'''
+
+ENTRY_POINTS = [
+    ('python', [sys.executable, '-c', 'pass']),
+    ('models', [sys.executable, '-c', 'import core.models.assignments']),
+    ('app', [sys.executable, '-c', 'import core.server']),
+    ('first request', [sys.executable, '-c', FIRST_REQUEST]),
+    ('cli', [sys.executable, '-m', 'flask', 'rebuild-grade-counts', '--help']),
+    ('migrations', [sys.executable, '-m', 'flask', 'db', 'current', '-d', 'core/migrations']),
+]
+
+
+def measure(command, runs):
+    env = dict(os.environ, FLASK_APP='core/server.py')
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    print('{0:<16}{1:>12}'.format('entry point', 'median ms'))
+    for name, command in ENTRY_POINTS:
+        print('{0:<16}{1:>12.0f}'.format(name, measure(command, args.runs) * 1000))
+
+
+if __name__ == '__main__':
+    main()
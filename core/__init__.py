@@ -1,23 +1,59 @@
+import os
+import threading
+
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-from sqlite3 import Connection as SQLite3Connection
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///./store.sqlite3'
-app.config['SQLALCHEMY_ECHO'] = False
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-app.test_client()
-
-
-# this is to enforce fk (not done by default in sqlite3)
-@event.listens_for(Engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    if isinstance(dbapi_connection, SQLite3Connection):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.close()
+
+from core.config import load_config
+from core.libs import routing
+
+# GET requests run on a read-only engine, see core.libs.routing. Bound to apps by create_app, the
+# models and the migrations import it without creating any.
+db = routing.RoutingSQLAlchemy()
+
+_api_lock = threading.Lock()
+
+
+def load_api(app):
+    """Registers the blueprints, request hooks and error handler of core.apis.routes on `app`, once"""
+    if 'api' not in app.extensions:
+        with _api_lock:
+            if 'api' not in app.extensions:
+                from core.apis.routes import register_api  # pylint: disable=import-outside-toplevel
+                register_api(app)
+                app.extensions['api'] = True
+
+
+def _loading_api(app, wsgi_app):
+    def load_api_and_respond(environ, start_response):
+        load_api(app)
+        return wsgi_app(environ, start_response)
+    return load_api_and_respond
+
+
+def create_app(config=None):
+    """
+    The Flask app of `config`, by default `load_config()` of the environment. Apps of the flask CLI
+    and of the test profile get the API right away, so `flask routes`, `flask shell` and `url_for`
+    see every endpoint. Other apps (gunicorn's and scripts') only import and register it when the
+    first request comes in: call `load_api` before building URLs outside of a request.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(load_config() if config is None else config)
+    db.init_app(app)
+    from_cli = os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+    if from_cli:
+        # only `flask db` uses Flask-Migrate, the flask CLI imported alembic for it already
+        from flask_migrate import Migrate  # pylint: disable=import-outside-toplevel
+        Migrate(app, db)
+
+    # Register the flask CLI commands (e.g., flask import-assignments)
+    from core import commands  # pylint: disable=import-outside-toplevel
+    app.cli.add_command(commands.import_assignments)
+    app.cli.add_command(commands.rebuild_grade_counts)
+    app.cli.add_command(commands.content_storage_report)
+    app.cli.add_command(commands.profiles)
+
+    app.wsgi_app = _loading_api(app, app.wsgi_app)
+    if from_cli or app.config['APP_ENV'] == 'test':
+        load_api(app)
+    return app
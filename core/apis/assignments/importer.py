@@ -0,0 +1,87 @@
+import json
+from itertools import islice
+
+from flask import current_app
+from marshmallow.exceptions import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from core import db
+from core.models.assignments import Assignment
+from core.models.students import Student
+from core.models.teachers import Teacher
+
+from .schema import AssignmentImportSchema
+
+
+def _numbered_lines(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def _existing_ids(model, ids):
+    ids = {_id for _id in ids if _id is not None}
+    if not ids:
+        return set()
+    return {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+
+
+def _validate_chunk(chunk, schema, errors):
+    rows = []
+    for line_number, line in chunk:
+        try:
+            rows.append((line_number, schema.load(json.loads(line))))
+        except ValueError as err:
+            errors.append({'line': line_number, 'errors': {'_schema': ['Invalid JSON: {0}'.format(err)]}})
+        except ValidationError as err:
+            errors.append({'line': line_number, 'errors': err.messages})
+
+    # one query per referenced table for the whole chunk
+    student_ids = _existing_ids(Student, (row['student_id'] for _, row in rows))
+    teacher_ids = _existing_ids(Teacher, (row['teacher_id'] for _, row in rows))
+    valid_rows = []
+    for line_number, row in rows:
+        if row['student_id'] not in student_ids:
+            errors.append({'line': line_number, 'errors': {'student_id': ['No student with this id was found']}})
+        elif row['teacher_id'] is not None and row['teacher_id'] not in teacher_ids:
+            errors.append({'line': line_number, 'errors': {'teacher_id': ['No teacher with this id was found']}})
+        else:
+            valid_rows.append((line_number, row))
+    return valid_rows
+
+
+def import_assignments(lines, chunk_size=None):
+    """
+    Imports assignments from an iterable of NDJSON lines, one assignment per line.
+
+    Lines are read, validated and inserted `chunk_size` (by default the IMPORT_CHUNK_SIZE setting)
+    at a time, each chunk in its own transaction, so memory does not grow with the input. Yields an event per failed line
+    ({'line', 'errors'}), a {'progress'} event after every chunk and a final {'summary'}.
+    """
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    schema = AssignmentImportSchema()
+    progress = {'lines': 0, 'imported': 0, 'failed': 0}
+    numbered_lines = _numbered_lines(lines)
+
+    while True:
+        chunk = list(islice(numbered_lines, chunk_size))
+        if not chunk:
+            break
+
+        errors = []
+        rows = _validate_chunk(chunk, schema, errors)
+        try:
+            Assignment.insert_many([row for _, row in rows])
+            db.session.commit()
+        except SQLAlchemyError as err:
+            db.session.rollback()
+            message = str(getattr(err, 'orig', None) or err)
+            errors.extend({'line': line_number, 'errors': {'_schema': [message]}} for line_number, _ in rows)
+            rows = []
+
+        yield from sorted(errors, key=lambda error: error['line'])
+        progress['lines'] = chunk[-1][0]
+        progress['imported'] += len(rows)
+        progress['failed'] += len(errors)
+        yield {'progress': dict(progress)}
+
+    yield {'summary': progress}
@@ -1,20 +1,70 @@
-from flask import Blueprint
+import json
+from flask import Blueprint, Response, request, stream_with_context
 from core import db
 from core.apis import decorators
-from core.apis.responses import APIResponse
-from core.models.assignments import Assignment
+from core.apis.responses import APIResponse, stream_requested
+from core.libs import pagination
+from core.models.assignments import Assignment, AssignmentGradeCount, AssignmentStateEnum
 
-from .schema import AssignmentSchema, AssignmentGradeSchema
+from .importer import import_assignments as import_assignment_lines
+from . import serializer
+from .schema import AssignmentGradeSchema, AssignmentBulkGradeSchema, AssignmentListingSchema, AssignmentSearchSchema
 principal_assignments_resources = Blueprint('principal_assignments_resources', __name__)
 
 
 @principal_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
 @decorators.authenticate_principal
+@decorators.cached_response(lambda p: Assignment.listing_scopes(state=AssignmentStateEnum.SUBMITTED))
+@decorators.etag_validated(lambda p: Assignment.get_validator(Assignment.query_by_principal()))
 def list_assignments(p):
-    """Returns list of assignments"""
-    principals_assignments = Assignment.get_assignments_by_principal()
-    principals_assignments_dump = AssignmentSchema().dump(principals_assignments, many=True)
-    return APIResponse.respond(data=principals_assignments_dump)
+    """Returns a page of assignments, or all of them with ?stream=true"""
+    content_mode = AssignmentListingSchema().load(request.args).content
+    if stream_requested(request.args):
+        principals_assignments = Assignment.iter_all(Assignment.query_by_principal(), content_mode=content_mode)
+        return APIResponse.stream(principals_assignments, serializer.get_dumper(content_mode))
+
+    limit, cursor = pagination.get_page_args(request.args)
+    principals_assignments = Assignment.get_assignments_by_principal(
+        limit=limit, cursor=cursor, content_mode=content_mode
+    )
+    principals_assignments, next_cursor = pagination.paginate(principals_assignments, limit)
+    principals_assignments_dump = serializer.dump_many(principals_assignments, content_mode)
+    return APIResponse.respond(data=principals_assignments_dump, next_cursor=next_cursor)
+
+
+@principal_assignments_resources.route('/assignments/search', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def search_assignments(p):
+    """Returns a page of the assignments whose content matches ?q=, best match first"""
+    search_args = AssignmentSearchSchema().load(request.args)
+    limit, cursor = pagination.get_page_args(request.args, decode=pagination.decode_rank_cursor)
+    search_results = Assignment.search(
+        Assignment.query_by_principal(), search_args.q, limit, cursor=cursor, content_mode=search_args.content
+    )
+    search_results, next_cursor = pagination.paginate(
+        search_results, limit, cursor_of=lambda row: pagination.encode_rank_cursor(row.rank, row.assignment.id)
+    )
+    search_results_dump = serializer.dump_many((row.assignment for row in search_results), search_args.content)
+    return APIResponse.respond(data=search_results_dump, next_cursor=next_cursor)
+
+
+@principal_assignments_resources.route('/assignments/reports/grades', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def grade_report(p):
+    """Returns the number of graded assignments for each grade"""
+    return APIResponse.respond(data=AssignmentGradeCount.get_counts_by_grade())
+
+
+@principal_assignments_resources.route('/assignments/reports/teachers', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def teacher_grade_report(p):
+    """Returns the graded assignments of each teacher by grade, teachers who graded the most first"""
+    teacher_report = [
+        {'teacher_id': teacher_id, 'graded': sum(grades.values()), 'grades': grades}
+        for teacher_id, grades in AssignmentGradeCount.get_counts_by_teacher().items()
+    ]
+    teacher_report.sort(key=lambda teacher: (-teacher['graded'], teacher['teacher_id']))
+    return APIResponse.respond(data=teacher_report)
 
 
 @principal_assignments_resources.route('/assignments/grade', methods=['POST'], strict_slashes=False)
@@ -30,5 +80,31 @@ def grade_assignment(p, incoming_payload):
         auth_principal=p
     )
     db.session.commit()
-    graded_assignment_dump = AssignmentSchema().dump(graded_assignment)
-    return APIResponse.respond(data=graded_assignment_dump)
\ No newline at end of file
+    graded_assignment_dump = serializer.dump(graded_assignment)
+    return APIResponse.respond(data=graded_assignment_dump)
+
+
+@principal_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def bulk_grade_assignments(p, incoming_payload):
+    """Grade or re-grade a batch of assignments"""
+    bulk_grade_payload = AssignmentBulkGradeSchema().load(incoming_payload)
+
+    grade_results = Assignment.mark_grades(
+        grades=[(item.id, item.grade) for item in bulk_grade_payload.assignments],
+        auth_principal=p
+    )
+    db.session.commit()
+    return APIResponse.respond(data=grade_results)
+
+
+@principal_assignments_resources.route('/assignments/import', methods=['POST'], strict_slashes=False)
+@decorators.authenticate_principal
+def import_assignments(p):
+    """Import assignments from an NDJSON body, streaming back per-line errors and progress"""
+    def events():
+        for event in import_assignment_lines(request.stream):
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(events()), mimetype='application/x-ndjson')
@@ -1,13 +1,17 @@
-from marshmallow import Schema, EXCLUDE, fields, validates, ValidationError, post_load  # Add 'post_load' here
+from marshmallow import Schema, EXCLUDE, fields, validate, validates, validates_schema, ValidationError, post_load  # Add 'post_load' here
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema, auto_field
 from marshmallow_enum import EnumField
-from core.models.assignments import Assignment, GradeEnum
+from core.models.assignments import Assignment, AssignmentStateEnum, ContentModeEnum, GradeEnum
+from core.libs import helpers
 from core.libs.helpers import GeneralObject
 
+MAX_BULK_SIZE = 1000
+
 class AssignmentSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = Assignment
         unknown = EXCLUDE  # Ignore unknown fields in the input payload
+        exclude = ('version',)  # Internal to the model
 
     # Fields definition
     id = auto_field(required=False, allow_none=True)  # ID is optional (auto-generated)
@@ -32,6 +36,30 @@ class AssignmentSchema(SQLAlchemyAutoSchema):
         # pylint: disable=unused-argument,no-self-use
         return Assignment(**data_dict)
 
+class AssignmentListingSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE  # Pagination and stream params are read separately
+
+    # How much of the content a listing returns: all of it, a preview or none
+    content = EnumField(ContentModeEnum, by_value=True, load_default=ContentModeEnum.FULL)
+
+    # Post-load hook to create a GeneralObject from the validated data
+    @post_load
+    def initiate_class(self, data_dict, many, partial):
+        # pylint: disable=unused-argument,no-self-use
+        return GeneralObject(**data_dict)
+
+
+class AssignmentSearchSchema(AssignmentListingSchema):
+    q = fields.String(required=True)  # Words the content must all contain
+
+    @validates('q')
+    def validate_q(self, value):
+        """Ensure there is something to search for"""
+        if not value.strip():
+            raise ValidationError("Search terms cannot be empty")
+
+
 class AssignmentSubmitSchema(Schema):
     class Meta:
         unknown = EXCLUDE  # Ignore unknown fields in the input payload
@@ -56,4 +84,76 @@ class AssignmentGradeSchema(Schema):
     @post_load
     def initiate_class(self, data_dict, many, partial):
         # pylint: disable=unused-argument,no-self-use
-        return GeneralObject(**data_dict)
\ No newline at end of file
+        return GeneralObject(**data_dict)
+
+class AssignmentBulkGradeSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE  # Ignore unknown fields in the input payload
+
+    # List of {id, grade} pairs, graded in one transaction
+    assignments = fields.List(
+        fields.Nested(AssignmentGradeSchema),
+        required=True,
+        validate=validate.Length(min=1, max=MAX_BULK_SIZE)
+    )
+
+    # Post-load hook to create a GeneralObject from the validated data
+    @post_load
+    def initiate_class(self, data_dict, many, partial):
+        # pylint: disable=unused-argument,no-self-use
+        return GeneralObject(**data_dict)
+
+
+class AssignmentBulkSubmitSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE  # Ignore unknown fields in the input payload
+
+    # List of {id, teacher_id} pairs, submitted in one transaction
+    assignments = fields.List(
+        fields.Nested(AssignmentSubmitSchema),
+        required=True,
+        validate=validate.Length(min=1, max=MAX_BULK_SIZE)
+    )
+
+    # Post-load hook to create a GeneralObject from the validated data
+    @post_load
+    def initiate_class(self, data_dict, many, partial):
+        # pylint: disable=unused-argument,no-self-use
+        return GeneralObject(**data_dict)
+
+
+class AssignmentImportSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE  # Ignore unknown fields in the input payload
+
+    id = fields.Integer(load_default=None)  # Kept when migrating from another LMS, generated otherwise
+    student_id = fields.Integer(required=True, allow_none=False)  # Student ID is required
+    teacher_id = fields.Integer(load_default=None)
+    content = fields.String(required=True)  # Content is required and must be a non-empty string
+    state = EnumField(AssignmentStateEnum, load_default=AssignmentStateEnum.DRAFT)
+    grade = EnumField(GradeEnum, load_default=None)
+    created_at = fields.DateTime(load_default=helpers.get_utc_now)  # Kept when migrating from another LMS
+    updated_at = fields.DateTime(load_default=None)
+
+    @validates('content')
+    def validate_content(self, value):
+        """Ensure content is not null or empty"""
+        if not value or value.strip() == "":
+            raise ValidationError("Content cannot be null or empty")
+
+    @validates_schema
+    def validate_state(self, data, **kwargs):
+        """Ensure the row is something the app itself could have produced"""
+        # pylint: disable=unused-argument
+        if data['state'] != AssignmentStateEnum.DRAFT and data['teacher_id'] is None:
+            raise ValidationError('only a draft assignment can be without teacher', 'teacher_id')
+        if (data['state'] == AssignmentStateEnum.GRADED) != (data['grade'] is not None):
+            raise ValidationError('only a graded assignment has a grade and it must have one', 'grade')
+
+    # Post-load hook returning a plain row, imports are inserted through Core rather than the ORM
+    @post_load
+    def initiate_row(self, data_dict, many, partial):
+        # pylint: disable=unused-argument,no-self-use
+        if data_dict['updated_at'] is None:
+            data_dict['updated_at'] = data_dict['created_at']
+        return data_dict
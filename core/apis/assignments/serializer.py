@@ -0,0 +1,59 @@
+from operator import attrgetter
+
+from core.apis import metrics
+from core.models.assignments import ContentModeEnum
+
+from .schema import AssignmentSchema
+
+# Built once: loads (and validates) the payload of a new or edited assignment into an Assignment
+assignment_loader = AssignmentSchema()
+
+_get_fields = attrgetter('id', 'created_at', 'updated_at', 'grade', 'state', 'student_id', 'teacher_id', 'content')
+
+
+def dump(assignment):
+    """
+    The dict the write endpoints respond with for an Assignment, the same values
+    `AssignmentSchema().dump` gives. Listings dump AssignmentRecords with `get_dumper`.
+    """
+    return _dump_record(_get_fields(assignment))
+
+
+def _dump_record(record):
+    _id, created_at, updated_at, grade, state, student_id, teacher_id, content = record
+    return {
+        'content': content,
+        'created_at': created_at.isoformat(),
+        'grade': grade,
+        'id': _id,
+        'state': state,
+        'student_id': student_id,
+        'teacher_id': teacher_id,
+        'updated_at': updated_at.isoformat(),
+    }
+
+
+def _dump_record_without_content(record):
+    _id, created_at, updated_at, grade, state, student_id, teacher_id, _ = record
+    return {
+        'created_at': created_at.isoformat(),
+        'grade': grade,
+        'id': _id,
+        'state': state,
+        'student_id': student_id,
+        'teacher_id': teacher_id,
+        'updated_at': updated_at.isoformat(),
+    }
+
+
+def get_dumper(content_mode=ContentModeEnum.FULL):
+    """
+    Function turning an AssignmentRecord read with `content_mode` into the dict `dump` gives for
+    its assignment, with as much of the content as the record holds
+    """
+    return _dump_record_without_content if content_mode == ContentModeEnum.NONE else _dump_record
+
+
+def dump_many(records, content_mode=ContentModeEnum.FULL):
+    with metrics.serializing():
+        return list(map(get_dumper(content_mode), records))
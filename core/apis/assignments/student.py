@@ -1,20 +1,33 @@
-from flask import Blueprint
+from flask import Blueprint, request
 from core import db
 from core.apis import decorators
-from core.apis.responses import APIResponse
+from core.apis.responses import APIResponse, stream_requested
+from core.libs import pagination
 from core.models.assignments import Assignment
 
-from .schema import AssignmentSchema, AssignmentSubmitSchema
+from . import serializer
+from .schema import AssignmentSubmitSchema, AssignmentBulkSubmitSchema, AssignmentListingSchema
 student_assignments_resources = Blueprint('student_assignments_resources', __name__)
 
 
 @student_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
 @decorators.authenticate_principal
+@decorators.cached_response(lambda p: Assignment.listing_scopes(student_id=p.student_id))
+@decorators.etag_validated(lambda p: Assignment.get_validator(Assignment.query_by_student(p.student_id)))
 def list_assignments(p):
-    """Returns list of assignments"""
-    students_assignments = Assignment.get_assignments_by_student(p.student_id)
-    students_assignments_dump = AssignmentSchema().dump(students_assignments, many=True)
-    return APIResponse.respond(data=students_assignments_dump)
+    """Returns a page of assignments, or all of them with ?stream=true"""
+    content_mode = AssignmentListingSchema().load(request.args).content
+    if stream_requested(request.args):
+        students_assignments = Assignment.iter_all(Assignment.query_by_student(p.student_id), content_mode=content_mode)
+        return APIResponse.stream(students_assignments, serializer.get_dumper(content_mode))
+
+    limit, cursor = pagination.get_page_args(request.args)
+    students_assignments = Assignment.get_assignments_by_student(
+        p.student_id, limit=limit, cursor=cursor, content_mode=content_mode
+    )
+    students_assignments, next_cursor = pagination.paginate(students_assignments, limit)
+    students_assignments_dump = serializer.dump_many(students_assignments, content_mode)
+    return APIResponse.respond(data=students_assignments_dump, next_cursor=next_cursor)
 
 
 @student_assignments_resources.route('/assignments', methods=['POST'], strict_slashes=False)
@@ -22,12 +35,12 @@ def list_assignments(p):
 @decorators.authenticate_principal
 def upsert_assignment(p, incoming_payload):
     """Create or Edit an assignment"""
-    assignment = AssignmentSchema().load(incoming_payload)
+    assignment = serializer.assignment_loader.load(incoming_payload)
     assignment.student_id = p.student_id
 
     upserted_assignment = Assignment.upsert(assignment)
     db.session.commit()
-    upserted_assignment_dump = AssignmentSchema().dump(upserted_assignment)
+    upserted_assignment_dump = serializer.dump(upserted_assignment)
     return APIResponse.respond(data=upserted_assignment_dump)
 
 
@@ -44,5 +57,20 @@ def submit_assignment(p, incoming_payload):
         auth_principal=p
     )
     db.session.commit()
-    submitted_assignment_dump = AssignmentSchema().dump(submitted_assignment)
+    submitted_assignment_dump = serializer.dump(submitted_assignment)
     return APIResponse.respond(data=submitted_assignment_dump)
+
+
+@student_assignments_resources.route('/assignments/submit/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def bulk_submit_assignments(p, incoming_payload):
+    """Submit a batch of assignments"""
+    bulk_submit_payload = AssignmentBulkSubmitSchema().load(incoming_payload)
+
+    submit_results = Assignment.submit_many(
+        submissions=[(item.id, item.teacher_id) for item in bulk_submit_payload.assignments],
+        auth_principal=p
+    )
+    db.session.commit()
+    return APIResponse.respond(data=submit_results)
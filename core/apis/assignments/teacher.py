@@ -1,34 +1,59 @@
 from flask import Blueprint, jsonify, request
+from core import db
 from core.apis import decorators
+from core.apis.responses import APIResponse, stream_requested
 from core.models.assignments import Assignment
+from core.libs import pagination
 from core.libs.exceptions import FyleError
 
+from . import serializer
+from .schema import AssignmentBulkGradeSchema, AssignmentListingSchema, AssignmentSearchSchema
+
 # Define the teacher_assignments_resources blueprint
 teacher_assignments_resources = Blueprint('teacher_assignments_resources', __name__)
 
+
 @teacher_assignments_resources.route('/assignments', methods=['GET'], strict_slashes=False)
 @decorators.authenticate_principal
+@decorators.cached_response(lambda p: Assignment.listing_scopes(teacher_id=p.teacher_id))
+@decorators.etag_validated(lambda p: Assignment.get_validator(Assignment.query_by_teacher(p.teacher_id)))
 def list_assignments(p):
     """
-    Returns a list of assignments submitted to the teacher.
+    Returns a page of assignments submitted to the teacher, or all of them with ?stream=true.
+    """
+    content_mode = AssignmentListingSchema().load(request.args).content
+    if stream_requested(request.args):
+        teachers_assignments = Assignment.iter_all(Assignment.query_by_teacher(p.teacher_id), content_mode=content_mode)
+        return APIResponse.stream(teachers_assignments, serializer.get_dumper(content_mode))
+
+    # Fetch a page of assignments for the authenticated teacher
+    limit, cursor = pagination.get_page_args(request.args)
+    teachers_assignments = Assignment.get_assignments_by_teacher(
+        teacher_id=p.teacher_id, limit=limit, cursor=cursor, content_mode=content_mode
+    )
+    teachers_assignments, next_cursor = pagination.paginate(teachers_assignments, limit)
+    return APIResponse.respond(
+        data=serializer.dump_many(teachers_assignments, content_mode), next_cursor=next_cursor
+    )
+
+@teacher_assignments_resources.route('/assignments/search', methods=['GET'], strict_slashes=False)
+@decorators.authenticate_principal
+def search_assignments(p):
+    """
+    Returns a page of the assignments submitted to the teacher whose content matches ?q=, best match first.
     """
-    # Fetch assignments for the authenticated teacher
-    teachers_assignments = Assignment.get_assignments_by_teacher(teacher_id=p.teacher_id)
-    # Serialize the assignments manually
-    return jsonify({
-        "data": [
-            {
-                "id": assignment.id,
-                "content": assignment.content,
-                "grade": assignment.grade,
-                "state": assignment.state,
-                "student_id": assignment.student_id,
-                "teacher_id": assignment.teacher_id,
-                "created_at": assignment.created_at.isoformat(),
-                "updated_at": assignment.updated_at.isoformat()
-            } for assignment in teachers_assignments
-        ]
-    }), 200
+    search_args = AssignmentSearchSchema().load(request.args)
+    limit, cursor = pagination.get_page_args(request.args, decode=pagination.decode_rank_cursor)
+    search_results = Assignment.search(
+        Assignment.query_by_teacher(p.teacher_id), search_args.q, limit, cursor=cursor, content_mode=search_args.content
+    )
+    search_results, next_cursor = pagination.paginate(
+        search_results, limit, cursor_of=lambda row: pagination.encode_rank_cursor(row.rank, row.assignment.id)
+    )
+    return APIResponse.respond(
+        data=serializer.dump_many((row.assignment for row in search_results), search_args.content),
+        next_cursor=next_cursor
+    )
 
 @teacher_assignments_resources.route('/assignments/grade', methods=['POST'], strict_slashes=False)
 @decorators.authenticate_principal
@@ -46,37 +71,31 @@ def grade_assignment(p):
         if not assignment_id or grade not in ['A', 'B', 'C', 'D']:
             raise FyleError(400, "Invalid input")
 
-        # Lookup assignment
-        assignment = Assignment.get_by_id(assignment_id)
-        if not assignment:
-            raise FyleError(404, "Assignment not found")  # Ensure 404 for missing assignments
-
-        # Ensure the assignment is assigned to the current teacher
-        if assignment.teacher_id != p.teacher_id:
-            raise FyleError(400, "This assignment is not assigned to the current teacher")
-
-        # Ensure the assignment is in the SUBMITTED state
-        if assignment.state != 'SUBMITTED':
-            raise FyleError(400, "Only SUBMITTED assignments can be graded")
-
-        # Grade the assignment using the `mark_grade` method
+        # `mark_grade` tells a missing, someone else's or not submitted assignment apart
         graded_assignment = Assignment.mark_grade(_id=assignment_id, grade=grade, auth_principal=p)
+        db.session.commit()
 
         # Return the updated assignment
-        return jsonify({
-            "data": {
-                "content": graded_assignment.content,
-                "created_at": graded_assignment.created_at.isoformat(),
-                "grade": graded_assignment.grade,
-                "id": graded_assignment.id,
-                "state": graded_assignment.state,
-                "student_id": graded_assignment.student_id,
-                "teacher_id": graded_assignment.teacher_id,
-                "updated_at": graded_assignment.updated_at.isoformat()
-            }
-        }), 200
+        return APIResponse.respond(data=serializer.dump(graded_assignment))
 
     except FyleError as e:
         return jsonify({"error": e.__class__.__name__, "message": str(e)}), e.status_code
     except Exception as e:
-        return jsonify({"error": "InternalServerError", "message": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "InternalServerError", "message": str(e)}), 500
+
+
+@teacher_assignments_resources.route('/assignments/grade/bulk', methods=['POST'], strict_slashes=False)
+@decorators.accept_payload
+@decorators.authenticate_principal
+def bulk_grade_assignments(p, incoming_payload):
+    """
+    Grades a batch of assignments submitted to the teacher.
+    """
+    bulk_grade_payload = AssignmentBulkGradeSchema().load(incoming_payload)
+
+    grade_results = Assignment.mark_grades(
+        grades=[(item.id, item.grade) for item in bulk_grade_payload.assignments],
+        auth_principal=p
+    )
+    db.session.commit()
+    return APIResponse.respond(data=grade_results)
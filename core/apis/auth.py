@@ -0,0 +1,90 @@
+import json
+import threading
+from flask import current_app
+from sqlalchemy import event
+from core import db
+from core.libs import cache
+from core.libs.principal import AuthPrincipal
+from core.models.principals import Principal
+from core.models.students import Student
+from core.models.teachers import Teacher
+from core.models.users import User
+
+# generation scope of the verified principals, bumped by any write to the tables they are checked against
+PRINCIPALS_SCOPE = 'principals'
+
+_ROLES = (('student_id', Student), ('teacher_id', Teacher), ('principal_id', Principal))
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_principal(header):
+    """The AuthPrincipal an X-Principal header claims, raises ValueError if it is not one"""
+    claims = json.loads(header)
+    if not isinstance(claims, dict) or not _is_id(claims.get('user_id')):
+        raise ValueError('X-Principal should be an object with an integer user_id')
+    for role_id, _ in _ROLES:
+        if claims.get(role_id) is not None and not _is_id(claims[role_id]):
+            raise ValueError('{0} should be an integer'.format(role_id))
+    return AuthPrincipal(
+        user_id=claims['user_id'],
+        student_id=claims.get('student_id'),
+        teacher_id=claims.get('teacher_id'),
+        principal_id=claims.get('principal_id')
+    )
+
+
+def verify_principal(p: AuthPrincipal):
+    """True when every role `p` claims is a row of its table belonging to its user, or its user exists if none is"""
+    claimed_roles = [(model, getattr(p, role_id)) for role_id, model in _ROLES if getattr(p, role_id) is not None]
+    if not claimed_roles:
+        return db.session.query(User.id).filter(User.id == p.user_id).first() is not None
+    return all(
+        db.session.query(model.id).filter(model.id == _id, model.user_id == p.user_id).first() is not None
+        for model, _id in claimed_roles
+    )
+
+
+_principal_cache_lock = threading.Lock()
+
+
+def get_principal_cache():
+    """The app's cache of verified principals, built from its AUTH_CACHE_* config on first use"""
+    principal_cache = current_app.extensions.get('principal_cache')
+    if principal_cache is None:
+        with _principal_cache_lock:
+            principal_cache = current_app.extensions.get('principal_cache')
+            if principal_cache is None:
+                backend = cache.LRUCache(
+                    current_app.config['AUTH_CACHE_MAX_ENTRIES'], current_app.config['AUTH_CACHE_TTL']
+                )
+                principal_cache = cache.ResponseCache(backend, cache.get_scope_generations())
+                current_app.extensions['principal_cache'] = principal_cache
+    return principal_cache
+
+
+def get_verified_principal(header):
+    """
+    The AuthPrincipal of an X-Principal header if its ids check out, else None. Raises ValueError
+    if the header is not a principal at all. Outcomes are cached per header until the TTL runs out
+    or any worker commits a write to the users, students, teachers or principals tables.
+    """
+    def parse_and_verify():
+        p = parse_principal(header)
+        return p if verify_principal(p) else None
+
+    p, _ = get_principal_cache().get_or_compute(header, [PRINCIPALS_SCOPE], parse_and_verify)
+    return p
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_flushed_principals(session, flush_context):
+    """Verified principals, and the teachers listing, once users or their roles are written through the ORM"""
+    # pylint: disable=unused-argument
+    written = session.new | session.dirty | session.deleted
+    if any(isinstance(obj, (User, Student, Teacher, Principal)) for obj in written):
+        cache.invalidate(session, [PRINCIPALS_SCOPE])
+    if any(isinstance(obj, Teacher) for obj in written):
+        cache.invalidate(session, ['teachers'])
@@ -1,17 +1,12 @@
+import hashlib
 import json
-from flask import request
+from flask import make_response, request
+from core.apis.auth import AuthPrincipal, get_verified_principal  # pylint: disable=unused-import
+from core.apis.responses import cached
 from core.libs import assertions
 from functools import wraps
 
 
-class AuthPrincipal:
-    def __init__(self, user_id, student_id=None, teacher_id=None, principal_id=None):
-        self.user_id = user_id
-        self.student_id = student_id
-        self.teacher_id = teacher_id
-        self.principal_id = principal_id
-
-
 def accept_payload(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -25,13 +20,11 @@ def authenticate_principal(func):
     def wrapper(*args, **kwargs):
         p_str = request.headers.get('X-Principal')
         assertions.assert_auth(p_str is not None, 'principal not found')
-        p_dict = json.loads(p_str)
-        p = AuthPrincipal(
-            user_id=p_dict['user_id'],
-            student_id=p_dict.get('student_id'),
-            teacher_id=p_dict.get('teacher_id'),
-            principal_id=p_dict.get('principal_id')
-        )
+        try:
+            p = get_verified_principal(p_str)
+        except ValueError:
+            assertions.base_assert(401, 'Invalid X-Principal header format')
+        assertions.assert_auth(p is not None, 'principal not found')
 
         if request.path.startswith('/student'):
             assertions.assert_true(p.student_id is not None, 'requester should be a student')
@@ -44,3 +37,39 @@ def authenticate_principal(func):
 
         return func(p, *args, **kwargs)
     return wrapper
+
+
+def etag_validated(validator):
+    """
+    Conditional GET for views under `authenticate_principal`. `validator(p)` returns something cheap
+    that changes whenever the view's data does; with the request URL it makes the response's ETag.
+    A request whose If-None-Match holds that ETag is answered 304 without calling the view.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(p, *args, **kwargs):
+            raw = json.dumps([request.full_path, validator(p)], default=str)
+            etag = hashlib.sha1(raw.encode('utf8')).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(func(p, *args, **kwargs))
+            response.set_etag(etag)
+            # the same URL holds different data for every principal
+            response.vary.add('X-Principal')
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_response(scopes_of):
+    """
+    Response cache for GET views under `authenticate_principal`, `scopes_of(p)` names the data the
+    view reads; a write to any of them, in any worker, invalidates the cached responses
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(p, *args, **kwargs):
+            return cached(scopes_of(p), lambda: func(p, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+"""
+Per route request metrics: latency, status, SQL statements and the time spent running them or
+serializing, collected by request hooks and SQLAlchemy cursor events and served by /metrics.
+"""
+import functools
+import math
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from core.libs import metrics
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+DESCRIPTIONS = {
+    'http_requests_total': ('counter', 'Requests answered, by route, method and status'),
+    'http_request_duration_seconds': (
+        'histogram', 'Seconds from the start of a request to the end of its response body, streamed ones included'
+    ),
+    'http_request_sql_statements': ('histogram', 'SQL statements executed per request'),
+    'http_request_db_seconds_total': ('counter', 'Seconds spent executing SQL statements'),
+    'http_request_serialization_seconds_total': ('counter', 'Seconds spent turning rows into JSON'),
+}
+BUCKETS = {
+    'http_request_duration_seconds': LATENCY_BUCKETS,
+    'http_request_sql_statements': STATEMENT_BUCKETS,
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = metrics.Registry()
+
+
+class RequestMetrics:
+    """What a request spent, kept on `g` from before_request until its response is closed"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+
+def _current():
+    return g.get('request_metrics') if has_request_context() else None
+
+
+def start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def finish_request(response):
+    """
+    Records the request, a streamed one once its body was sent: its listing keeps reading rows
+    and serializing them until then
+    """
+    request_metrics = g.get('request_metrics')
+    if request_metrics is not None:
+        keys = _series_keys(
+            request.blueprint or '',
+            request.url_rule.rule if request.url_rule is not None else '<unmatched>',
+            request.method,
+            response.status_code,
+        )
+        if response.is_streamed:
+            response.call_on_close(lambda: _record(request_metrics, keys))
+        else:
+            _record(request_metrics, keys)
+    return response
+
+
+@functools.lru_cache(maxsize=1024)
+def _series_keys(blueprint, route, method, status):
+    """The keys a request of a route and status adds to, built once: a key is JSON"""
+    labels = [['blueprint', blueprint], ['route', route], ['method', method]]
+
+    def bucket_keys(name, buckets):
+        return {
+            bound: metrics.key(name + '_bucket', labels + [['le', metrics.format_number(bound)]])
+            for bound in buckets + (math.inf,)
+        }
+
+    return {
+        'requests': metrics.key('http_requests_total', labels + [['status', str(status)]]),
+        'db': metrics.key('http_request_db_seconds_total', labels),
+        'serialization': metrics.key('http_request_serialization_seconds_total', labels),
+        'duration_buckets': bucket_keys('http_request_duration_seconds', LATENCY_BUCKETS),
+        'duration_sum': metrics.key('http_request_duration_seconds_sum', labels),
+        'duration_count': metrics.key('http_request_duration_seconds_count', labels),
+        'statements_buckets': bucket_keys('http_request_sql_statements', STATEMENT_BUCKETS),
+        'statements_sum': metrics.key('http_request_sql_statements_sum', labels),
+        'statements_count': metrics.key('http_request_sql_statements_count', labels),
+    }
+
+
+def _record(request_metrics, keys):
+    duration = time.perf_counter() - request_metrics.started
+    registry.add({
+        keys['requests']: 1,
+        keys['db']: request_metrics.db_seconds,
+        keys['serialization']: request_metrics.serialization_seconds,
+        keys['duration_buckets'][metrics.bucket(duration, LATENCY_BUCKETS)]: 1,
+        keys['duration_sum']: duration,
+        keys['duration_count']: 1,
+        keys['statements_buckets'][metrics.bucket(request_metrics.statements, STATEMENT_BUCKETS)]: 1,
+        keys['statements_sum']: request_metrics.statements,
+        keys['statements_count']: 1,
+    })
+
+
+def add_serialization_seconds(seconds):
+    request_metrics = _current()
+    if request_metrics is not None:
+        request_metrics.serialization_seconds += seconds
+
+
+@contextmanager
+def serializing():
+    """Counts the time of the block as serialization of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_serialization_seconds(time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument
+    request_metrics = _current()
+    if request_metrics is not None and context is not None:
+        request_metrics.statements += 1
+        request_metrics.db_seconds += time.perf_counter() - context.metrics_started
+
+
+def metrics_view():
+    """The metrics of every worker of this host, in the Prometheus text format"""
+    return Response(metrics.render(registry.collect(), DESCRIPTIONS, BUCKETS), content_type=CONTENT_TYPE)
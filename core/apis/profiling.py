@@ -0,0 +1,78 @@
+"""
+Opt-in profiling of single requests. A request is profiled when it carries an X-Profile token
+signed with PROFILER_SECRET (`flask profiles token`), or at random with the probability
+PROFILER_SAMPLE_RATE. Its response gets the X-Request-Id its profile is saved under, see
+core.libs.profiling. Without a secret or a rate the hooks are not registered at all.
+"""
+import cProfile
+import random
+import time
+
+from flask import current_app, g, request
+from core.libs import profiling
+
+HEADER = 'X-Profile'
+
+
+def enabled(app):
+    return bool(app.config['PROFILER_SECRET']) or app.config['PROFILER_SAMPLE_RATE'] > 0
+
+
+class RequestProfile:
+    """The profiler of a request and what to save with it, kept on `g` until its response is closed"""
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.request_id = profiling.request_id(request.headers.get('X-Request-Id'))
+        self.directory = current_app.config['PROFILER_DIR']
+        self.details = {
+            'time': time.time(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'trigger': trigger,
+        }
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+
+    def save(self, status):
+        self.profiler.disable()
+        profiling.save(self.directory, self.request_id, self.profiler, dict(
+            self.details, status=status, seconds=round(time.perf_counter() - self.started, 6)
+        ))
+
+
+def _trigger():
+    secret = current_app.config['PROFILER_SECRET']
+    token = request.headers.get(HEADER)
+    if secret and token and profiling.verify_token(secret, token):
+        return 'header'
+    if random.random() < current_app.config['PROFILER_SAMPLE_RATE']:
+        return 'sample'
+    return None
+
+
+def start_request():
+    trigger = _trigger()
+    if trigger is not None:
+        g.request_profile = RequestProfile(trigger)
+        g.request_profile.profiler.enable()
+
+
+def finish_request(response):
+    """Saves the profile, a streamed response's once its body was sent"""
+    request_profile = g.pop('request_profile', None)
+    if request_profile is not None:
+        response.headers['X-Request-Id'] = request_profile.request_id
+        if response.is_streamed:
+            response.call_on_close(lambda: request_profile.save(response.status_code))
+        else:
+            request_profile.save(response.status_code)
+    return response
+
+
+def abandon_request(exc):
+    """Saves the profile of a request that raised before it had a response"""
+    # pylint: disable=unused-argument
+    request_profile = g.pop('request_profile', None)
+    if request_profile is not None:
+        request_profile.save(500)
@@ -1,7 +1,128 @@
-from flask import Response, jsonify, make_response
+import threading
+import time
+from collections import namedtuple
+from flask import Response, current_app, json, jsonify, make_response, request, stream_with_context
+from core.apis import metrics
+from core.libs import cache
+
+try:
+    import orjson
+except ImportError:  # optional, only makes encoding faster
+    orjson = None
+
+RESPONSE_CACHE_BACKENDS = {
+    'lru': lambda config: cache.LRUCache(config['RESPONSE_CACHE_MAX_ENTRIES'], config['RESPONSE_CACHE_TTL']),
+    'null': lambda config: cache.NullCache(),
+}
+
+
+def dumps(obj):
+    """
+    Compact JSON, byte for byte what jsonify writes outside debug mode. Encoded with orjson when it
+    is installed and its output is the same: with sorted ASCII-only keys and values.
+    """
+    config = current_app.config
+    if orjson is not None and config['JSON_SORT_KEYS'] and config['JSON_AS_ASCII']:
+        try:
+            encoded = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:  # e.g. enum dict keys
+            encoded = None
+        # flask escapes non ASCII characters, orjson writes them as UTF-8
+        if encoded is not None and encoded.isascii():
+            return encoded
+    return json.dumps(obj, separators=(',', ':')).encode('utf8')
+
+
+def stream_requested(args):
+    """`?stream=true` asks a listing for its whole result as a streamed response instead of a page"""
+    return args.get('stream', '').lower() in ('1', 'true')
 
 
 class APIResponse(Response):
     @classmethod
-    def respond(cls, data):
-        return make_response(jsonify(data=data))
+    def respond(cls, data, **envelope):
+        if current_app.debug or current_app.config['JSONIFY_PRETTYPRINT_REGULAR']:
+            return make_response(jsonify(data=data, **envelope))
+        with metrics.serializing():
+            body = dumps(dict(envelope, data=data)) + b'\n'
+        return cls(body, mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+    @classmethod
+    def stream(cls, rows, serialize, chunk_rows=None):
+        """
+        Responds with the same {"data": [...]} envelope as `respond`, but serializes `rows` one at a
+        time and writes the array to the socket `chunk_rows` (by default the STREAM_CHUNK_ROWS
+        setting) rows at a time, so only one chunk of the result is ever held in memory
+        """
+        chunk_rows = chunk_rows or current_app.config['STREAM_CHUNK_ROWS']
+
+        def generate():
+            yield b'{"data":['
+            separator = b''
+            chunk = []
+            # rows are read while iterating, only the time serializing them is counted as such
+            serialization_seconds = 0.0
+            for row in rows:
+                started = time.perf_counter()
+                chunk.append(dumps(serialize(row)))
+                serialization_seconds += time.perf_counter() - started
+                if len(chunk) == chunk_rows:
+                    yield separator + b','.join(chunk)
+                    separator = b','
+                    chunk = []
+            if chunk:
+                yield separator + b','.join(chunk)
+            metrics.add_serialization_seconds(serialization_seconds)
+            yield b']}\n'
+
+        return cls(stream_with_context(generate()), mimetype='application/json')
+
+
+# requests of a threaded worker may all ask for the cache first at once
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The app's response cache, built from its RESPONSE_CACHE_* config on first use"""
+    response_cache = current_app.extensions.get('response_cache')
+    if response_cache is None:
+        with _response_cache_lock:
+            response_cache = current_app.extensions.get('response_cache')
+            if response_cache is None:
+                backend = RESPONSE_CACHE_BACKENDS[current_app.config['RESPONSE_CACHE_BACKEND']](current_app.config)
+                response_cache = cache.ResponseCache(backend, cache.get_scope_generations())
+                current_app.extensions['response_cache'] = response_cache
+    return response_cache
+
+
+# what the response cache keeps of a response: never the object itself, which the request hooks
+# go on changing after the view returned it
+CachedResponse = namedtuple('CachedResponse', ['body', 'status', 'headers'])
+
+
+def _snapshot(response):
+    """A CachedResponse of a complete 200 response, other responses are returned as they are"""
+    if response.status_code != 200 or response.is_streamed:
+        return response
+    return CachedResponse(response.get_data(), response.status, tuple(response.headers.to_wsgi_list()))
+
+
+def cached(scopes, respond):
+    """
+    Answers a GET from the response cache while none of `scopes` was written, else with `respond()`.
+    Only complete 200 responses are kept, the ETag they carry is checked against If-None-Match on hits.
+    Every request gets a response of its own, built from the cached snapshot.
+    """
+    value, hit = get_response_cache().get_or_compute(
+        (request.endpoint, tuple(sorted(scopes)), request.full_path),
+        sorted(scopes),
+        lambda: _snapshot(make_response(respond())),
+        cacheable=lambda value: isinstance(value, CachedResponse)
+    )
+    response = value
+    if isinstance(value, CachedResponse):
+        response = Response(value.body, status=value.status, headers=list(value.headers))
+        if hit:
+            response = response.make_conditional(request)
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
@@ -0,0 +1,113 @@
+"""
+The API of the app: its blueprints, request hooks and error handler. `core.create_app` registers
+them before the first request, so the CLI, the migrations and the models never import them.
+"""
+from flask import jsonify, request
+from marshmallow.exceptions import ValidationError
+from core import db
+from core.apis.assignments import (
+    student_assignments_resources,
+    teacher_assignments_resources,
+    principal_assignments_resources,
+)
+from core.apis import metrics, profiling
+from core.apis.responses import get_response_cache
+from core.apis.teachers.principal import blueprint as principal_teachers_blueprint  # Import the new blueprint
+from core.libs import helpers, routing
+from core.libs.exceptions import FyleError
+from werkzeug.exceptions import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def route_reads():
+    """
+    GET and HEAD requests only read: their statements run on the read-only engine, where they never
+    wait on the writers' connections or locks
+    """
+    if request.method in ('GET', 'HEAD'):
+        routing.use_read_engine(db.session())
+
+
+def route_writes(exc):
+    # pylint: disable=unused-argument
+    routing.use_primary_engine(db.session())
+
+
+def ready():
+    """
+    Health check endpoint to confirm the server is running.
+    Returns the current UTC time to indicate readiness.
+    """
+    response = jsonify({
+        'status': 'ready',
+        'time': helpers.get_utc_now()
+    })
+    return response
+
+
+def cache_stats():
+    """
+    Hit and miss counters of this worker's response cache, every worker keeps its own.
+    """
+    return jsonify(get_response_cache().stats())
+
+
+def handle_error(err):
+    """
+    Global error handler to catch and respond to exceptions.
+    Handles custom errors, validation errors, database integrity errors, and generic HTTP exceptions.
+    """
+    if isinstance(err, FyleError):
+        # Handle custom FyleError exceptions
+        return jsonify(
+            error=err.__class__.__name__, message=err.message
+        ), err.status_code
+    elif isinstance(err, ValidationError):
+        # Handle Marshmallow validation errors
+        return jsonify(
+            error=err.__class__.__name__, message=err.messages
+        ), 400
+    elif isinstance(err, StaleDataError):
+        # Handle optimistic concurrency failures (the row changed since it was read)
+        return jsonify(
+            error=err.__class__.__name__, message='assignment was changed by another request, please retry'
+        ), 409
+    elif isinstance(err, IntegrityError):
+        # Handle SQLAlchemy integrity errors (e.g., duplicate entries)
+        return jsonify(
+            error=err.__class__.__name__, message=str(err.orig)
+        ), 400
+    elif isinstance(err, HTTPException):
+        # Handle generic HTTP exceptions
+        return jsonify(
+            error=err.__class__.__name__, message=str(err)
+        ), err.code
+    # Re-raise any unhandled exceptions
+    raise err
+
+
+def register_api(app):
+    """Registers the blueprints, request hooks and error handler on `app`"""
+    # Register blueprints for assignment-related APIs
+    app.register_blueprint(student_assignments_resources, url_prefix='/student')
+    app.register_blueprint(teacher_assignments_resources, url_prefix='/teacher')
+    app.register_blueprint(principal_assignments_resources, url_prefix='/principal')
+
+    # Register the blueprint for principal-related APIs (e.g., GET /principal/teachers)
+    app.register_blueprint(principal_teachers_blueprint, url_prefix='/api')  # Use '/api' as the prefix
+
+    if profiling.enabled(app):
+        # first in, last out: the profile covers the other hooks
+        app.before_request(profiling.start_request)
+        app.after_request(profiling.finish_request)
+        app.teardown_request(profiling.abandon_request)
+    app.before_request(route_reads)
+    app.teardown_request(route_writes)
+    app.add_url_rule('/', view_func=ready)
+    app.add_url_rule('/cache/stats', view_func=cache_stats)
+    if app.config['METRICS_ENABLED']:
+        app.before_request(metrics.start_request)
+        app.after_request(metrics.finish_request)
+        app.add_url_rule('/metrics', view_func=metrics.metrics_view)
+    app.register_error_handler(Exception, handle_error)
@@ -1,6 +1,8 @@
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, jsonify, request
+from core.apis.auth import get_verified_principal
+from core.apis.responses import cached
 from core.models.teachers import Teacher
-from core.libs.exceptions import FyleError
+from core.libs import assertions
 
 # Create a blueprint for principal-related APIs
 blueprint = Blueprint('principal_teachers', __name__)
@@ -13,18 +15,24 @@ def list_teachers():
     """
     # Validate the X-Principal header
     principal_header = request.headers.get("X-Principal")
-    if not principal_header:
-        abort(400, description="X-Principal header is missing")
+    assertions.assert_valid(bool(principal_header), "X-Principal header is missing")
 
     try:
-        principal_data = eval(principal_header)  # Parse the header as a dictionary
-        principal_id = principal_data.get("principal_id")
-        if not principal_id:
-            raise FyleError(400, "Invalid X-Principal header")
-    except Exception:
-        abort(400, description="Invalid X-Principal header format")
-
-    # Query all teachers from the database
+        principal = get_verified_principal(principal_header)
+    except ValueError:
+        assertions.base_assert(400, "Invalid X-Principal header format")
+    assertions.assert_valid(
+        principal is not None and principal.principal_id is not None, "Invalid X-Principal header"
+    )
+
+    # Teachers written through the ORM invalidate this listing (see core.apis.auth), others expire with the TTL
+    return cached(['teachers'], query_teachers)
+
+
+def query_teachers():
+    """
+    Lists all teachers from the database.
+    """
     teachers = Teacher.query.all()
 
     # Format the response
@@ -0,0 +1,89 @@
+import json
+
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from core import db
+from core.libs import profiling
+from core.models.assignments import AssignmentGradeCount, ContentBlob
+
+
+@click.command('import-assignments')
+@click.argument('ndjson_file', type=click.File('rb'))
+@click.option('--chunk-size', type=click.IntRange(min=1),
+              help='Lines validated and inserted per transaction, IMPORT_CHUNK_SIZE by default.')
+@with_appcontext
+def import_assignments(ndjson_file, chunk_size):
+    """Import assignments from NDJSON_FILE ('-' for stdin), one assignment per line."""
+    # the importer validates with the API's schemas, the other commands start without them
+    from core.apis.assignments import importer  # pylint: disable=import-outside-toplevel
+    for event in importer.import_assignments(ndjson_file, chunk_size=chunk_size):
+        if 'line' in event:
+            click.echo('line {0}: {1}'.format(event['line'], json.dumps(event['errors'])), err=True)
+        elif 'progress' in event:
+            click.echo('{lines} lines read, {imported} imported, {failed} failed'.format(**event['progress']))
+        else:
+            click.echo('done: {imported} imported, {failed} failed'.format(**event['summary']))
+
+
+@click.command('rebuild-grade-counts')
+@with_appcontext
+def rebuild_grade_counts():
+    """Recompute the per teacher grade counts behind the grade reports."""
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+    click.echo('grade counts rebuilt')
+
+
+@click.command('content-storage-report')
+@with_appcontext
+def content_storage_report():
+    """Report how much space compressed, deduplicated contents take against plain text."""
+    stats = ContentBlob.get_storage_stats()
+    click.echo('{references} contents stored in {blobs} blobs'.format(**stats))
+    click.echo('{text_bytes} bytes of text stored in {stored_bytes} bytes, {0} bytes saved'.format(
+        stats['text_bytes'] - stats['stored_bytes'], **stats
+    ))
+
+
+@click.group('profiles')
+def profiles():
+    """List and read the request profiles saved in PROFILER_DIR."""
+
+
+@profiles.command('list')
+@click.option('--limit', type=click.IntRange(min=1), default=20, show_default=True)
+@with_appcontext
+def list_profiles(limit):
+    """List the latest profiles, one per line."""
+    for details in profiling.list_profiles(current_app.config['PROFILER_DIR'])[:limit]:
+        click.echo('{0}  {1}  {2:>9.1f} ms  {3} {4} {5} ({6})'.format(
+            datetime.datetime.fromtimestamp(details['time']).isoformat(timespec='seconds'), details['request_id'],
+            details['seconds'] * 1000, details['status'], details['method'], details['path'], details['trigger'],
+        ))
+
+
+@profiles.command('show')
+@click.argument('request_id')
+@click.option('--sort', type=click.Choice(['cumulative', 'tottime', 'ncalls']), default='cumulative', show_default=True)
+@click.option('--limit', type=click.IntRange(min=1), default=25, show_default=True)
+@with_appcontext
+def show_profile(request_id, sort, limit):
+    """Print the functions of the profile of REQUEST_ID that took the most time."""
+    try:
+        click.echo(profiling.summarize(current_app.config['PROFILER_DIR'], request_id, sort, limit))
+    except FileNotFoundError as err:
+        raise click.ClickException(str(err)) from None
+
+
+@profiles.command('token')
+@click.option('--ttl', type=click.IntRange(min=1), default=300, show_default=True, help='Seconds the token is valid.')
+@with_appcontext
+def profile_token(ttl):
+    """Print an X-Profile header value asking for the profile of a request, signed with PROFILER_SECRET."""
+    if not current_app.config['PROFILER_SECRET']:
+        raise click.ClickException('PROFILER_SECRET is not set')
+    click.echo(profiling.make_token(current_app.config['PROFILER_SECRET'], ttl))
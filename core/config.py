@@ -0,0 +1,228 @@
+"""
+Settings of the app, read from the environment once at startup.
+
+APP_ENV picks a profile (dev, test or prod) holding the default of every setting, any setting can
+then be overridden by the environment variable of the same name. Every value is parsed and checked
+here, a misconfiguration stops the app from starting with the list of what is wrong.
+"""
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+from sqlalchemy.pool import QueuePool
+from core.libs import profiling, sqlite
+
+
+class ConfigError(ValueError):
+    """Settings that are malformed or out of range, raised before the app starts"""
+
+
+def _integer(minimum):
+    def parse(value):
+        value = int(value)
+        if value < minimum:
+            raise ValueError('should be at least {0}'.format(minimum))
+        return value
+    return parse
+
+
+def _number(minimum):
+    def parse(value):
+        value = float(value)
+        if not value >= minimum:  # also refuses nan
+            raise ValueError('should be at least {0:g}'.format(minimum))
+        return value
+    return parse
+
+
+def _fraction(value):
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError('should be between 0 and 1')
+    return value
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError('should be true or false')
+
+
+def _choice(*choices):
+    def parse(value):
+        if value not in choices:
+            raise ValueError('should be one of {0}'.format(', '.join(choices)))
+        return value
+    return parse
+
+
+def _database_url(value):
+    try:
+        make_url(value)
+    except ArgumentError as err:
+        raise ValueError(str(err)) from None
+    return value
+
+
+def _optional(parse):
+    def parse_optional(value):
+        return parse(value) if value else value
+    return parse_optional
+
+
+# setting: parser of its environment variable
+SETTINGS = {
+    'DATABASE_URL': _database_url,
+    # database of the read-only requests, empty for read-only connections to DATABASE_URL
+    'DATABASE_READ_URL': _optional(_database_url),
+    'DB_READ_ROUTING': _boolean,
+    'SQLALCHEMY_ECHO': _boolean,
+    # connections kept open per worker, 0 opens one per checkout; SQLite runs its PRAGMAs on every open
+    'DB_POOL_SIZE': _integer(0),
+    'DB_MAX_OVERFLOW': _integer(0),
+    'DB_POOL_TIMEOUT': _number(0),
+    # seconds after which a pooled connection is replaced, -1 keeps them
+    'DB_POOL_RECYCLE': _integer(-1),
+    'DB_POOL_PRE_PING': _boolean,
+    # compiled statements cached per engine, 0 turns the cache off
+    'DB_QUERY_CACHE_SIZE': _integer(0),
+    'SQLITE_PROFILE': _choice(*sqlite.PROFILES),
+    'SQLITE_PRAGMAS': str,
+    'RESPONSE_CACHE_BACKEND': _choice('lru', 'null'),
+    'RESPONSE_CACHE_MAX_ENTRIES': _integer(1),
+    'RESPONSE_CACHE_TTL': _number(0),
+    'AUTH_CACHE_MAX_ENTRIES': _integer(1),
+    'AUTH_CACHE_TTL': _number(0),
+    # rows fetched per query while streaming a listing, and rows per chunk written to the socket
+    'STREAM_BATCH_SIZE': _integer(1),
+    'STREAM_CHUNK_ROWS': _integer(1),
+    'IMPORT_CHUNK_SIZE': _integer(1),
+    # request metrics served by /metrics, see core.apis.metrics
+    'METRICS_ENABLED': _boolean,
+    # JSON lines file of the statements slower than SLOW_QUERY_SECONDS, empty for none, see core.libs.slow_queries
+    'SLOW_QUERY_LOG': str,
+    'SLOW_QUERY_SECONDS': _number(0),
+    'SLOW_QUERY_LOG_MAX_BYTES': _integer(1),
+    'SLOW_QUERY_LOG_BACKUPS': _integer(0),
+    # requests profiled when signed with the secret, or at random at the rate, see core.apis.profiling
+    'PROFILER_SECRET': str,
+    'PROFILER_SAMPLE_RATE': _fraction,
+    'PROFILER_DIR': str,
+}
+
+_DEV = {
+    'DATABASE_URL': 'sqlite:///./store.sqlite3',
+    'DATABASE_READ_URL': '',
+    'DB_READ_ROUTING': True,
+    'SQLALCHEMY_ECHO': False,
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30.0,
+    'DB_POOL_RECYCLE': -1,
+    'DB_POOL_PRE_PING': False,
+    'DB_QUERY_CACHE_SIZE': 500,
+    'SQLITE_PROFILE': sqlite.DEFAULT_PROFILE,
+    'SQLITE_PRAGMAS': '',
+    'RESPONSE_CACHE_BACKEND': 'lru',
+    'RESPONSE_CACHE_MAX_ENTRIES': 1024,
+    'RESPONSE_CACHE_TTL': 30.0,
+    'AUTH_CACHE_MAX_ENTRIES': 4096,
+    'AUTH_CACHE_TTL': 60.0,
+    'STREAM_BATCH_SIZE': 500,
+    'STREAM_CHUNK_ROWS': 100,
+    'IMPORT_CHUNK_SIZE': 1000,
+    'METRICS_ENABLED': True,
+    'SLOW_QUERY_LOG': '',
+    'SLOW_QUERY_SECONDS': 0.1,
+    'SLOW_QUERY_LOG_MAX_BYTES': 10 * 2 ** 20,
+    'SLOW_QUERY_LOG_BACKUPS': 5,
+    'PROFILER_SECRET': '',
+    'PROFILER_SAMPLE_RATE': 0.0,
+    'PROFILER_DIR': profiling.DEFAULT_PROFILER_DIR,
+}
+
+PROFILES = {
+    'dev': _DEV,
+    # the suite rebuilds its database at will, commits need not survive a power cut
+    'test': dict(_DEV, SQLITE_PRAGMAS='synchronous=OFF'),
+    'prod': dict(_DEV, DB_POOL_SIZE=10, DB_MAX_OVERFLOW=20, DB_QUERY_CACHE_SIZE=1200),
+}
+
+DEFAULT_PROFILE = 'dev'
+
+# prefixes of the variables read here, a variable with one of them that is not a setting is a typo
+_PREFIXES = ('DB_POOL_', 'DB_QUERY_', 'DB_READ_', 'SQLITE_', 'RESPONSE_CACHE_', 'AUTH_CACHE_', 'METRICS_', 'SLOW_QUERY_', 'PROFILER_')
+# read from the environment elsewhere, see core.libs.cache and core.libs.metrics
+_READ_ELSEWHERE = {'RESPONSE_CACHE_GENERATIONS_FILE', 'METRICS_DIR'}
+
+
+def _engine_options(settings):
+    options = {
+        'query_cache_size': settings['DB_QUERY_CACHE_SIZE'],
+        'pool_recycle': settings['DB_POOL_RECYCLE'],
+        'pool_pre_ping': settings['DB_POOL_PRE_PING'],
+    }
+    url = make_url(settings['DATABASE_URL'])
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+    if settings['DB_POOL_SIZE'] and not in_memory:
+        options.update(
+            pool_size=settings['DB_POOL_SIZE'],
+            max_overflow=settings['DB_MAX_OVERFLOW'],
+            pool_timeout=settings['DB_POOL_TIMEOUT'],
+        )
+        if url.get_backend_name() == 'sqlite':
+            # Flask-SQLAlchemy gives SQLite files a NullPool. A pooled connection is only used by one
+            # thread at a time, but not always the one that opened it.
+            options['poolclass'] = QueuePool
+            options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+def load_config(environ=os.environ):
+    """The Flask config of the APP_ENV profile with the environment's overrides, raises ConfigError if invalid"""
+    errors = []
+    profile = environ.get('APP_ENV', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ConfigError('APP_ENV should be one of {0}, got {1!r}'.format(', '.join(PROFILES), profile))
+
+    settings = dict(PROFILES[profile])
+    for name, parse in SETTINGS.items():
+        if name in environ:
+            try:
+                settings[name] = parse(environ[name].strip())
+            except ValueError as err:
+                errors.append('{0}={1!r}: {2}'.format(name, environ[name], err))
+    errors.extend(
+        '{0} is not a setting'.format(name) for name in sorted(environ)
+        if name.startswith(_PREFIXES) and name not in SETTINGS and name not in _READ_ELSEWHERE
+    )
+    try:
+        sqlite_pragmas = sqlite.get_pragmas(settings['SQLITE_PROFILE'], settings['SQLITE_PRAGMAS'])
+    except ValueError as err:
+        errors.append('SQLITE_PRAGMAS={0!r}: {1}'.format(settings['SQLITE_PRAGMAS'], err))
+    if errors:
+        raise ConfigError('invalid configuration ({0} profile):\n  {1}'.format(profile, '\n  '.join(errors)))
+
+    return {
+        'APP_ENV': profile,
+        'SQLALCHEMY_DATABASE_URI': settings['DATABASE_URL'],
+        'DATABASE_READ_URL': settings['DATABASE_READ_URL'],
+        'DB_READ_ROUTING': settings['DB_READ_ROUTING'],
+        'SQLALCHEMY_ECHO': settings['SQLALCHEMY_ECHO'],
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': _engine_options(settings),
+        'SQLITE_PRAGMAS': sqlite_pragmas,
+        **{
+            name: settings[name] for name in (
+                'RESPONSE_CACHE_BACKEND', 'RESPONSE_CACHE_MAX_ENTRIES', 'RESPONSE_CACHE_TTL',
+                'AUTH_CACHE_MAX_ENTRIES', 'AUTH_CACHE_TTL',
+                'STREAM_BATCH_SIZE', 'STREAM_CHUNK_ROWS', 'IMPORT_CHUNK_SIZE', 'METRICS_ENABLED',
+                'SLOW_QUERY_LOG', 'SLOW_QUERY_SECONDS', 'SLOW_QUERY_LOG_MAX_BYTES', 'SLOW_QUERY_LOG_BACKUPS',
+                'PROFILER_SECRET', 'PROFILER_SAMPLE_RATE', 'PROFILER_DIR',
+            )
+        },
+    }
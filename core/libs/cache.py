@@ -0,0 +1,198 @@
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+GENERATION_SLOTS = 4096
+_SLOT = struct.Struct('<Q')
+
+DEFAULT_GENERATIONS_FILE = os.path.join(tempfile.gettempdir(), 'fyle-response-cache.generations')
+
+
+class GenerationCounters:
+    """
+    A counter per scope, in a small file every worker process maps into memory. Scopes are hashed
+    into GENERATION_SLOTS slots, two scopes sharing a slot only invalidate each other more often.
+    Bumps take an exclusive lock on the file, reads are a plain load from the mapping.
+    """
+    def __init__(self, path=DEFAULT_GENERATIONS_FILE, slots=GENERATION_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def _mapping(self):
+        if self._mmap is None:
+            with self._lock:
+                if self._mmap is None:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        size = self.slots * _SLOT.size
+                        if os.fstat(fd).st_size < size:
+                            os.ftruncate(fd, size)
+                        self._fd = fd
+                        self._mmap = mmap.mmap(fd, size)
+                    except OSError:
+                        os.close(fd)
+                        raise
+        return self._mmap
+
+    def _offset(self, scope):
+        return (zlib.crc32(scope.encode('utf8')) % self.slots) * _SLOT.size
+
+    def get(self, scope):
+        return _SLOT.unpack_from(self._mapping(), self._offset(scope))[0]
+
+    def bump(self, scopes):
+        mapping = self._mapping()
+        offsets = sorted({self._offset(scope) for scope in scopes})
+        if not offsets:
+            return
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for offset in offsets:
+                    _SLOT.pack_into(mapping, offset, _SLOT.unpack_from(mapping, offset)[0] + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+
+class LRUCache:
+    """In-process cache of at most `max_entries` values, each kept for `ttl` seconds at most"""
+    def __init__(self, max_entries, ttl, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class NullCache:
+    """Backend that never keeps anything, for running without a response cache"""
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class ResponseCache:
+    """
+    Values stored with the generations of the scopes they were computed from. A value is only
+    served while none of those scopes was bumped since, by this worker or any other.
+    """
+    def __init__(self, backend, generations):
+        self.backend = backend
+        self.generations = generations
+        self.hits = 0
+        self.misses = 0
+        # gthread workers serve requests from several threads, `+= 1` alone could lose counts
+        self._stats_lock = threading.Lock()
+
+    def get_or_compute(self, key, scopes, compute, cacheable=lambda value: True):
+        """Returns (value, hit): the cached value of `key` if still valid, else the result of `compute()`"""
+        generations = tuple(self.generations.get(scope) for scope in scopes)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == generations:
+            with self._stats_lock:
+                self.hits += 1
+            return entry[1], True
+
+        with self._stats_lock:
+            self.misses += 1
+        # read before computing: a write landing meanwhile leaves the entry already outdated
+        value = compute()
+        if cacheable(value):
+            self.backend.set(key, (generations, value))
+        elif entry is not None:
+            self.backend.delete(key)
+        return value, False
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        return {'hits': hits, 'misses': misses, 'entries': len(self.backend)}
+
+
+_INVALIDATED_SCOPES = 'invalidated_cache_scopes'
+_scope_generations = None
+_scope_generations_lock = threading.Lock()
+
+
+def get_scope_generations():
+    """The counters of this process, on the file named by RESPONSE_CACHE_GENERATIONS_FILE"""
+    global _scope_generations  # pylint: disable=global-statement
+    if _scope_generations is None:
+        with _scope_generations_lock:
+            if _scope_generations is None:
+                _scope_generations = GenerationCounters(
+                    os.environ.get('RESPONSE_CACHE_GENERATIONS_FILE', DEFAULT_GENERATIONS_FILE)
+                )
+    return _scope_generations
+
+
+def invalidate(session, scopes):
+    """Bumps `scopes` once the session commits, so no worker caches what was read before the commit"""
+    session.info.setdefault(_INVALIDATED_SCOPES, set()).update(scopes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_invalidated_scopes(session):
+    scopes = session.info.pop(_INVALIDATED_SCOPES, None)
+    if scopes:
+        get_scope_generations().bump(scopes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_invalidated_scopes(session):
+    session.info.pop(_INVALIDATED_SCOPES, None)
@@ -0,0 +1,35 @@
+import hashlib
+import zlib
+
+ZLIB_LEVEL = 6
+
+# texts shorter than this are stored raw, zlib's header and checksum would outweigh any saving
+MIN_COMPRESS_BYTES = 64
+
+# first byte of a raw blob. zlib streams start with 0x78, so blobs stored before the marker existed
+# still read as compressed
+RAW_MARKER = b'\x00'
+
+
+def content_hash(text):
+    """Key of a stored content: the sha256 of its UTF-8 encoding, as hex"""
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+def compress(text):
+    """The blob of `text`: zlib-compressed, or raw behind RAW_MARKER when compressing would not shrink it"""
+    encoded = text.encode('utf8')
+    if len(encoded) >= MIN_COMPRESS_BYTES:
+        compressed = zlib.compress(encoded, ZLIB_LEVEL)
+        if len(compressed) <= len(encoded):
+            return compressed
+    return RAW_MARKER + encoded
+
+
+def decompress(data):
+    """Inverse of `compress`, also registered as the `inflate()` SQL function so queries can read contents"""
+    if data is None:
+        return None
+    if data[:1] == RAW_MARKER:
+        return bytes(data[1:]).decode('utf8')
+    return zlib.decompress(data).decode('utf8')
@@ -0,0 +1,191 @@
+"""
+Counters and histograms shared by the gunicorn workers of a host, in the Prometheus text format.
+
+Every process adds to the values of its own file in METRICS_DIR, so updating them takes no lock
+between processes; a scrape reads and sums the files of every process, the ones of exited workers
+included so counters never go down. The directory is emptied when gunicorn starts.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+# gunicorn_config.py empties the same directory, keep both defaults in sync
+DEFAULT_METRICS_DIR = os.path.join(tempfile.gettempdir(), 'fyle-metrics')
+
+_HEADER = struct.Struct('<Q')  # bytes of the file in use
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+
+class ProcessValues:
+    """
+    Float values by key in a file only this process writes. Entries are appended as
+    (key length, key, padding, value) with the value 8-byte aligned, and the header counting the
+    bytes in use is updated last, so readers never parse an entry that is half written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._offsets = {}
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, _INITIAL_SIZE)
+            self._mmap = mmap.mmap(fd, _INITIAL_SIZE)
+        finally:
+            os.close(fd)
+        self._used = _HEADER.size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+
+    def _append(self, key):
+        encoded = key.encode('utf8')
+        value_offset = self._used + _KEY_LENGTH.size + len(encoded)
+        value_offset += -value_offset % _VALUE.size
+        used = value_offset + _VALUE.size
+        if used > len(self._mmap):
+            size = len(self._mmap)
+            while size < used:
+                size *= 2
+            self._mmap.resize(size)
+        _KEY_LENGTH.pack_into(self._mmap, self._used, len(encoded))
+        self._mmap[self._used + _KEY_LENGTH.size:self._used + _KEY_LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self._mmap, value_offset, 0.0)
+        self._used = used
+        _HEADER.pack_into(self._mmap, 0, used)
+        self._offsets[key] = value_offset
+        return value_offset
+
+    def add(self, amounts):
+        """Adds the amounts of a {key: amount} dict to their values"""
+        with self._lock:
+            for key, amount in amounts.items():
+                offset = self._offsets.get(key) or self._append(key)
+                _VALUE.pack_into(self._mmap, offset, _VALUE.unpack_from(self._mmap, offset)[0] + amount)
+
+
+def read_values(path):
+    """The {key: value} of a ProcessValues file, written by any process"""
+    with open(path, 'rb') as values_file:
+        data = values_file.read()
+    values = {}
+    if len(data) < _HEADER.size:
+        return values
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    offset = _HEADER.size
+    while offset + _KEY_LENGTH.size <= used:
+        (length,) = _KEY_LENGTH.unpack_from(data, offset)
+        value_offset = offset + _KEY_LENGTH.size + length
+        value_offset += -value_offset % _VALUE.size
+        if value_offset + _VALUE.size > used:
+            break
+        key = data[offset + _KEY_LENGTH.size:offset + _KEY_LENGTH.size + length].decode('utf8')
+        values[key] = _VALUE.unpack_from(data, value_offset)[0]
+        offset = value_offset + _VALUE.size
+    return values
+
+
+def key(name, labels):
+    """The key of metric `name` with the (label, value) pairs `labels`"""
+    return json.dumps([name, labels], separators=(',', ':'))
+
+
+def bucket(value, buckets):
+    """The smallest bound of `buckets` at or above `value`, +Inf above them all"""
+    return next((bound for bound in buckets if value <= bound), math.inf)
+
+
+def histogram_amounts(name, labels, value, buckets):
+    """{key: amount} observing `value` in histogram `name`: its bucket, sum and count"""
+    return {
+        key(name + '_bucket', labels + [['le', format_number(bucket(value, buckets))]]): 1,
+        key(name + '_sum', labels): value,
+        key(name + '_count', labels): 1,
+    }
+
+
+class Registry:
+    """The ProcessValues of this process in a directory, reopened after a fork"""
+    def __init__(self, directory=None):
+        self.directory = directory or os.environ.get('METRICS_DIR', DEFAULT_METRICS_DIR)
+        self._values = None
+        self._lock = threading.Lock()
+
+    def add(self, amounts):
+        values = self._values
+        if values is None or values.pid != os.getpid():
+            with self._lock:
+                if self._values is None or self._values.pid != os.getpid():
+                    os.makedirs(self.directory, exist_ok=True)
+                    path = os.path.join(self.directory, 'metrics-{0}.db'.format(os.getpid()))
+                    self._values = ProcessValues(path)
+                values = self._values
+        values.add(amounts)
+
+    def collect(self):
+        """The values of every process of the directory, summed by key"""
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.db')):
+            try:
+                values = read_values(path)
+            except FileNotFoundError:
+                continue
+            for value_key, value in values.items():
+                totals[value_key] = totals.get(value_key, 0.0) + value
+        return totals
+
+
+def format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ) + '}'
+
+
+def render(values, descriptions, buckets):
+    """
+    The Prometheus text exposition of `values` for the metrics of `descriptions`, a
+    {name: (type, help)} dict, with every bound of `buckets[name]` for histograms. Buckets are
+    stored per bound, they are made cumulative here.
+    """
+    samples = {}
+    for value_key, value in values.items():
+        name, labels = json.loads(value_key)
+        samples.setdefault(name, []).append((tuple(map(tuple, labels)), value))
+
+    lines = []
+    for name, (metric_type, description) in descriptions.items():
+        lines.append('# HELP {0} {1}'.format(name, description))
+        lines.append('# TYPE {0} {1}'.format(name, metric_type))
+        if metric_type != 'histogram':
+            for labels, value in sorted(samples.get(name, [])):
+                lines.append('{0}{1} {2}'.format(name, _format_labels(labels), format_number(value)))
+            continue
+
+        counts = {}
+        for labels, value in samples.get(name + '_bucket', []):
+            counts.setdefault(labels[:-1], {})[float(labels[-1][1])] = value
+        sums = dict(samples.get(name + '_sum', []))
+        for series in sorted(counts):
+            cumulative = 0.0
+            for le in list(buckets[name]) + [math.inf]:
+                cumulative += counts[series].get(le, 0.0)
+                lines.append('{0}_bucket{1} {2}'.format(
+                    name, _format_labels(series + (('le', format_number(le)),)), format_number(cumulative)
+                ))
+            lines.append('{0}_sum{1} {2}'.format(name, _format_labels(series), format_number(sums.get(series, 0.0))))
+            lines.append('{0}_count{1} {2}'.format(name, _format_labels(series), format_number(cumulative)))
+    return '\n'.join(lines) + '\n'
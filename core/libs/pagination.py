@@ -0,0 +1,76 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from . import assertions
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# ids are bound as SQLite INTEGERs, 64-bit signed
+_MAX_ID = 2 ** 63 - 1
+
+
+def _encode(key):
+    raw = json.dumps(key, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf8')).decode('ascii')
+
+
+def _decode(cursor, parse):
+    try:
+        return parse(*json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+    except (ValueError, TypeError, OverflowError, binascii.Error):
+        assertions.base_assert(400, 'invalid cursor')
+
+
+def _row_id(value):
+    _id = int(value)
+    if not -_MAX_ID - 1 <= _id <= _MAX_ID:
+        raise ValueError('id out of range')
+    return _id
+
+
+def encode_cursor(updated_at, _id):
+    """Opaque cursor pointing just after the row with this (updated_at, id) key"""
+    return _encode([updated_at.isoformat(), _id])
+
+
+def decode_cursor(cursor):
+    return _decode(cursor, lambda updated_at, _id: (datetime.fromisoformat(updated_at), _row_id(_id)))
+
+
+def encode_rank_cursor(rank, _id):
+    """Opaque cursor pointing just after the search result with this (rank, id) key"""
+    return _encode([rank, _id])
+
+
+def decode_rank_cursor(cursor):
+    return _decode(cursor, lambda rank, _id: (float(rank), _row_id(_id)))
+
+
+def get_page_args(args, decode=decode_cursor):
+    """Reads the `limit` and `cursor` query params of a keyset paginated listing"""
+    limit = args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = None
+    assertions.assert_valid(
+        limit is not None and 0 < limit <= MAX_PAGE_SIZE,
+        'limit should be between 1 and {0}'.format(MAX_PAGE_SIZE)
+    )
+    cursor = args.get('cursor')
+    if cursor:
+        cursor = decode(cursor)
+    return limit, cursor or None
+
+
+def paginate(rows, limit, cursor_of=lambda row: encode_cursor(row.updated_at, row.id)):
+    """
+    Splits the rows of a keyset query, fetched with one extra row beyond `limit`,
+    into the page itself and the cursor of the next page (None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
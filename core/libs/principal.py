@@ -0,0 +1,7 @@
+class AuthPrincipal:
+    """Who a request acts for, the ids of its X-Principal header once verified"""
+    def __init__(self, user_id, student_id=None, teacher_id=None, principal_id=None):
+        self.user_id = user_id
+        self.student_id = student_id
+        self.teacher_id = teacher_id
+        self.principal_id = principal_id
@@ -0,0 +1,76 @@
+"""
+cProfile profiles of single requests. Each one is saved in PROFILER_DIR as <request id>.pstats,
+readable by pstats or snakeviz, next to a <request id>.json describing the request.
+
+A client asks for a profile with an X-Profile token: an expiry time signed with PROFILER_SECRET,
+so only whoever holds the secret can make the app spend time profiling.
+"""
+import glob
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+import uuid
+
+DEFAULT_PROFILER_DIR = os.path.join(tempfile.gettempdir(), 'fyle-profiles')
+
+# request ids usable as file names, anything else gets a generated one
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9._-]{0,63}$')
+
+
+def request_id(header):
+    """The X-Request-Id `header` if it is a safe file name, else a new id"""
+    return header if header and _REQUEST_ID.match(header) else uuid.uuid4().hex
+
+
+def _signature(secret, expires):
+    return hmac.new(secret.encode('utf8'), str(expires).encode('utf8'), hashlib.sha256).hexdigest()
+
+
+def make_token(secret, ttl):
+    """An X-Profile token valid for `ttl` seconds"""
+    expires = int(time.time() + ttl)
+    return '{0}.{1}'.format(expires, _signature(secret, expires))
+
+
+def verify_token(secret, token):
+    """Whether `token` was signed with `secret` and has not expired"""
+    expires, _, signature = token.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(secret, int(expires)))
+
+
+def save(directory, profile_id, profiler, details):
+    """Writes the stats of a disabled cProfile.Profile and the `details` of its request"""
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, profile_id + '.pstats'))
+    with open(os.path.join(directory, profile_id + '.json'), 'w', encoding='utf8') as details_file:
+        json.dump(dict(details, request_id=profile_id), details_file)
+
+
+def list_profiles(directory):
+    """The details of the profiles of `directory`, the latest first"""
+    profiles = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path, encoding='utf8') as details_file:
+                profiles.append(json.load(details_file))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda details: details['time'], reverse=True)
+
+
+def summarize(directory, profile_id, sort='cumulative', limit=25):
+    """The `limit` functions of a profile with the most `sort` time, as printed by pstats"""
+    path = os.path.join(directory, profile_id + '.pstats')
+    if not _REQUEST_ID.match(profile_id) or not os.path.exists(path):
+        raise FileNotFoundError('no profile {0!r} in {1}'.format(profile_id, directory))
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
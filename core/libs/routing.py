@@ -0,0 +1,138 @@
+"""
+Routes the statements of read-only requests to a second engine, so readers never wait on the
+connections or locks of writers. The read engine opens SQLite files with mode=ro and query_only
+on, a write slipping into a read-only request fails instead of reaching the primary.
+"""
+import os
+import threading
+from urllib.parse import quote
+
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine import make_url
+from . import slow_queries, sqlite
+
+try:
+    # the running greenlet, or the running thread's main greenlet outside of gevent
+    from greenlet import getcurrent as current_task
+except ImportError:  # pragma: no cover
+    from threading import get_ident as current_task
+
+_READ_ONLY = 'read_only'
+# engine option passing the app's SQLITE_PRAGMAS from apply_driver_hacks to create_engine
+_SQLITE_PRAGMAS = 'sqlite_pragmas'
+# and the app's SlowQueryLog
+_SLOW_QUERY_LOG = 'slow_query_log'
+_read_engine_lock = threading.Lock()
+
+
+def read_only_url(url, root_path):
+    """
+    `url` opened read-only: SQLite files become mode=ro URIs, relative paths resolved against
+    `root_path` like Flask-SQLAlchemy does for the primary. Other databases are returned as is.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:') or url.query.get('uri'):
+        return url
+    path = quote(os.path.normpath(os.path.join(root_path, url.database)))
+    return url.set(database='file:{0}'.format(path), query=dict(url.query, mode='ro', uri='true'))
+
+
+def _set_query_only(dbapi_connection, connection_record):
+    # pylint: disable=unused-argument
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON;')
+    cursor.close()
+
+
+def _create_read_engine(app):
+    read_url = app.config['DATABASE_READ_URL'] or app.config['SQLALCHEMY_DATABASE_URI']
+    primary = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    in_memory = primary.get_backend_name() == 'sqlite' and primary.database in (None, '', ':memory:')
+    if not app.config['DB_READ_ROUTING'] or in_memory:
+        return None
+    read_engine = create_engine(read_only_url(read_url, app.root_path), **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    if read_engine.dialect.name == 'sqlite':
+        event.listen(read_engine, 'connect', sqlite.connect_listener(app.config['SQLITE_PRAGMAS']))
+        event.listen(read_engine, 'connect', _set_query_only)
+    if slow_queries.get_log(app) is not None:
+        slow_queries.listen(read_engine, slow_queries.get_log(app))
+    return read_engine
+
+
+def get_read_engine(app):
+    """
+    The app's engine for read-only requests, on DATABASE_READ_URL or else read-only connections to
+    the primary database, built on first use with the primary's engine options. None when routing
+    is off or the primary is an in-memory SQLite database, which no other engine can see.
+    """
+    if 'read_engine' not in app.extensions:
+        with _read_engine_lock:
+            if 'read_engine' not in app.extensions:
+                app.extensions['read_engine'] = _create_read_engine(app)
+    return app.extensions['read_engine']
+
+
+def dispose_engines(app):
+    """
+    Closes the pooled connections of the app's engines, the workers forked from a master that
+    preloaded the app call it so they never share a connection with the master or each other
+    """
+    app.extensions['sqlalchemy'].db.get_engine(app).dispose()
+    if app.extensions.get('read_engine') is not None:
+        app.extensions['read_engine'].dispose()
+
+
+class RoutingSession(SignallingSession):
+    """Session running every statement on the read engine once `use_read_engine` was called on it"""
+    def get_bind(self, mapper=None, clause=None):
+        if self.info.get(_READ_ONLY):
+            read_engine = get_read_engine(self.app)
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    Flask-SQLAlchemy whose sessions are RoutingSessions, one per thread of a gthread worker and
+    one per greenlet of a gevent worker, each removed when its request's app context ends.
+    Its SQLite engines set up their connections with the SQLITE_PRAGMAS of their app, and every
+    engine writes its slow statements to the app's SLOW_QUERY_LOG.
+    """
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        options[_SQLITE_PRAGMAS] = app.config['SQLITE_PRAGMAS']
+        options[_SLOW_QUERY_LOG] = slow_queries.get_log(app)
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine_opts = dict(engine_opts)
+        pragmas = engine_opts.pop(_SQLITE_PRAGMAS)
+        slow_query_log = engine_opts.pop(_SLOW_QUERY_LOG)
+        engine = super().create_engine(sa_url, engine_opts)
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', sqlite.connect_listener(pragmas))
+        if slow_query_log is not None:
+            slow_queries.listen(engine, slow_query_log)
+        return engine
+
+    def create_scoped_session(self, options=None):
+        options = dict(options or {})
+        options.setdefault('scopefunc', current_task)
+        return super().create_scoped_session(options)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def use_read_engine(session):
+    """Sends what `session` runs from now on to the read engine, without flushing anything first"""
+    session.info[_READ_ONLY] = True
+    session.autoflush = False
+
+
+def use_primary_engine(session):
+    """Undoes `use_read_engine`"""
+    if session.info.pop(_READ_ONLY, False):
+        session.autoflush = True
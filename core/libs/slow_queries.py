@@ -0,0 +1,171 @@
+"""
+Slow query log: every statement running longer than SLOW_QUERY_SECONDS is written as a JSON line
+to SLOW_QUERY_LOG, with its duration, the types of its parameters (never their values) and the
+endpoint or command that ran it. SQLite statements also get their query plan, explained once per
+statement and process. A plan is written in full the first time it appears in a file, later lines
+only carry its plan_id.
+
+The file is rotated at SLOW_QUERY_LOG_MAX_BYTES. Each process rotates its own handle, so with
+several workers put {pid} in the path to give each one its own file.
+"""
+import datetime
+import hashlib
+import json
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# statements whose plan is kept per process, the least recently logged is explained again
+_PLANS_KEPT = 1024
+_logs_lock = threading.Lock()
+
+
+def parameter_shape(parameters, executemany=False):
+    """The type names of `parameters`, by name or position, and the number of rows of an executemany"""
+    if executemany:
+        return {'rows': len(parameters), 'each': parameter_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def _caller():
+    if has_request_context():
+        return {'endpoint': request.endpoint, 'method': request.method}
+    command = click.get_current_context(silent=True)
+    return {'command': command.command_path if command is not None else None}
+
+
+def explain(cursor, statement, parameters):
+    """
+    The EXPLAIN QUERY PLAN of a statement as lines indented by depth, on the connection of the
+    SQLite `cursor` that ran it. None for statements SQLite cannot explain.
+    """
+    explain_cursor = cursor.connection.cursor()
+    try:
+        rows = explain_cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        explain_cursor.close()
+    depths, plan = {0: -1}, []
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        plan.append('  ' * depths[node_id] + detail)
+    return plan
+
+
+class SlowQueryLog:
+    """The JSON lines file of the statements slower than `threshold` seconds"""
+    def __init__(self, path, threshold, max_bytes, backups):
+        self.path = path
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._pid = None
+        self._handler = None
+        self._plans = OrderedDict()  # statement: (plan_id, plan)
+        self._written_plans = set()
+
+    def _process_handler(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._handler = logging.handlers.RotatingFileHandler(
+                self.path.format(pid=self._pid), maxBytes=self.max_bytes, backupCount=self.backups,
+                encoding='utf8', delay=True,
+            )
+            self._written_plans = set()
+        return self._handler
+
+    def query_plan(self, cursor, statement, parameters):
+        """(plan_id, plan) of a statement, explained on its first call only"""
+        with self._lock:
+            if statement in self._plans:
+                self._plans.move_to_end(statement)
+                return self._plans[statement]
+        plan = explain(cursor, statement, parameters)
+        plan_id = hashlib.sha1('\n'.join(plan).encode('utf8')).hexdigest()[:12] if plan is not None else None
+        with self._lock:
+            self._plans[statement] = (plan_id, plan)
+            if len(self._plans) > _PLANS_KEPT:
+                self._plans.popitem(last=False)
+        return plan_id, plan
+
+    def _record(self, entry, plan_id, plan):
+        if plan_id is not None and plan_id not in self._written_plans:
+            self._written_plans.add(plan_id)
+            entry = dict(entry, plan=plan)
+        return logging.makeLogRecord({'msg': json.dumps(entry, separators=(',', ':'))})
+
+    def write(self, entry, plan_id=None, plan=None):
+        """Appends `entry` with its plan_id, and the plan itself when the current file lacks it"""
+        if plan_id is not None:
+            entry = dict(entry, plan_id=plan_id)
+        with self._lock:
+            handler = self._process_handler()
+            record = self._record(entry, plan_id, plan)
+            if handler.shouldRollover(record):
+                handler.doRollover()
+                self._written_plans = set()
+                record = self._record(entry, plan_id, plan)
+            handler.handle(record)
+
+    def close(self):
+        with self._lock:
+            if self._handler is not None:
+                self._handler.close()
+
+
+def get_log(app):
+    """The app's SlowQueryLog, built on first use, None when SLOW_QUERY_LOG is empty"""
+    if 'slow_query_log' not in app.extensions:
+        with _logs_lock:
+            if 'slow_query_log' not in app.extensions:
+                path = app.config['SLOW_QUERY_LOG']
+                app.extensions['slow_query_log'] = SlowQueryLog(
+                    path, app.config['SLOW_QUERY_SECONDS'],
+                    app.config['SLOW_QUERY_LOG_MAX_BYTES'], app.config['SLOW_QUERY_LOG_BACKUPS'],
+                ) if path else None
+    return app.extensions['slow_query_log']
+
+
+def listen(engine, log):
+    """Writes the slow statements of `engine` to `log`, with their plan on SQLite"""
+    explains = engine.dialect.name == 'sqlite'
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument
+        if context is not None:
+            context.slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument
+        if context is None:
+            return
+        duration = time.perf_counter() - context.slow_query_started
+        if duration < log.threshold:
+            return
+        entry = {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'duration_seconds': round(duration, 6),
+            'statement': statement,
+            'parameters': parameter_shape(parameters, executemany),
+            **_caller(),
+        }
+        plan_id = plan = None
+        if explains:
+            plan_id, plan = log.query_plan(
+                cursor, statement, (parameters[0] if parameters else ()) if executemany else parameters
+            )
+        log.write(entry, plan_id, plan)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
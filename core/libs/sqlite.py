@@ -0,0 +1,112 @@
+"""
+PRAGMA profiles the connect hook applies to every SQLite connection, picked with SQLITE_PROFILE and
+adjusted pragma by pragma with SQLITE_PRAGMAS, e.g. "busy_timeout=10000,mmap_size=0".
+"""
+import sqlite3
+
+from . import compression
+
+# Every profile sets all of PRAGMA_VALUES, journal_mode is stored in the database file and would
+# otherwise stay whatever the last connection set.
+PROFILES = {
+    # SQLite's own defaults: rollback journal, readers block the writer and the writer blocks readers
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    # readers never block the writer nor each other, commits only fsync at checkpoints
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -16000,
+        'mmap_size': 256 * 2 ** 20,
+        'temp_store': 'MEMORY',
+    },
+    # WAL with an fsync per commit, no committed transaction is lost on power failure
+    'wal-durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -16000,
+        'mmap_size': 256 * 2 ** 20,
+        'temp_store': 'MEMORY',
+    },
+}
+
+DEFAULT_PROFILE = 'wal'
+
+# pragma: allowed keywords, or int for an integer value (cache_size < 0 is in KiB, > 0 in pages)
+PRAGMA_VALUES = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'busy_timeout': int,
+    'cache_size': int,
+    'mmap_size': int,
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+}
+
+
+def _pragma_value(name, value):
+    allowed = PRAGMA_VALUES.get(name)
+    if allowed is None:
+        raise ValueError('unsupported SQLite pragma {0!r}, expected one of {1}'.format(name, ', '.join(PRAGMA_VALUES)))
+    if allowed is int:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError('SQLite pragma {0} should be an integer, got {1!r}'.format(name, value)) from None
+    value = str(value).upper()
+    if value not in allowed:
+        raise ValueError('SQLite pragma {0} should be one of {1}, got {2!r}'.format(name, ', '.join(allowed), value))
+    return value
+
+
+def get_pragmas(profile=DEFAULT_PROFILE, overrides=''):
+    """
+    The pragmas of `profile` with the comma separated name=value `overrides` applied,
+    raises ValueError for an unknown profile, pragma or value
+    """
+    if profile not in PROFILES:
+        raise ValueError('unknown SQLite profile {0!r}, expected one of {1}'.format(profile, ', '.join(PROFILES)))
+    pragmas = dict(PROFILES[profile])
+    for override in filter(None, (item.strip() for item in overrides.split(','))):
+        name, separator, value = override.partition('=')
+        if not separator:
+            raise ValueError('SQLite pragma overrides should be name=value, got {0!r}'.format(override))
+        name = name.strip().lower()
+        pragmas[name] = _pragma_value(name, value.strip())
+    return pragmas
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Runs the PRAGMA statements on a new sqlite3 connection, values are validated by `get_pragmas`"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            try:
+                cursor.execute('PRAGMA {0}={1};'.format(name, _pragma_value(name, value)))
+            except sqlite3.OperationalError as err:
+                # the journal mode is stored in the file, a read-only connection reads it in the mode its writers set
+                if name != 'journal_mode' or 'readonly' not in str(err):
+                    raise
+    finally:
+        cursor.close()
+
+
+def connect_listener(pragmas):
+    """The "connect" listener of an engine on SQLite, setting up each sqlite3 connection it opens"""
+    def on_connect(dbapi_connection, connection_record):
+        # pylint: disable=unused-argument
+        # foreign keys are not enforced by default in sqlite3
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON;')
+        cursor.close()
+        apply_pragmas(dbapi_connection, pragmas)
+        # assignment contents are stored zlib-compressed or raw, inflate() lets SQL read them
+        dbapi_connection.create_function('inflate', 1, compression.decompress, deterministic=True)
+    return on_connect
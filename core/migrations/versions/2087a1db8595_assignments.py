@@ -5,14 +5,10 @@ Revises: 4078b3b57e24
 Create Date: 2021-09-16 10:11:14.484440
 
 """
+from datetime import datetime
+
 from alembic import op
 import sqlalchemy as sa
-from core import db
-from core.apis.decorators import AuthPrincipal
-from core.models.users import User
-from core.models.students import Student
-from core.models.teachers import Teacher
-from core.models.assignments import Assignment
 
 # revision identifiers, used by Alembic.
 revision = '2087a1db8595'
@@ -53,51 +49,48 @@ def upgrade():
     sa.PrimaryKeyConstraint('id')
     )
 
-    student_1 = Student(user_id=User.get_by_email('student1@fylebe.com').id)
-    student_2 = Student(user_id=User.get_by_email('student2@fylebe.com').id)
-    teacher_1 = Teacher(user_id=User.get_by_email('teacher1@fylebe.com').id)
-    teacher_2 = Teacher(user_id=User.get_by_email('teacher2@fylebe.com').id)
-
-    db.session.add(student_1)
-    db.session.add(student_2)
-    db.session.add(teacher_1)
-    db.session.add(teacher_2)
-    db.session.flush()
-
-    assignment_1 = Assignment(student_id=student_1.id, content='ESSAY T1')
-    assignment_2 = Assignment(student_id=student_1.id, content='THESIS T1')
-    assignment_3 = Assignment(student_id=student_2.id, content='ESSAY T2')
-    assignment_4 = Assignment(student_id=student_2.id, content='THESIS T2')
-
-    assignment_5 = Assignment(student_id=student_1.id, content='SOLUTION T1')
-
-    db.session.add(assignment_1)
-    db.session.add(assignment_2)
-    db.session.add(assignment_3)
-    db.session.add(assignment_4)
-    db.session.add(assignment_5)
-
-    db.session.flush()
-
-    Assignment.submit(
-        _id=assignment_1.id,
-        teacher_id=teacher_1.id,
-        auth_principal=AuthPrincipal(user_id=student_1.user_id, student_id=student_1.id)
+    # seed data goes through frozen table definitions rather than the models, which describe the latest schema
+    connection = op.get_bind()
+    users = sa.table('users', sa.column('id', sa.Integer()), sa.column('email', sa.String()))
+    students = sa.table('students',
+        sa.column('id', sa.Integer()), sa.column('user_id', sa.Integer()),
+        sa.column('created_at', sa.TIMESTAMP(timezone=True)), sa.column('updated_at', sa.TIMESTAMP(timezone=True))
     )
-
-    Assignment.submit(
-        _id=assignment_3.id,
-        teacher_id=teacher_2.id,
-        auth_principal=AuthPrincipal(user_id=student_2.user_id, student_id=student_2.id)
+    teachers = sa.table('teachers',
+        sa.column('id', sa.Integer()), sa.column('user_id', sa.Integer()),
+        sa.column('created_at', sa.TIMESTAMP(timezone=True)), sa.column('updated_at', sa.TIMESTAMP(timezone=True))
     )
-
-    Assignment.submit(
-        _id=assignment_4.id,
-        teacher_id=teacher_2.id,
-        auth_principal=AuthPrincipal(user_id=student_2.user_id, student_id=student_2.id)
+    assignments = sa.table('assignments',
+        sa.column('id', sa.Integer()), sa.column('student_id', sa.Integer()), sa.column('teacher_id', sa.Integer()),
+        sa.column('content', sa.Text()), sa.column('state', sa.String()),
+        sa.column('created_at', sa.TIMESTAMP(timezone=True)), sa.column('updated_at', sa.TIMESTAMP(timezone=True))
     )
-
-    db.session.commit()
+    user_ids = dict(connection.execute(sa.select(users.c.email, users.c.id)).fetchall())
+
+    def insert(table, **values):
+        now = datetime.utcnow()
+        return connection.execute(
+            table.insert().values(created_at=now, updated_at=now, **values)
+        ).lastrowid
+
+    student_1 = insert(students, user_id=user_ids['student1@fylebe.com'])
+    student_2 = insert(students, user_id=user_ids['student2@fylebe.com'])
+    teacher_1 = insert(teachers, user_id=user_ids['teacher1@fylebe.com'])
+    teacher_2 = insert(teachers, user_id=user_ids['teacher2@fylebe.com'])
+
+    assignment_1 = insert(assignments, student_id=student_1, content='ESSAY T1', state='DRAFT')
+    insert(assignments, student_id=student_1, content='THESIS T1', state='DRAFT')
+    assignment_3 = insert(assignments, student_id=student_2, content='ESSAY T2', state='DRAFT')
+    assignment_4 = insert(assignments, student_id=student_2, content='THESIS T2', state='DRAFT')
+
+    insert(assignments, student_id=student_1, content='SOLUTION T1', state='DRAFT')
+
+    for assignment_id, teacher_id in [(assignment_1, teacher_1), (assignment_3, teacher_2), (assignment_4, teacher_2)]:
+        connection.execute(
+            assignments.update().where(assignments.c.id == assignment_id).values(
+                teacher_id=teacher_id, state='SUBMITTED', updated_at=datetime.utcnow()
+            )
+        )
     # ### end Alembic commands ###
 
 
@@ -0,0 +1,38 @@
+"""assignments indexes
+
+Revision ID: 21e42874083b
+Revises: 52a401750a76
+Create Date: 2026-10-18 10:02:11.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '21e42874083b'
+down_revision = '52a401750a76'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # listings are keyset paginated on (updated_at, id), id being the rowid every index already ends with
+    op.create_index('ix_assignments_student_id_updated_at', 'assignments', ['student_id', 'updated_at'])
+    op.create_index('ix_assignments_teacher_id_updated_at', 'assignments', ['teacher_id', 'updated_at'])
+    op.create_index(
+        'ix_assignments_non_draft_updated_at', 'assignments', ['updated_at'],
+        sqlite_where=sa.text("state != 'DRAFT'"),
+        postgresql_where=sa.text("state != 'DRAFT'")
+    )
+    # grade reports group GRADED assignments by teacher and grade
+    op.create_index('ix_assignments_state_grade', 'assignments', ['state', 'grade'])
+    op.create_index('ix_assignments_state_teacher_id_grade', 'assignments', ['state', 'teacher_id', 'grade'])
+
+
+def downgrade():
+    op.drop_index('ix_assignments_state_teacher_id_grade', table_name='assignments')
+    op.drop_index('ix_assignments_state_grade', table_name='assignments')
+    op.drop_index('ix_assignments_non_draft_updated_at', table_name='assignments')
+    op.drop_index('ix_assignments_teacher_id_updated_at', table_name='assignments')
+    op.drop_index('ix_assignments_student_id_updated_at', table_name='assignments')
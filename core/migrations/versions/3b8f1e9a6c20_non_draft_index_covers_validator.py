@@ -0,0 +1,33 @@
+"""non draft index covers validator
+
+Revision ID: 3b8f1e9a6c20
+Revises: e7b2d5c8f913
+Create Date: 2026-10-18 17:12:44.091536
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f1e9a6c20'
+down_revision = 'e7b2d5c8f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # id and state in the key let the principal listing's ETag validator read the index alone
+    op.drop_index('ix_assignments_non_draft_updated_at', table_name='assignments')
+    op.create_index(
+        'ix_assignments_non_draft_updated_at', 'assignments', ['updated_at', 'id', 'state'], unique=False,
+        sqlite_where=sa.text("state != 'DRAFT'"), postgresql_where=sa.text("state != 'DRAFT'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_assignments_non_draft_updated_at', table_name='assignments')
+    op.create_index(
+        'ix_assignments_non_draft_updated_at', 'assignments', ['updated_at'], unique=False,
+        sqlite_where=sa.text("state != 'DRAFT'"), postgresql_where=sa.text("state != 'DRAFT'")
+    )
@@ -0,0 +1,25 @@
+"""assignments version
+
+Revision ID: 5064e542a360
+Revises: d36ac61ebc9f
+Create Date: 2026-10-18 14:06:37.925413
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5064e542a360'
+down_revision = 'd36ac61ebc9f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('assignments', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('assignments') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,54 @@
+"""assignment contents
+
+Revision ID: 9c3e5a7d1b42
+Revises: 5064e542a360
+Create Date: 2026-10-18 15:02:11.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e5a7d1b42'
+down_revision = '5064e542a360'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def _id_batches(connection):
+    max_id = connection.execute(sa.text('SELECT MAX(id) FROM assignments')).scalar() or 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        yield {'start': start, 'end': start + BACKFILL_BATCH_SIZE}
+
+
+def upgrade():
+    op.create_table('assignment_contents',
+    sa.Column('assignment_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('assignment_id')
+    )
+    connection = op.get_bind()
+    for batch in _id_batches(connection):
+        connection.execute(sa.text(
+            'INSERT INTO assignment_contents (assignment_id, content) '
+            'SELECT id, content FROM assignments '
+            'WHERE id > :start AND id <= :end AND content IS NOT NULL'
+        ), batch)
+    # a plain ALTER TABLE (SQLite >= 3.35), a batch copy of assignments would cascade-delete the rows backfilled above
+    op.drop_column('assignments', 'content')
+
+
+def downgrade():
+    op.add_column('assignments', sa.Column('content', sa.Text(), nullable=True))
+    connection = op.get_bind()
+    for batch in _id_batches(connection):
+        connection.execute(sa.text(
+            'UPDATE assignments SET content = ('
+            'SELECT content FROM assignment_contents WHERE assignment_id = assignments.id'
+            ') WHERE id > :start AND id <= :end'
+        ), batch)
+    op.drop_table('assignment_contents')
@@ -0,0 +1,149 @@
+"""content blobs
+
+Revision ID: a41f0c6e2d87
+Revises: 9c3e5a7d1b42
+Create Date: 2026-10-18 15:47:30.552190
+
+"""
+import hashlib
+import logging
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f0c6e2d87'
+down_revision = '9c3e5a7d1b42'
+branch_labels = None
+depends_on = None
+
+CONVERT_BATCH_SIZE = 1000
+
+# how core.libs.compression stores a text, frozen here: zlib at level 6, or raw behind RAW_MARKER when
+# the text is under MIN_COMPRESS_BYTES or zlib would not shrink it. zlib streams start with 0x78.
+ZLIB_LEVEL = 6
+MIN_COMPRESS_BYTES = 64
+RAW_MARKER = b'\x00'
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# ref_count follows the rows of assignment_contents, whichever way they are written or deleted
+REF_COUNT_TRIGGERS = {
+    'assignment_contents_blob_ref_insert': (
+        'AFTER INSERT ON assignment_contents WHEN NEW.content_hash IS NOT NULL BEGIN '
+        'UPDATE content_blobs SET ref_count = ref_count + 1 WHERE hash = NEW.content_hash; '
+        'END'
+    ),
+    'assignment_contents_blob_ref_update': (
+        'AFTER UPDATE OF content_hash ON assignment_contents '
+        'WHEN OLD.content_hash IS NOT NEW.content_hash BEGIN '
+        'UPDATE content_blobs SET ref_count = ref_count + 1 WHERE hash = NEW.content_hash; '
+        'UPDATE content_blobs SET ref_count = ref_count - 1 WHERE hash = OLD.content_hash; '
+        'DELETE FROM content_blobs WHERE hash = OLD.content_hash AND ref_count = 0; '
+        'END'
+    ),
+    'assignment_contents_blob_ref_delete': (
+        'AFTER DELETE ON assignment_contents WHEN OLD.content_hash IS NOT NULL BEGIN '
+        'UPDATE content_blobs SET ref_count = ref_count - 1 WHERE hash = OLD.content_hash; '
+        'DELETE FROM content_blobs WHERE hash = OLD.content_hash AND ref_count = 0; '
+        'END'
+    ),
+}
+
+
+def _batches(connection, sql):
+    """Yields the rows of `sql`, which must select assignment_id first and take :after, a batch at a time"""
+    after = 0
+    while True:
+        rows = connection.execute(sa.text(sql), {'after': after, 'limit': CONVERT_BATCH_SIZE}).fetchall()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def _compress(encoded):
+    if len(encoded) >= MIN_COMPRESS_BYTES:
+        compressed = zlib.compress(encoded, ZLIB_LEVEL)
+        if len(compressed) <= len(encoded):
+            return compressed
+    return RAW_MARKER + encoded
+
+
+def _decompress(data):
+    if data[:1] == RAW_MARKER:
+        return bytes(data[1:]).decode('utf8')
+    return zlib.decompress(data).decode('utf8')
+
+
+def upgrade():
+    op.create_table('content_blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    with op.batch_alter_table('assignment_contents') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_assignment_contents_content_hash_content_blobs', 'content_blobs', ['content_hash'], ['hash']
+        )
+    for name, definition in REF_COUNT_TRIGGERS.items():
+        op.execute('CREATE TRIGGER {0} {1}'.format(name, definition))
+
+    connection = op.get_bind()
+    converted = 0
+    for rows in _batches(connection, (
+        'SELECT assignment_id, content FROM assignment_contents '
+        'WHERE assignment_id > :after AND content IS NOT NULL ORDER BY assignment_id LIMIT :limit'
+    )):
+        blobs = {}
+        references = []
+        for assignment_id, content in rows:
+            encoded = content.encode('utf8')
+            content_hash = hashlib.sha256(encoded).hexdigest()
+            blobs.setdefault(content_hash, {
+                'hash': content_hash, 'data': _compress(encoded), 'size': len(encoded)
+            })
+            references.append({'assignment_id': assignment_id, 'content_hash': content_hash})
+        connection.execute(sa.text(
+            'INSERT INTO content_blobs (hash, data, size, ref_count) VALUES (:hash, :data, :size, 0) '
+            'ON CONFLICT (hash) DO NOTHING'
+        ), list(blobs.values()))
+        # the update trigger counts the references
+        connection.execute(sa.text(
+            'UPDATE assignment_contents SET content_hash = :content_hash WHERE assignment_id = :assignment_id'
+        ), references)
+        converted += len(rows)
+    op.drop_column('assignment_contents', 'content')
+
+    blobs, text_bytes, stored_bytes = connection.execute(sa.text(
+        'SELECT COUNT(*), COALESCE(SUM(size * ref_count), 0), COALESCE(SUM(LENGTH(data)), 0) FROM content_blobs'
+    )).one()
+    logger.info(
+        'Converted %d contents into %d blobs: %d bytes of text stored in %d bytes, %d bytes saved',
+        converted, blobs, text_bytes, stored_bytes, text_bytes - stored_bytes
+    )
+
+
+def downgrade():
+    op.add_column('assignment_contents', sa.Column('content', sa.Text(), nullable=True))
+    connection = op.get_bind()
+    for rows in _batches(connection, (
+        'SELECT assignment_contents.assignment_id, content_blobs.data FROM assignment_contents '
+        'JOIN content_blobs ON content_blobs.hash = assignment_contents.content_hash '
+        'WHERE assignment_contents.assignment_id > :after ORDER BY assignment_contents.assignment_id LIMIT :limit'
+    )):
+        connection.execute(sa.text(
+            'UPDATE assignment_contents SET content = :content WHERE assignment_id = :assignment_id'
+        ), [{'assignment_id': assignment_id, 'content': _decompress(data)} for assignment_id, data in rows])
+
+    for name in REF_COUNT_TRIGGERS:
+        op.execute('DROP TRIGGER {0}'.format(name))
+    with op.batch_alter_table('assignment_contents') as batch_op:
+        batch_op.drop_constraint('fk_assignment_contents_content_hash_content_blobs', type_='foreignkey')
+        batch_op.drop_column('content_hash')
+    op.drop_table('content_blobs')
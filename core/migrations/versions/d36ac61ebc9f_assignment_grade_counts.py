@@ -0,0 +1,36 @@
+"""assignment grade counts
+
+Revision ID: d36ac61ebc9f
+Revises: 21e42874083b
+Create Date: 2026-10-18 13:41:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd36ac61ebc9f'
+down_revision = '21e42874083b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('assignment_grade_counts',
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('grade', sa.Enum('A', 'B', 'C', 'D', name='gradeenum'), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id'], ),
+    sa.PrimaryKeyConstraint('teacher_id', 'grade')
+    )
+    op.execute(
+        "INSERT INTO assignment_grade_counts (teacher_id, grade, count) "
+        "SELECT teacher_id, grade, COUNT(*) FROM assignments "
+        "WHERE state = 'GRADED' AND teacher_id IS NOT NULL AND grade IS NOT NULL "
+        "GROUP BY teacher_id, grade"
+    )
+
+
+def downgrade():
+    op.drop_table('assignment_grade_counts')
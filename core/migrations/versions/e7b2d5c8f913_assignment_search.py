@@ -0,0 +1,70 @@
+"""assignment search
+
+Revision ID: e7b2d5c8f913
+Revises: a41f0c6e2d87
+Create Date: 2026-10-18 16:31:05.276814
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2d5c8f913'
+down_revision = 'a41f0c6e2d87'
+branch_labels = None
+depends_on = None
+
+# Contents are stored compressed, the index reads them through inflate(), which the app registers
+# on every connection (connect_listener in core/libs/sqlite.py). Writing assignment_contents from
+# a connection without it fails instead of leaving the index out of date.
+OLD_TEXT = 'SELECT inflate(data) FROM content_blobs WHERE hash = OLD.content_hash'
+NEW_TEXT = 'SELECT inflate(data) FROM content_blobs WHERE hash = NEW.content_hash'
+
+# BEFORE triggers for the old text: the content_blobs ref count triggers delete unreferenced blobs AFTER
+SEARCH_TRIGGERS = {
+    'assignment_contents_search_insert': (
+        'AFTER INSERT ON assignment_contents BEGIN '
+        'INSERT INTO assignment_search (rowid, content) SELECT NEW.assignment_id, ({new_text}) '
+        'WHERE NEW.content_hash IS NOT NULL; '
+        'END'
+    ),
+    'assignment_contents_search_update': (
+        'BEFORE UPDATE OF content_hash ON assignment_contents '
+        'WHEN OLD.content_hash IS NOT NEW.content_hash BEGIN '
+        "INSERT INTO assignment_search (assignment_search, rowid, content) SELECT 'delete', OLD.assignment_id, ({old_text}) "
+        'WHERE OLD.content_hash IS NOT NULL; '
+        'INSERT INTO assignment_search (rowid, content) SELECT NEW.assignment_id, ({new_text}) '
+        'WHERE NEW.content_hash IS NOT NULL; '
+        'END'
+    ),
+    'assignment_contents_search_delete': (
+        'BEFORE DELETE ON assignment_contents BEGIN '
+        "INSERT INTO assignment_search (assignment_search, rowid, content) SELECT 'delete', OLD.assignment_id, ({old_text}) "
+        'WHERE OLD.content_hash IS NOT NULL; '
+        'END'
+    ),
+}
+
+
+def upgrade():
+    # the external content of the index, so it stores no second copy of the texts
+    op.execute(
+        'CREATE VIEW assignment_texts AS '
+        'SELECT assignment_contents.assignment_id AS assignment_id, inflate(content_blobs.data) AS content '
+        'FROM assignment_contents JOIN content_blobs ON content_blobs.hash = assignment_contents.content_hash'
+    )
+    op.execute(
+        'CREATE VIRTUAL TABLE assignment_search USING fts5('
+        "content, content='assignment_texts', content_rowid='assignment_id', tokenize='porter unicode61'"
+        ')'
+    )
+    for name, definition in SEARCH_TRIGGERS.items():
+        op.execute('CREATE TRIGGER {0} {1}'.format(name, definition.format(old_text=OLD_TEXT, new_text=NEW_TEXT)))
+    op.execute("INSERT INTO assignment_search (assignment_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    for name in SEARCH_TRIGGERS:
+        op.execute('DROP TRIGGER {0}'.format(name))
+    op.execute('DROP TABLE assignment_search')
+    op.execute('DROP VIEW assignment_texts')
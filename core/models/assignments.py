@@ -1,11 +1,24 @@
 import enum
+from collections import Counter, namedtuple
+from flask import current_app
 from core import db
-from core.apis.decorators import AuthPrincipal
-from core.libs import helpers, assertions
+from core.libs import cache, compression, helpers, assertions
+from core.libs.principal import AuthPrincipal
 from core.models.teachers import Teacher
 from core.models.students import Student
+from sqlalchemy import bindparam, case, column, event, false, func, literal, null, or_, select, table, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.types import Enum as BaseEnum
 
+CONTENT_PREVIEW_LENGTH = 200
+
+# FTS5 index over assignment contents, kept in sync by triggers on assignment_contents (see migration
+# e7b2d5c8f913). It is not part of the metadata: virtual tables are created by the migration only.
+assignment_search = table(
+    'assignment_search', column('rowid'), column('rank'), column('assignment_search')
+)
+
 class GradeEnum(str, enum.Enum):
     A = 'A'
     B = 'B'
@@ -17,25 +30,107 @@ class AssignmentStateEnum(str, enum.Enum):
     SUBMITTED = 'SUBMITTED'
     GRADED = 'GRADED'
 
+class ContentModeEnum(str, enum.Enum):
+    FULL = 'full'
+    PREVIEW = 'preview'
+    NONE = 'none'
+
+# What the listings and search read of an assignment: plain tuples selected through Core, never
+# tracked by the session. `content` holds as much of the body as the ContentModeEnum asked for.
+AssignmentRecord = namedtuple(
+    'AssignmentRecord', ['id', 'created_at', 'updated_at', 'grade', 'state', 'student_id', 'teacher_id', 'content']
+)
+AssignmentSearchResult = namedtuple('AssignmentSearchResult', ['assignment', 'rank'])
+
+def _report_conflicts(results, changed_ids):
+    """Marks the results validated as successful whose row a concurrent request changed first"""
+    for result in results:
+        if result['success'] and result['id'] not in changed_ids:
+            result['success'] = False
+            result['message'] = 'assignment was changed by another request, please retry'
+
 class Assignment(db.Model):
     __tablename__ = 'assignments'
     id = db.Column(db.Integer, db.Sequence('assignments_id_seq'), primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey(Student.id), nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey(Teacher.id), nullable=True)
-    content = db.Column(db.Text)
     grade = db.Column(BaseEnum(GradeEnum))
     state = db.Column(BaseEnum(AssignmentStateEnum), default=AssignmentStateEnum.DRAFT, nullable=False)
     created_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False)
     updated_at = db.Column(db.TIMESTAMP(timezone=True), default=helpers.get_utc_now, nullable=False, onupdate=helpers.get_utc_now)
+    # bumped by every write, so an ORM flush of a row changed since it was read fails instead of overwriting it
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    # the body is kept out of this table so listings, counts and reports never read it,
+    # it is loaded on first access to `content` unless a listing asks for it up front
+    _content = db.relationship('AssignmentContent', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_assignments_student_id_updated_at', 'student_id', 'updated_at'),
+        db.Index('ix_assignments_teacher_id_updated_at', 'teacher_id', 'updated_at'),
+        db.Index(
+            'ix_assignments_non_draft_updated_at', 'updated_at', 'id', 'state',
+            sqlite_where=text("state != 'DRAFT'"),
+            postgresql_where=text("state != 'DRAFT'")
+        ),
+        db.Index('ix_assignments_state_grade', 'state', 'grade'),
+        db.Index('ix_assignments_state_teacher_id_grade', 'state', 'teacher_id', 'grade'),
+    )
 
     def __repr__(self):
         return '<Assignment %r>' % self.id
 
+    @hybrid_property
+    def content(self):
+        return self._content.content if self._content is not None else None
+
+    @content.setter
+    def content(self, value):
+        if self._content is None:
+            self._content = AssignmentContent(content=value)
+        else:
+            self._content.content = value
+        # an edit only writes assignment_contents, touch the row so updated_at moves and the version is checked
+        self.updated_at = helpers.get_utc_now()
+
+    @content.expression
+    def content(cls):
+        return select(func.inflate(ContentBlob.data)).join(
+            AssignmentContent, AssignmentContent.content_hash == ContentBlob.hash
+        ).where(AssignmentContent.assignment_id == cls.id).scalar_subquery()
+
+    @classmethod
+    def _has_content(cls):
+        """SQL test for a non empty content that does not inflate it"""
+        return cls._content.has(AssignmentContent.content_hash.isnot(None))
+
     @classmethod
     def filter(cls, *criterion):
         db_query = db.session.query(cls)
         return db_query.filter(*criterion)
 
+    @staticmethod
+    def listing_scopes(student_id=None, teacher_id=None, state=None):
+        """Response cache scopes of the listings an assignment with these values is part of"""
+        scopes = set()
+        if student_id is not None:
+            scopes.add('assignments:student:{0}'.format(student_id))
+        if teacher_id is not None:
+            scopes.add('assignments:teacher:{0}'.format(teacher_id))
+        if state is not None and state != AssignmentStateEnum.DRAFT:
+            scopes.add('assignments:principal')
+        return scopes
+
+    @classmethod
+    def _invalidate_listings(cls, rows):
+        """Drops the cached listings holding these (student_id, teacher_id, state) rows once the session commits"""
+        scopes = set()
+        for student_id, teacher_id, state in rows:
+            scopes |= cls.listing_scopes(student_id, teacher_id, state)
+        cache.invalidate(db.session, scopes)
+
     @classmethod
     def get_by_id(cls, _id):
         return cls.filter(cls.id == _id).first()
@@ -56,56 +151,539 @@ class Assignment(db.Model):
         db.session.flush()
         return assignment
 
+    @classmethod
+    def _reload(cls, _id):
+        """Reads the row again, overwriting whatever the session holds for it"""
+        return cls.filter(cls.id == _id).populate_existing().first()
+
+    @classmethod
+    def _transition(cls, criterion, values):
+        """
+        Applies `values` with one conditional UPDATE whose criterion names both the rows and the
+        state they must be in, and returns the number of rows changed. A row changed concurrently
+        no longer matches instead of being overwritten.
+        """
+        values[cls.version] = cls.version + 1
+        return cls.filter(*criterion).update(values, synchronize_session=False)
+
+    @classmethod
+    def _changing_ids(cls, criterion):
+        """
+        Ids of the rows matching `criterion`, read once this transaction holds the database's write
+        lock (an UPDATE of no row takes it on SQLite, FOR UPDATE locks the rows elsewhere): a
+        `_transition` on them in the same transaction changes exactly these rows, whatever another
+        request committed since the batch was validated.
+        """
+        cls.filter(false()).update({cls.version: cls.version}, synchronize_session=False)
+        return {_id for (_id,) in cls.filter(*criterion).with_entities(cls.id).with_for_update()}
+
     @classmethod
     def submit(cls, _id, teacher_id, auth_principal: AuthPrincipal):
-        assignment = Assignment.get_by_id(_id)
-        assertions.assert_found(assignment, 'No assignment with this id was found')
-        assertions.assert_valid(
-            assignment.student_id == auth_principal.student_id,
-            'This assignment belongs to some other student'
+        submitted = cls._transition(
+            [
+                cls.id == _id,
+                cls.student_id == auth_principal.student_id,
+                cls._has_content(),
+                cls.state == AssignmentStateEnum.DRAFT
+            ],
+            {cls.teacher_id: teacher_id, cls.state: AssignmentStateEnum.SUBMITTED}  # Update state to SUBMITTED
         )
-        assertions.assert_valid(
-            assignment.content is not None,
-            'assignment with empty content cannot be submitted'
-        )
-        assertions.assert_valid(
-            assignment.state == AssignmentStateEnum.DRAFT,
-            'only a draft assignment can be submitted'
-        )
-        assignment.teacher_id = teacher_id
-        assignment.state = AssignmentStateEnum.SUBMITTED  # Update state to SUBMITTED
-        db.session.flush()
+        assignment = Assignment._reload(_id)
+        if not submitted:
+            # tell why from the row as it is now
+            assertions.assert_found(assignment, 'No assignment with this id was found')
+            assertions.assert_valid(
+                assignment.student_id == auth_principal.student_id,
+                'This assignment belongs to some other student'
+            )
+            assertions.assert_valid(
+                assignment.content is not None,
+                'assignment with empty content cannot be submitted'
+            )
+            assertions.assert_valid(
+                assignment.state == AssignmentStateEnum.DRAFT,
+                'only a draft assignment can be submitted'
+            )
+            assertions.base_assert(409, 'assignment was changed by another request, please retry')
+        cls._invalidate_listings([(assignment.student_id, assignment.teacher_id, assignment.state)])
         return assignment
 
+    @classmethod
+    def insert_many(cls, rows):
+        """
+        Inserts already validated rows, with or without an id. Each assignment is its own INSERT so
+        its content is attached to the id it really got, the contents go in one Core executemany.
+        """
+        if rows:
+            assignment_ids = [
+                db.session.execute(cls.__table__.insert(), {
+                    key: value for key, value in row.items() if key != 'content' and (key != 'id' or value is not None)
+                }).inserted_primary_key[0]
+                for row in rows
+            ]
+            content_hashes = ContentBlob.store_many(row['content'] for row in rows)
+            db.session.execute(AssignmentContent.__table__.insert(), [
+                {'assignment_id': assignment_id, 'content_hash': content_hash}
+                for assignment_id, content_hash in zip(assignment_ids, content_hashes)
+            ])
+            cls._invalidate_listings((row['student_id'], row['teacher_id'], row['state']) for row in rows)
+            AssignmentGradeCount.apply(Counter(
+                (row['teacher_id'], GradeEnum(row['grade']))
+                for row in rows if row['state'] == AssignmentStateEnum.GRADED
+            ))
+
+    @classmethod
+    def submit_many(cls, submissions, auth_principal: AuthPrincipal):
+        """
+        Submits a batch of (id, teacher_id) pairs: ownership, content and state of the whole batch
+        are checked with one SELECT and every eligible assignment is moved to SUBMITTED with a
+        single UPDATE. Returns one result per pair, in order; pairs that cannot be submitted,
+        or that another request changed since the SELECT, are reported and skipped.
+        """
+        ids = {_id for _id, _ in submissions}
+        current = {
+            row.id: row for row in db.session.query(
+                cls.id, cls.student_id, cls.state, cls._has_content().label('has_content')
+            ).filter(cls.id.in_(ids))
+        }
+        # an unknown teacher would fail the foreign key, and with it the whole batch
+        teacher_ids = {row.id for row in db.session.query(Teacher.id).filter(
+            Teacher.id.in_({teacher_id for _, teacher_id in submissions})
+        )}
+
+        results = []
+        teacher_by_id = {}
+        seen_ids = set()
+        for _id, teacher_id in submissions:
+            row = current.get(_id)
+            message = None
+            if _id in seen_ids:
+                message = 'assignment is repeated in this batch'
+            elif row is None:
+                message = 'No assignment with this id was found'
+            elif row.student_id != auth_principal.student_id:
+                message = 'This assignment belongs to some other student'
+            elif not row.has_content:
+                message = 'assignment with empty content cannot be submitted'
+            elif row.state != AssignmentStateEnum.DRAFT:
+                message = 'only a draft assignment can be submitted'
+            elif teacher_id not in teacher_ids:
+                message = 'No teacher with this id was found'
+            seen_ids.add(_id)
+
+            if message is None:
+                teacher_by_id[_id] = teacher_id
+            results.append({'id': _id, 'teacher_id': teacher_id, 'success': message is None, 'message': message})
+
+        if teacher_by_id:
+            # a concurrent request may have submitted or emptied some of them since the SELECT
+            submitted_ids = cls._changing_ids([
+                cls.id.in_(teacher_by_id),
+                cls.student_id == auth_principal.student_id,
+                cls._has_content(),
+                cls.state == AssignmentStateEnum.DRAFT
+            ])
+            teacher_by_id = {_id: teacher_id for _id, teacher_id in teacher_by_id.items() if _id in submitted_ids}
+            if teacher_by_id:
+                cls._transition(
+                    [cls.id.in_(teacher_by_id)],
+                    {cls.teacher_id: case(teacher_by_id, value=cls.id), cls.state: AssignmentStateEnum.SUBMITTED}
+                )
+            cls._invalidate_listings(
+                (auth_principal.student_id, teacher_id, AssignmentStateEnum.SUBMITTED) for teacher_id in teacher_by_id.values()
+            )
+            _report_conflicts(results, submitted_ids)
+        db.session.flush()
+        return results
+
     @classmethod
     def mark_grade(cls, _id, grade, auth_principal: AuthPrincipal):
-        assignment = Assignment.get_by_id(_id)
-        assertions.assert_found(assignment, 'No assignment with this id was found')
         assertions.assert_valid(
             grade is not None,
             'assignment with empty grade cannot be graded'
         )
-        # Allow grading only if the assignment is SUBMITTED or GRADED
-        assertions.assert_valid(
-            assignment.state in [AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED],
-            'only submitted or graded assignments can be graded'
+        criterion = [cls.id == _id]
+        if auth_principal.teacher_id is not None:
+            # teachers grade their own submissions once
+            criterion.append(cls.teacher_id == auth_principal.teacher_id)
+            criterion.append(cls.state == AssignmentStateEnum.SUBMITTED)
+        else:
+            # Allow grading only if the assignment is SUBMITTED or GRADED
+            criterion.append(cls.state.in_([AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]))
+
+        # a re-graded assignment leaves the count of its previous grade
+        AssignmentGradeCount.apply_from(criterion + [cls.state == AssignmentStateEnum.GRADED], -1)
+        graded = cls._transition(criterion, {cls.grade: grade, cls.state: AssignmentStateEnum.GRADED})
+        assignment = Assignment._reload(_id)
+        if not graded:
+            # tell why from the row as it is now, in the words of the teacher's or principal's API
+            if auth_principal.teacher_id is not None:
+                assertions.assert_found(assignment, 'Assignment not found')
+                assertions.assert_valid(
+                    assignment.teacher_id == auth_principal.teacher_id,
+                    'This assignment is not assigned to the current teacher'
+                )
+                assertions.assert_valid(
+                    assignment.state == AssignmentStateEnum.SUBMITTED,
+                    'Only SUBMITTED assignments can be graded'
+                )
+            else:
+                assertions.assert_found(assignment, 'No assignment with this id was found')
+                assertions.assert_valid(
+                    assignment.state in [AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED],
+                    'only submitted or graded assignments can be graded'
+                )
+            assertions.base_assert(409, 'assignment was changed by another request, please retry')
+        AssignmentGradeCount.apply_from([cls.id == _id], 1)
+        cls._invalidate_listings([(assignment.student_id, assignment.teacher_id, assignment.state)])
+        return assignment
+
+    @classmethod
+    def mark_grades(cls, grades, auth_principal: AuthPrincipal):
+        """
+        Grades a batch of (id, grade) pairs: the whole batch is validated with one SELECT and
+        applied with one UPDATE per distinct grade. Returns one result per pair, in order;
+        pairs that cannot be graded, or that another request changed since the SELECT, are
+        reported and skipped, the rest are still graded.
+        """
+        if auth_principal.teacher_id is not None:
+            # teachers grade their own submissions once, principals can also re-grade
+            gradable_states = [AssignmentStateEnum.SUBMITTED]
+        else:
+            gradable_states = [AssignmentStateEnum.SUBMITTED, AssignmentStateEnum.GRADED]
+
+        ids = {_id for _id, _ in grades}
+        current = {
+            row.id: row for row in db.session.query(
+                cls.id, cls.student_id, cls.teacher_id, cls.state, cls.grade
+            ).filter(cls.id.in_(ids))
+        }
+
+        results = []
+        ids_by_grade = {}
+        seen_ids = set()
+        for _id, grade in grades:
+            row = current.get(_id)
+            message = None
+            if _id in seen_ids:
+                message = 'assignment is repeated in this batch'
+            elif row is None:
+                message = 'No assignment with this id was found'
+            elif auth_principal.teacher_id is not None and row.teacher_id != auth_principal.teacher_id:
+                message = 'This assignment is not assigned to the current teacher'
+            elif row.state not in gradable_states:
+                message = 'only {0} assignments can be graded'.format(
+                    ' or '.join(state.value for state in gradable_states)
+                )
+            seen_ids.add(_id)
+
+            if message is None:
+                ids_by_grade.setdefault(grade, []).append(_id)
+            results.append({'id': _id, 'grade': grade, 'success': message is None, 'message': message})
+
+        graded_ids = set()
+        for grade, grade_ids in ids_by_grade.items():
+            criterion = [cls.id.in_(grade_ids), cls.state.in_(gradable_states)]
+            if auth_principal.teacher_id is not None:
+                criterion.append(cls.teacher_id == auth_principal.teacher_id)
+            # a concurrent request may have graded some of them since the SELECT
+            changing_ids = cls._changing_ids(criterion)
+            if not changing_ids:
+                continue
+            # the counts move with the rows the UPDATE changes, like mark_grade
+            AssignmentGradeCount.apply_from([cls.id.in_(changing_ids), cls.state == AssignmentStateEnum.GRADED], -1)
+            cls._transition([cls.id.in_(changing_ids)], {cls.grade: grade, cls.state: AssignmentStateEnum.GRADED})
+            AssignmentGradeCount.apply_from([cls.id.in_(changing_ids)], 1)
+            graded_ids |= changing_ids
+        cls._invalidate_listings(
+            (current[_id].student_id, current[_id].teacher_id, AssignmentStateEnum.GRADED) for _id in graded_ids
         )
-        # Update the grade
-        assignment.grade = grade
-        # Set the state to GRADED if it's not already GRADED
-        if assignment.state != AssignmentStateEnum.GRADED:
-            assignment.state = AssignmentStateEnum.GRADED
+        _report_conflicts(results, graded_ids)
         db.session.flush()
-        return assignment
+        return results
+
+    @classmethod
+    def _keyset_order(cls, db_query, cursor=None):
+        if cursor is not None:
+            updated_at, last_id = cursor
+            # the first term is a plain range on updated_at so the (.., updated_at) indexes can seek to the cursor
+            db_query = db_query.filter(
+                cls.updated_at >= updated_at,
+                or_(cls.updated_at > updated_at, cls.id > last_id)
+            )
+        return db_query.order_by(cls.updated_at, cls.id)
 
     @classmethod
-    def get_assignments_by_student(cls, student_id):
-        return cls.filter(cls.student_id == student_id).all()
+    def get_validator(cls, db_query):
+        """
+        (count, max(updated_at), max(id)) of a listing, read from the index of its scope alone.
+        Inserting, deleting or writing any of its assignments changes it.
+        """
+        return tuple(db_query.with_entities(func.count(cls.id), func.max(cls.updated_at), func.max(cls.id)).one())
+
+    @classmethod
+    def _select_records(cls, db_query, content_mode):
+        """
+        SELECT of the AssignmentRecord columns of the assignments `db_query` filters. The body is
+        inflated by SQL, only as much of it as `content_mode` shows.
+        """
+        if content_mode == ContentModeEnum.FULL:
+            content = cls.content
+        elif content_mode == ContentModeEnum.PREVIEW:
+            content = func.substr(cls.content, 1, CONTENT_PREVIEW_LENGTH)
+        else:
+            content = null()
+        return db_query.statement.with_only_columns(
+            cls.id, cls.created_at, cls.updated_at, cls.grade, cls.state, cls.student_id, cls.teacher_id,
+            content.label('content')
+        )
+
+    @classmethod
+    def get_page(cls, db_query, limit=None, cursor=None, content_mode=ContentModeEnum.FULL):
+        """
+        Orders a listing on the (updated_at, id) key and, when `limit` is given, returns the page
+        starting right after `cursor`, as AssignmentRecords. One row beyond `limit` is fetched so
+        the caller can tell whether there is a next page (see `core.libs.pagination.paginate`).
+        """
+        statement = cls._keyset_order(cls._select_records(db_query, content_mode), cursor)
+        if limit is not None:
+            statement = statement.limit(limit + 1)
+        return list(map(AssignmentRecord._make, db.session.execute(statement)))
+
+    @classmethod
+    def iter_all(cls, db_query, batch_size=None, content_mode=ContentModeEnum.FULL):
+        """
+        Iterates a whole listing in (updated_at, id) order as AssignmentRecords, fetching `batch_size`
+        (by default the STREAM_BATCH_SIZE setting) rows at a time
+        """
+        batch_size = batch_size or current_app.config['STREAM_BATCH_SIZE']
+        statement = cls._keyset_order(cls._select_records(db_query, content_mode))
+        result = db.session.execute(statement.execution_options(stream_results=True))
+        for rows in result.partitions(batch_size):
+            yield from map(AssignmentRecord._make, rows)
+
+    @staticmethod
+    def _match_query(terms):
+        """FTS5 query matching every term of `terms`, each quoted so operators and punctuation are searched as text"""
+        return ' '.join('"{0}"'.format(term.replace('"', '""')) for term in terms.split())
+
+    @classmethod
+    def search(cls, db_query, terms, limit, cursor=None, content_mode=ContentModeEnum.FULL):
+        """
+        Returns a page of the assignments of `db_query` whose content matches all of `terms`,
+        as AssignmentSearchResults, best match first. The FTS index yields the matching ids,
+        assignments are only read by primary key. Pages are keyed on (rank, id), fetched with
+        one extra row like `get_page`.
+        """
+        rank = assignment_search.c.rank
+        statement = cls._select_records(db_query, content_mode).add_columns(rank).join(
+            assignment_search, assignment_search.c.rowid == cls.id
+        ).where(assignment_search.c.assignment_search.match(cls._match_query(terms)))
+        if cursor is not None:
+            last_rank, last_id = cursor
+            statement = statement.where(or_(rank > last_rank, (rank == last_rank) & (cls.id > last_id)))
+        statement = statement.order_by(rank, cls.id).limit(limit + 1)
+        return [
+            AssignmentSearchResult(AssignmentRecord._make(row[:-1]), row[-1])
+            for row in db.session.execute(statement)
+        ]
+
+    @classmethod
+    def query_by_student(cls, student_id):
+        return cls.filter(cls.student_id == student_id)
+
+    @classmethod
+    def query_by_teacher(cls, teacher_id):
+        return cls.filter(cls.teacher_id == teacher_id)
+
+    @classmethod
+    def query_by_principal(cls):
+        # DRAFT is rendered inline: SQLite only uses the partial index when the query repeats its WHERE literally
+        non_draft = cls.state != bindparam('draft_state', AssignmentStateEnum.DRAFT, type_=cls.state.type, literal_execute=True)
+        return cls.filter(non_draft)
+
+    @classmethod
+    def get_assignments_by_student(cls, student_id, limit=None, cursor=None, content_mode=ContentModeEnum.FULL):
+        return cls.get_page(cls.query_by_student(student_id), limit, cursor, content_mode)
+
+    @classmethod
+    def get_assignments_by_teacher(cls, teacher_id, limit=None, cursor=None, content_mode=ContentModeEnum.FULL):
+        return cls.get_page(cls.query_by_teacher(teacher_id), limit, cursor, content_mode)
+
+    @classmethod
+    def get_assignments_by_principal(cls, limit=None, cursor=None, content_mode=ContentModeEnum.FULL):
+        return cls.get_page(cls.query_by_principal(), limit, cursor, content_mode)
+
+
+class ContentBlob(db.Model):
+    """
+    A distinct assignment body keyed by the hash of its text, zlib-compressed unless that would not
+    shrink it (see core.libs.compression). Assignments with the same content, e.g. a draft saved
+    again unchanged, share one blob. `ref_count` is the number of assignment_contents rows pointing
+    at it, kept by triggers on that table (see migration a41f0c6e2d87) which also delete a blob once
+    nothing points at it.
+    """
+    __tablename__ = 'content_blobs'
+    hash = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # bytes of the uncompressed UTF-8 text
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<ContentBlob %r>' % self.hash
+
+    @classmethod
+    def _store_rows(cls, connection, rows):
+        # an existing blob is left alone, the reference added by the caller bumps its count
+        connection.execute(sqlite_insert(cls.__table__).on_conflict_do_nothing(index_elements=[cls.hash]), rows)
+
+    @classmethod
+    def _row(cls, content, content_hash):
+        encoded_size = len(content.encode('utf8'))
+        return {'hash': content_hash, 'data': compression.compress(content), 'size': encoded_size, 'ref_count': 0}
+
+    @classmethod
+    def store_many(cls, contents):
+        """Makes sure a blob exists for each content and returns their hashes, in order"""
+        content_hashes = []
+        rows = {}
+        for content in contents:
+            content_hash = compression.content_hash(content)
+            content_hashes.append(content_hash)
+            if content_hash not in rows:
+                rows[content_hash] = cls._row(content, content_hash)
+        if rows:
+            cls._store_rows(db.session.connection(), list(rows.values()))
+        return content_hashes
+
+    @classmethod
+    def get_storage_stats(cls):
+        """Bytes the contents would take as plain text against what their blobs take"""
+        blobs, references, text_bytes, stored_bytes = db.session.query(
+            func.count(cls.hash),
+            func.coalesce(func.sum(cls.ref_count), 0),
+            func.coalesce(func.sum(cls.size * cls.ref_count), 0),
+            func.coalesce(func.sum(func.length(cls.data)), 0)
+        ).one()
+        return {'blobs': blobs, 'references': references, 'text_bytes': text_bytes, 'stored_bytes': stored_bytes}
+
+
+class AssignmentContent(db.Model):
+    """Body of an assignment, one row per assignment that has one, pointing at the blob holding its text"""
+    __tablename__ = 'assignment_contents'
+    assignment_id = db.Column(db.Integer, db.ForeignKey(Assignment.id, ondelete='CASCADE'), primary_key=True)
+    content_hash = db.Column(db.String(64), db.ForeignKey(ContentBlob.hash), nullable=True)
+    _blob = db.relationship(ContentBlob, lazy='joined', viewonly=True)
+
+    # (content_hash, text) of the last content set or inflated, so neither is compressed or inflated twice
+    _text = None
+
+    def __repr__(self):
+        return '<AssignmentContent %r>' % self.assignment_id
+
+    @property
+    def content(self):
+        if self.content_hash is None:
+            return None
+        if self._text is None or self._text[0] != self.content_hash:
+            self._text = (self.content_hash, compression.decompress(self._blob.data))
+        return self._text[1]
+
+    @content.setter
+    def content(self, value):
+        if value is None:
+            self.content_hash = None
+            return
+        self.content_hash = compression.content_hash(value)
+        self._text = (self.content_hash, value)
+
+
+@event.listens_for(AssignmentContent, 'before_insert')
+@event.listens_for(AssignmentContent, 'before_update')
+def _store_content_blob(mapper, connection, target):
+    """Writes the blob of a newly set content right before the row pointing at it"""
+    # pylint: disable=unused-argument
+    if target.content_hash is not None and target._text is not None and target._text[0] == target.content_hash:
+        ContentBlob._store_rows(connection, [ContentBlob._row(target._text[1], target.content_hash)])
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_flushed_listings(session, flush_context):
+    """Listings holding assignments written through the ORM, the bulk UPDATE paths invalidate their own"""
+    # pylint: disable=unused-argument
+    Assignment._invalidate_listings(
+        (obj.student_id, obj.teacher_id, obj.state)
+        for obj in session.new | session.dirty | session.deleted if isinstance(obj, Assignment)
+    )
+
+
+class AssignmentGradeCount(db.Model):
+    """
+    Number of GRADED assignments per (teacher, grade), kept up to date in the same transaction
+    by every Assignment helper that moves an assignment into GRADED or changes its grade, so
+    grade reports read a few rows per teacher instead of scanning `assignments`
+    """
+    __tablename__ = 'assignment_grade_counts'
+    teacher_id = db.Column(db.Integer, db.ForeignKey(Teacher.id), primary_key=True)
+    grade = db.Column(BaseEnum(GradeEnum), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<AssignmentGradeCount %r %r>' % (self.teacher_id, self.grade)
+
+    @classmethod
+    def apply(cls, grade_counts):
+        """Adds a {(teacher_id, grade): delta} Counter to the stored counts with one upsert"""
+        rows = [
+            {'teacher_id': teacher_id, 'grade': grade, 'count': delta}
+            for (teacher_id, grade), delta in grade_counts.items() if delta and teacher_id is not None
+        ]
+        if not rows:
+            return
+        upsert = sqlite_insert(cls.__table__)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[cls.teacher_id, cls.grade],
+            set_={'count': cls.count + upsert.excluded['count']}
+        )
+        db.session.execute(upsert, rows)
+
+    @classmethod
+    def apply_from(cls, criterion, delta):
+        """Adds `delta` to the counts of the assignments matching `criterion`, without reading them first"""
+        rows = select(Assignment.teacher_id, Assignment.grade, literal(delta)).where(
+            *criterion, Assignment.teacher_id.isnot(None), Assignment.grade.isnot(None)
+        )
+        upsert = sqlite_insert(cls.__table__).from_select(['teacher_id', 'grade', 'count'], rows)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[cls.teacher_id, cls.grade],
+            set_={'count': cls.count + upsert.excluded['count']}
+        )
+        db.session.execute(upsert)
+
+    @classmethod
+    def rebuild(cls):
+        """Recomputes every count from the assignments table"""
+        db.session.query(cls).delete(synchronize_session=False)
+        db.session.execute(cls.__table__.insert().from_select(
+            ['teacher_id', 'grade', 'count'],
+            select(Assignment.teacher_id, Assignment.grade, func.count(Assignment.id)).where(
+                Assignment.state == AssignmentStateEnum.GRADED,
+                Assignment.teacher_id.isnot(None),
+                Assignment.grade.isnot(None)
+            ).group_by(Assignment.teacher_id, Assignment.grade)
+        ))
+        db.session.flush()
 
     @classmethod
-    def get_assignments_by_teacher(cls, teacher_id):
-        return cls.filter(cls.teacher_id == teacher_id).all()
+    def get_counts_by_grade(cls):
+        counts = dict.fromkeys(GradeEnum, 0)
+        for grade, count in db.session.query(cls.grade, func.sum(cls.count)).group_by(cls.grade):
+            counts[grade] = count
+        return counts
 
     @classmethod
-    def get_assignments_by_principal(cls):
-        return cls.filter(cls.state != AssignmentStateEnum.DRAFT).all()
\ No newline at end of file
+    def get_counts_by_teacher(cls):
+        counts = {}
+        for row in db.session.query(cls):
+            counts.setdefault(row.teacher_id, dict.fromkeys(GradeEnum, 0))[row.grade] = row.count
+        return counts
@@ -1,25 +1,77 @@
+import gc
+import glob
 import os
+import tempfile
 
 # https://docs.gunicorn.org/en/stable/settings.html
 
+# APP_ENV=prod is the production profile: the master preloads the app once and forks workers sized
+# from the CPUs, other profiles load the app in each worker and reload it on code changes.
+production = os.environ.get('APP_ENV') == 'prod'
+# the CPUs this process may run on, fewer than os.cpu_count() under a container's cpuset
+cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
 proc_name = 'fyle-interview-be'
 port_number = int(os.environ.get('GUNICORN_PORT', 7755))
 bind = '0.0.0.0:{0}'.format(port_number)
 
+# sync serves one request at a time per worker, gthread `threads` requests at once on as many
+# threads, gevent `worker_connections` requests at once on as many greenlets
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
 backlog      = int(os.environ.get('GUNICORN_BACKLOG', 50))
-workers      = int(os.environ.get('GUNICORN_NUMBER_WORKERS', 1))
-threads      = int(os.environ.get('GUNICORN_NUMBER_WORKER_THREADS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class not in WORKER_CLASSES:
+    raise RuntimeError(
+        'GUNICORN_WORKER_CLASS should be one of {0}, got {1!r}'.format(', '.join(WORKER_CLASSES), worker_class)
+    )
+if worker_class == 'gevent':
+    try:
+        import gevent  # noqa: F401 pylint: disable=unused-import
+    except ImportError:
+        raise RuntimeError('GUNICORN_WORKER_CLASS=gevent needs gevent installed: pip install gevent') from None
+    if os.environ.get('SQLITE_PROFILE') == 'default':
+        # a greenlet streaming a listing holds its read lock while it waits on the socket, a
+        # writer waiting for that lock blocks every greenlet of the worker until busy_timeout
+        raise RuntimeError('GUNICORN_WORKER_CLASS=gevent needs a WAL SQLITE_PROFILE, got default')
+
+if production:
+    # sync workers wait on the database, 2 per CPU keep the CPUs busy. Threads and greenlets
+    # already overlap those waits and share the GIL of their worker, so one worker per CPU.
+    default_workers = 2 * cpus + 1 if worker_class == 'sync' else cpus + 1
+    default_threads = min(2 * cpus, 8) if worker_class == 'gthread' else 1
+else:
+    default_workers = 1
+    default_threads = 4 if worker_class == 'gthread' else 1
+
+workers      = int(os.environ.get('GUNICORN_NUMBER_WORKERS', default_workers))
+threads      = int(os.environ.get('GUNICORN_NUMBER_WORKER_THREADS', default_threads))
 worker_connections = int(os.environ.get('GUNICORN_NUMBER_WORKER_CONNECTIONS', 20))
 timeout      = int(os.environ.get('GUNICORN_WORKER_TIMEOUT', 60))
 keepalive    = int(os.environ.get('GUNICORN_KEEPALIVE', 2))
 
 loglevel     = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
-worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
 max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
 max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 20))
 graceful_timeout = int(os.environ.get('GUNICORN_WORKER_GRACEFUL_TIMEOUT', 5))
 
-reload = True
+# one pooled connection per request a worker serves at once, so no request waits on the pool.
+# The workers read the environment when they load the app, an explicit DB_POOL_SIZE wins.
+if worker_class == 'gevent':
+    os.environ.setdefault('DB_POOL_SIZE', str(worker_connections))
+elif threads > 1:  # gunicorn runs sync workers given threads as gthread
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+# where the workers keep their request metrics, see core/libs/metrics.py
+metrics_dir = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'fyle-metrics'))
+
+reload = not production
+# gevent patches the standard library when a worker starts, after a preloaded app has imported it
+preload_app = production and worker_class != 'gevent'
+if preload_app:
+    # collecting while the master imports the app would only leave holes in its pages,
+    # pre_fork freezes what is left and post_fork turns collection back on in each worker
+    gc.disable()
 
 limit_request_line = 0
 
@@ -38,12 +90,35 @@ access_log_format = '%({X-Real-IP}i)s - - - %(t)s.%(T)s "%(r)s" "%(f)s" "%(a)s"
 # todo - JC: pass org_user_id tpa_id proxy_id and replace the three dashes in above format
 
 
+def on_starting(server):
+    # the counters of a previous run's workers would add up with this run's
+    for path in glob.glob(os.path.join(metrics_dir, 'metrics-*.db')):
+        os.remove(path)
+
+
 def post_fork(server, worker):
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    if preload_app:
+        gc.enable()
+        # the pooled connections of the master are not the worker's to use
+        from core.server import app
+        from core.libs import routing
+        routing.dispose_engines(app)
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker initialized (pid: %s)", worker.pid)
 
 
 def pre_fork(server, worker):
-    pass
+    if preload_app:
+        # the workers share the API the master loaded instead of each importing it on its first request
+        import core
+        from core.server import app
+        core.load_api(app)
+        # moves the app's objects out of the collector's reach: collections in the workers no
+        # longer write to their headers, so the pages forked from the master stay shared
+        gc.freeze()
 
 
 def pre_exec(server):
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+from core import db
+from core.models.assignments import Assignment, ContentModeEnum
+
+
+@contextmanager
+def captured_statements():
+    """Collects the (statement, parameters) pairs run against the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def query_plan(statement, parameters=()):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    # each row is (id, parent, notused, detail)
+    return [row[3] for row in rows]
+
+
+def assert_no_table_scan(statement, parameters=()):
+    plan = query_plan(statement, parameters)
+    table_scans = [detail for detail in plan if detail.startswith('SCAN') and 'INDEX' not in detail]
+    assert not table_scans, 'query falls back to a table scan: {0}\n{1}'.format(plan, statement)
+
+
+CURSOR = (datetime(2021, 1, 1), 1)
+
+MODEL_QUERY_HELPERS = [
+    lambda: Assignment.get_by_id(1),
+    lambda: Assignment.get_assignments_by_student(1),
+    lambda: Assignment.get_assignments_by_student(1, limit=10, cursor=CURSOR),
+    lambda: Assignment.get_assignments_by_teacher(1),
+    lambda: Assignment.get_assignments_by_teacher(1, limit=10, cursor=CURSOR),
+    lambda: Assignment.get_assignments_by_principal(),
+    lambda: Assignment.get_assignments_by_principal(limit=10, cursor=CURSOR),
+    lambda: Assignment.get_assignments_by_teacher(1, limit=10, content_mode=ContentModeEnum.PREVIEW),
+    lambda: Assignment.get_assignments_by_principal(limit=10, content_mode=ContentModeEnum.NONE),
+]
+
+LISTING_SCOPES = [
+    lambda: Assignment.query_by_student(1),
+    lambda: Assignment.query_by_teacher(1),
+    lambda: Assignment.query_by_principal(),
+]
+
+
+@pytest.mark.parametrize('helper', MODEL_QUERY_HELPERS)
+def test_model_query_helpers_use_indexes(helper):
+    with captured_statements() as statements:
+        helper()
+
+    assert statements
+    for statement, parameters in statements:
+        assert_no_table_scan(statement, parameters)
+        # pages are read in index order, never sorted as a whole
+        assert not any('TEMP B-TREE' in detail for detail in query_plan(statement, parameters))
+
+
+@pytest.mark.parametrize('scope', LISTING_SCOPES)
+def test_validators_read_only_an_index(scope):
+    with captured_statements() as statements:
+        Assignment.get_validator(scope())
+
+    assert len(statements) == 1
+    plan = query_plan(*statements[0])
+    assert len(plan) == 1 and 'COVERING INDEX' in plan[0], plan
+
+
+def test_search_reads_assignments_by_primary_key():
+    with captured_statements() as statements:
+        Assignment.search(Assignment.query_by_principal(), 'essay', 10)
+        Assignment.search(Assignment.query_by_teacher(1), 'essay', 10, cursor=(-1.0, 1))
+
+    assert statements
+    for statement, parameters in statements:
+        assert_no_table_scan(statement, parameters)
+
+
+@pytest.mark.parametrize('sql_file', [
+    'tests/SQL/count_assignments_in_each_grade.sql',
+    'tests/SQL/count_grade_A_assignments_by_teacher_with_max_grading.sql',
+])
+def test_report_queries_use_indexes(sql_file):
+    with open(sql_file, encoding='utf8') as fo:
+        sql = fo.read()
+
+    assert_no_table_scan(sql)
+
+
+def test_table_scan_is_detected():
+    with pytest.raises(AssertionError):
+        assert_no_table_scan(str(text('SELECT * FROM content_blobs WHERE size = ?')), (8,))
@@ -1,2 +1,8 @@
-from core.server import app
-app.testing = True
\ No newline at end of file
+import os
+import tempfile
+os.environ.setdefault('APP_ENV', 'test')
+# each run counts its own requests, not those of earlier runs or of a server on this host
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='fyle-metrics-'))
+
+from core.server import app  # noqa: E402  the profile is read when core is first imported
+app.testing = True
@@ -0,0 +1,49 @@
+import json
+
+from core import db
+from core.apis.auth import get_principal_cache
+from core.libs import helpers
+from core.models.students import Student
+from tests import app
+
+
+def test_unknown_principals_are_rejected(client):
+    # student 1 is user 1, not user 2
+    response = client.get('/student/assignments', headers={'X-Principal': json.dumps({'user_id': 2, 'student_id': 1})})
+    assert response.status_code == 401
+    assert response.json['message'] == 'principal not found'
+
+    response = client.get('/teacher/assignments', headers={'X-Principal': json.dumps({'user_id': 3, 'teacher_id': 99})})
+    assert response.status_code == 401
+
+
+def test_malformed_principals_are_rejected(client):
+    for header in ['not json', '[1]', '{"student_id": 1}', '{"user_id": "1", "student_id": 1}', '{"user_id": 1, "student_id": true}']:
+        response = client.get('/student/assignments', headers={'X-Principal': header})
+        assert response.status_code == 401
+        assert response.json['message'] == 'Invalid X-Principal header format'
+
+
+def test_teachers_listing_rejects_unverified_principal(client):
+    response = client.get('/api/principal/teachers', headers={'X-Principal': json.dumps({'user_id': 4, 'principal_id': 1})})
+    assert response.status_code == 400
+    assert response.json['message'] == 'Invalid X-Principal header'
+
+
+def test_verified_principals_are_cached_until_roles_are_written(client, h_student_1):
+    with app.app_context():
+        principal_cache = get_principal_cache()
+    client.get('/student/assignments', headers=h_student_1)
+    misses = principal_cache.misses
+
+    response = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 1})
+    assert response.status_code == 200
+    assert principal_cache.misses == misses
+
+    student = Student.query.get(1)
+    student.updated_at = helpers.get_utc_now()
+    db.session.commit()
+
+    response = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 2})
+    assert response.status_code == 200
+    assert principal_cache.misses == misses + 1
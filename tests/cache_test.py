@@ -0,0 +1,126 @@
+import multiprocessing
+import sys
+import threading
+
+from core import create_app, db
+from core.config import load_config
+from core.libs.cache import GenerationCounters, LRUCache, ResponseCache
+from core.models.assignments import Assignment
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired():
+    clock = FakeClock()
+    lru = LRUCache(max_entries=2, ttl=10, clock=clock)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+
+    clock.now = 10
+    assert lru.get('a') is None
+    assert len(lru) == 1
+
+
+def test_stats_count_every_lookup_of_concurrent_threads(tmp_path):
+    response_cache = ResponseCache(LRUCache(max_entries=10, ttl=60), GenerationCounters(str(tmp_path / 'generations')))
+
+    def look_up():
+        for _ in range(2000):
+            response_cache.get_or_compute('key', ['assignments:principal'], lambda: 'value')
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=look_up) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    stats = response_cache.stats()
+    assert stats['hits'] + stats['misses'] == 8 * 2000
+
+
+def _bump_in_other_process(path, scope):
+    GenerationCounters(path).bump([scope])
+
+
+def test_generations_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'generations')
+    counters = GenerationCounters(path)
+    assert counters.get('assignments:principal') == 0
+
+    worker = multiprocessing.get_context('fork').Process(
+        target=_bump_in_other_process, args=(path, 'assignments:principal')
+    )
+    worker.start()
+    worker.join()
+
+    assert worker.exitcode == 0
+    assert counters.get('assignments:principal') == 1
+
+
+def test_listings_are_cached_until_written(client, h_student_1, h_teacher_2):
+    response = client.get('/teacher/assignments', headers=h_teacher_2)
+    assert response.headers['X-Cache'] == 'MISS'
+    response = client.get('/teacher/assignments', headers=h_teacher_2)
+    assert response.headers['X-Cache'] == 'HIT'
+    stats = client.get('/cache/stats').json
+    assert stats['hits'] >= 1 and stats['misses'] >= 1
+
+    # a hit still answers conditional requests
+    response = client.get('/teacher/assignments', headers={**h_teacher_2, 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['X-Cache'] == 'HIT'
+
+    # a draft is not in the teacher's listing, submitting it to them is
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': 'CACHED'})
+    assignment_id = response.json['data']['id']
+    assert client.get('/teacher/assignments', headers=h_teacher_2).headers['X-Cache'] == 'HIT'
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': assignment_id, 'teacher_id': 2})
+
+    response = client.get('/teacher/assignments', headers=h_teacher_2)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert assignment_id in [a['id'] for a in response.json['data']]
+
+    Assignment.filter(Assignment.id == assignment_id).delete(synchronize_session='fetch')
+    db.session.commit()
+
+
+def test_rolled_back_writes_do_not_invalidate(client, h_principal):
+    client.get('/principal/assignments', headers=h_principal)
+
+    assignment = Assignment.get_by_id(1)
+    assignment.content = 'NOT KEPT'
+    db.session.flush()
+    db.session.rollback()
+
+    assert client.get('/principal/assignments', headers=h_principal).headers['X-Cache'] == 'HIT'
+
+
+def test_request_hooks_do_not_change_cached_responses(h_teacher_2):
+    hooked = create_app(load_config({'APP_ENV': 'test'}))
+
+    @hooked.after_request
+    def add_header(response):
+        response.headers.add('X-Hooked', 'yes')
+        return response
+
+    client = hooked.test_client()
+    miss = client.get('/teacher/assignments', headers=h_teacher_2, query_string={'limit': 4})
+    hit = client.get('/teacher/assignments', headers=h_teacher_2, query_string={'limit': 4})
+    assert (miss.headers['X-Cache'], hit.headers['X-Cache']) == ('MISS', 'HIT')
+    assert miss.headers.getlist('X-Hooked') == hit.headers.getlist('X-Hooked') == ['yes']
+    assert hit.get_data() == miss.get_data()
@@ -0,0 +1,77 @@
+import json
+
+from flask import url_for
+from flask.cli import routes_command
+from sqlalchemy import func
+from core import create_app, db
+from core.config import load_config
+from core.commands import content_storage_report, import_assignments, rebuild_grade_counts
+from core.models.assignments import Assignment, AssignmentGradeCount, AssignmentStateEnum, ContentBlob
+from tests import app
+
+
+def test_import_assignments_command(tmp_path):
+    ndjson_file = tmp_path / 'assignments.ndjson'
+    ndjson_file.write_text('\n'.join(
+        json.dumps({'student_id': 1, 'content': 'CLI IMPORT {0}'.format(i)}) for i in range(5)
+    ) + '\n' + json.dumps({'content': 'CLI IMPORT without student'}))
+
+    result = app.test_cli_runner().invoke(import_assignments, [str(ndjson_file), '--chunk-size', '2'])
+
+    assert result.exit_code == 0
+    output_lines = result.output.splitlines()
+    assert [line for line in output_lines if line.startswith('line ')] == [
+        'line 6: {"student_id": ["Missing data for required field."]}'
+    ]
+    assert [line for line in output_lines if not line.startswith('line ')] == [
+        '2 lines read, 2 imported, 0 failed',
+        '4 lines read, 4 imported, 0 failed',
+        '6 lines read, 5 imported, 1 failed',
+        'done: 5 imported, 1 failed',
+    ]
+
+    imported = Assignment.filter(Assignment.content.like('CLI IMPORT %'))
+    assert imported.count() == 5
+    imported.delete(synchronize_session='fetch')
+    db.session.commit()
+
+
+def test_rebuild_grade_counts_command():
+    result = app.test_cli_runner().invoke(rebuild_grade_counts)
+
+    assert result.exit_code == 0
+    expected = db.session.query(Assignment.teacher_id, Assignment.grade, func.count()).filter(
+        Assignment.state == AssignmentStateEnum.GRADED
+    ).group_by(Assignment.teacher_id, Assignment.grade).all()
+    stored = [(row.teacher_id, row.grade, row.count) for row in AssignmentGradeCount.query.order_by(
+        AssignmentGradeCount.teacher_id, AssignmentGradeCount.grade
+    )]
+    assert stored == expected
+
+
+def test_content_storage_report_command():
+    result = app.test_cli_runner().invoke(content_storage_report)
+
+    assert result.exit_code == 0
+    stats = ContentBlob.get_storage_stats()
+    assert stats['references'] == db.session.query(func.count(Assignment.id)).filter(Assignment.content.isnot(None)).scalar()
+    assert result.output.splitlines() == [
+        '{references} contents stored in {blobs} blobs'.format(**stats),
+        '{0} bytes of text stored in {1} bytes, {2} bytes saved'.format(
+            stats['text_bytes'], stats['stored_bytes'], stats['text_bytes'] - stats['stored_bytes']
+        ),
+    ]
+
+
+def test_routes_command_lists_the_api(monkeypatch):
+    # gunicorn's and scripts' apps register the API on their first request
+    assert 'api' not in create_app(load_config({'APP_ENV': 'dev'})).extensions
+
+    monkeypatch.setenv('FLASK_RUN_FROM_CLI', 'true')
+    cli_app = create_app(load_config({'APP_ENV': 'dev'}))
+    result = cli_app.test_cli_runner().invoke(routes_command)
+
+    assert result.exit_code == 0
+    assert '/principal/assignments/grade/bulk' in result.output
+    with cli_app.test_request_context():
+        assert url_for('principal_assignments_resources.list_assignments') == '/principal/assignments'
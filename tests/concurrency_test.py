@@ -0,0 +1,185 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from core import db
+from core.models.assignments import Assignment, AssignmentGradeCount
+from tests import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THREADS = 8
+FLOWS_PER_THREAD = 4
+GRADES = ('A', 'B', 'C', 'D')
+
+
+def _principal(**ids):
+    return {'X-Principal': json.dumps(ids)}
+
+
+STUDENTS = {1: _principal(student_id=1, user_id=1), 2: _principal(student_id=2, user_id=2)}
+TEACHERS = {1: _principal(teacher_id=1, user_id=3), 2: _principal(teacher_id=2, user_id=4)}
+
+
+def _assignment_flow(call, tag, flow):
+    """
+    One student's assignment from draft to graded, reading both listings on the way.
+    `call(method, path, headers, body)` returns (status, json), failed checks are returned as strings.
+    """
+    student_id, teacher_id, grade = flow % 2 + 1, flow // 2 % 2 + 1, GRADES[flow % 4]
+    errors = []
+
+    def expect(status, response, what):
+        if status != 200:
+            errors.append('{0} of flow {1}: {2} {3}'.format(what, flow, status, response))
+            return False
+        return True
+
+    status, response = call('POST', '/student/assignments', STUDENTS[student_id], {'content': '{0} {1}'.format(tag, flow)})
+    if not expect(status, response, 'create'):
+        return None, errors
+    assignment_id = response['data']['id']
+
+    status, response = call(
+        'POST', '/student/assignments/submit', STUDENTS[student_id], {'id': assignment_id, 'teacher_id': teacher_id}
+    )
+    if not expect(status, response, 'submit'):
+        return assignment_id, errors
+
+    status, response = call('GET', '/teacher/assignments?stream=true&content=none', TEACHERS[teacher_id], None)
+    if expect(status, response, 'teacher listing'):
+        if any(row['teacher_id'] != teacher_id for row in response['data']):
+            errors.append('teacher {0} listed the assignments of another teacher'.format(teacher_id))
+        if assignment_id not in {row['id'] for row in response['data']}:
+            errors.append('teacher {0} did not list submitted assignment {1}'.format(teacher_id, assignment_id))
+
+    status, response = call(
+        'POST', '/teacher/assignments/grade', TEACHERS[teacher_id], {'assignment_id': assignment_id, 'grade': grade}
+    )
+    expect(status, response, 'grade')
+
+    status, response = call('GET', '/student/assignments?stream=true&content=none', STUDENTS[student_id], None)
+    if expect(status, response, 'student listing'):
+        if any(row['student_id'] != student_id for row in response['data']):
+            errors.append('student {0} listed the assignments of another student'.format(student_id))
+        listed = {row['id']: row for row in response['data']}
+        if (listed.get(assignment_id) or {}).get('grade') != grade:
+            errors.append('student {0} did not list assignment {1} graded {2}'.format(student_id, assignment_id, grade))
+    return assignment_id, errors
+
+
+def _hammer(call):
+    tag = 'HAMMER-{0}'.format(uuid.uuid4().hex)
+    flows = range(THREADS * FLOWS_PER_THREAD)
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(lambda flow: _assignment_flow(call, tag, flow), flows))
+    assignment_ids = [assignment_id for assignment_id, _ in results if assignment_id is not None]
+    errors = [error for _, flow_errors in results for error in flow_errors]
+    try:
+        assert not errors, '\n'.join(errors)
+        assert len(set(assignment_ids)) == len(flows)
+
+        with app.app_context():
+            graded = Assignment.filter(Assignment.id.in_(assignment_ids)).all()
+            assert sorted(
+                (assignment.content, assignment.state.value, assignment.grade.value) for assignment in graded
+            ) == sorted(('{0} {1}'.format(tag, flow), 'GRADED', GRADES[flow % 4]) for flow in flows)
+            # the counts kept up to date by every concurrent grading match a recount
+            counts = AssignmentGradeCount.get_counts_by_teacher()
+            AssignmentGradeCount.rebuild()
+            assert counts == AssignmentGradeCount.get_counts_by_teacher()
+            db.session.rollback()
+    finally:
+        with app.app_context():
+            Assignment.filter(Assignment.id.in_(assignment_ids)).delete(synchronize_session=False)
+            AssignmentGradeCount.rebuild()
+            db.session.commit()
+
+
+def _test_client_call():
+    clients = threading.local()
+
+    def call(method, path, headers, body):
+        # one client per thread, like one connection per thread of a gthread worker
+        if not hasattr(clients, 'client'):
+            clients.client = app.test_client()
+        response = clients.client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json()
+    return call
+
+
+def test_concurrent_requests_in_threads():
+    _hammer(_test_client_call())
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _http_call(port):
+    def call(method, path, headers, body):
+        data = None if body is None else json.dumps(body).encode()
+        http_request = urllib.request.Request(
+            'http://127.0.0.1:{0}{1}'.format(port, path), data=data, method=method,
+            headers=dict(headers, **{'Content-Type': 'application/json'}),
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=30) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as err:
+            return err.code, err.read().decode(errors='replace')
+    return call
+
+
+@pytest.mark.parametrize('worker_class', ['gthread', 'gevent'])
+def test_concurrent_requests_on_gunicorn(worker_class, tmp_path):
+    pytest.importorskip('gunicorn')
+    if worker_class == 'gevent':
+        pytest.importorskip('gevent')
+    port = _free_port()
+    log_path = tmp_path / 'gunicorn.log'
+    env = dict(
+        os.environ, APP_ENV='test', GUNICORN_WORKER_CLASS=worker_class, GUNICORN_PORT=str(port),
+        GUNICORN_NUMBER_WORKERS='2', GUNICORN_LOG_LEVEL='warning', METRICS_DIR=str(tmp_path / 'metrics'),
+    )
+    with open(log_path, 'wb') as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'core.server:app'],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        call = _http_call(port)
+        deadline = time.monotonic() + 30
+        while True:
+            assert server.poll() is None, log_path.read_text()
+            try:
+                if call('GET', '/', {}, None)[0] == 200:
+                    break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, log_path.read_text()
+            time.sleep(0.1)
+        _hammer(call)
+
+        # /metrics sums what both workers counted
+        with urllib.request.urlopen('http://127.0.0.1:{0}/metrics'.format(port), timeout=30) as response:
+            samples = response.read().decode().splitlines()
+        created = 'http_requests_total{blueprint="student_assignments_resources",route="/student/assignments",' \
+            'method="POST",status="200"} '
+        assert [float(sample[len(created):]) for sample in samples if sample.startswith(created)] == [
+            THREADS * FLOWS_PER_THREAD
+        ]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    assert 'Traceback' not in log_path.read_text(), log_path.read_text()
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy.pool import QueuePool
+from core.config import ConfigError, PROFILES, load_config
+from tests import app
+
+
+def test_app_runs_the_test_profile():
+    assert app.config['APP_ENV'] == 'test'
+    assert app.config['SQLITE_PRAGMAS']['synchronous'] == 'OFF'
+
+
+@pytest.mark.parametrize('profile', list(PROFILES))
+def test_profiles_load_without_overrides(profile):
+    assert load_config({'APP_ENV': profile})['APP_ENV'] == profile
+
+
+def test_environment_overrides_profile():
+    config = load_config({
+        'APP_ENV': 'prod', 'DB_POOL_SIZE': '3', 'DB_POOL_PRE_PING': 'yes', 'RESPONSE_CACHE_TTL': '2.5',
+        'SQLITE_PROFILE': 'wal-durable', 'SQLITE_PRAGMAS': 'busy_timeout=100', 'STREAM_BATCH_SIZE': '50',
+    })
+    engine_options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert (engine_options['pool_size'], engine_options['pool_pre_ping']) == (3, True)
+    # SQLite files get a real pool instead of a connection per checkout
+    assert engine_options['poolclass'] is QueuePool
+    assert engine_options['connect_args'] == {'check_same_thread': False}
+    assert config['RESPONSE_CACHE_TTL'] == 2.5
+    assert config['STREAM_BATCH_SIZE'] == 50
+    assert (config['SQLITE_PRAGMAS']['synchronous'], config['SQLITE_PRAGMAS']['busy_timeout']) == ('FULL', 100)
+
+
+def test_no_pool_options_without_a_pool():
+    engine_options = load_config({'DB_POOL_SIZE': '0'})['SQLALCHEMY_ENGINE_OPTIONS']
+    assert 'pool_size' not in engine_options and 'poolclass' not in engine_options
+    engine_options = load_config({'DATABASE_URL': 'sqlite://'})['SQLALCHEMY_ENGINE_OPTIONS']
+    assert 'pool_size' not in engine_options
+
+
+def test_every_misconfiguration_is_reported_at_once():
+    with pytest.raises(ConfigError) as error:
+        load_config({
+            'DB_POOL_SIZE': '-1', 'RESPONSE_CACHE_TTL': 'nan', 'DB_POOL_PRE_PING': 'maybe',
+            'RESPONSE_CACHE_BACKEND': 'redis', 'DATABASE_URL': 'not a url', 'SQLITE_PRAGMAS': 'page_size=1',
+            'RESPONSE_CACHE_MAX_ENTRIE': '10', 'SLOW_QUERY_SECONDS': '-1',
+            'PROFILER_SAMPLE_RATE': '2',
+        })
+    message = str(error.value)
+    for name in [
+        'DB_POOL_SIZE', 'RESPONSE_CACHE_TTL', 'DB_POOL_PRE_PING', 'RESPONSE_CACHE_BACKEND', 'DATABASE_URL',
+        'SQLITE_PRAGMAS', 'RESPONSE_CACHE_MAX_ENTRIE is not a setting', 'SLOW_QUERY_SECONDS',
+        'PROFILER_SAMPLE_RATE',
+    ]:
+        assert name in message
+
+    with pytest.raises(ConfigError):
+        load_config({'APP_ENV': 'staging'})
@@ -1,8 +1,19 @@
 import pytest
 import json
+from sqlalchemy import event, update
+from core import db
+from core.apis.responses import get_response_cache
+from core.models.assignments import Assignment
 from tests import app
 
 
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    """Tests also write rows behind the app's back, start each one without cached responses"""
+    with app.app_context():
+        get_response_cache().clear()
+
+
 @pytest.fixture
 def client():
     return app.test_client()
@@ -66,3 +77,28 @@ def h_principal():
     }
 
     return headers
+
+
+@pytest.fixture
+def update_after_first_read():
+    """
+    Arms an UPDATE of one assignment, committed by another connection right after the next
+    statement reading assignments: a concurrent request winning the race against a batch
+    validated by that read
+    """
+    armed = []
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if armed and statement.startswith('SELECT') and 'FROM assignments' in statement:
+            assignment_id, values = armed.pop()
+            with db.engine.begin() as connection:
+                connection.execute(update(Assignment.__table__).where(Assignment.id == assignment_id).values(
+                    version=Assignment.version + 1, **values
+                ))
+
+    def arm(assignment_id, **values):
+        armed.append((assignment_id, values))
+
+    event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    yield arm
+    event.remove(db.engine, 'after_cursor_execute', after_cursor_execute)
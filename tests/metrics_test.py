@@ -0,0 +1,117 @@
+import multiprocessing
+import re
+
+from core import create_app
+from core.apis import metrics as request_metrics
+from core.config import load_config
+from core.libs import metrics
+
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+ROUTE = 'route="/principal/assignments",method="GET"'
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == request_metrics.CONTENT_TYPE
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if not line.startswith('#'):
+            name, labels, value = SAMPLE.match(line).groups()
+            samples[(name, labels or '')] = float(value)
+    return samples
+
+
+def route_samples(samples, name):
+    return {labels: value for (sample_name, labels), value in samples.items() if sample_name == name and ROUTE in labels}
+
+
+def test_requests_are_counted_per_route_and_status(client, h_principal):
+    before = scrape(client)
+    # distinct pages, a response cache hit runs no SQL
+    for limit in (5, 6, 7):
+        assert client.get('/principal/assignments', headers=h_principal, query_string={'limit': limit}).status_code == 200
+    assert client.get('/principal/assignments', query_string={'limit': 5}).status_code == 401
+    after = scrape(client)
+
+    def delta(name, labels):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+    labels = 'blueprint="principal_assignments_resources",{0}'.format(ROUTE)
+    assert delta('http_requests_total', labels + ',status="200"') == 3
+    assert delta('http_requests_total', labels + ',status="401"') == 1
+    assert delta('http_request_duration_seconds_count', labels) == 4
+    assert delta('http_request_sql_statements_count', labels) == 4
+    # every page reads the assignments, the failed authentication reads nothing
+    assert delta('http_request_sql_statements_sum', labels) >= 3
+    assert delta('http_request_db_seconds_total', labels) > 0
+    assert delta('http_request_serialization_seconds_total', labels) > 0
+
+    buckets = route_samples(after, 'http_request_duration_seconds_bucket')
+    counts = [value for labels, value in sorted(buckets.items(), key=lambda item: float(item[0].split('le="')[1][:-1]))]
+    assert counts == sorted(counts)
+    assert buckets[labels + ',le="+Inf"'] == after[('http_request_duration_seconds_count', labels)]
+
+
+def test_streamed_listing_is_recorded_once_sent(client, h_principal):
+    labels = 'blueprint="principal_assignments_resources",{0},status="200"'.format(ROUTE)
+    before = scrape(client).get(('http_requests_total', labels), 0)
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'stream': 'true'})
+    assert response.is_streamed
+    response.get_data()
+    assert scrape(client).get(('http_requests_total', labels), 0) == before
+    response.close()
+    assert scrape(client).get(('http_requests_total', labels), 0) == before + 1
+
+
+SHARED = metrics.key('jobs_total', [['queue', 'shared']])
+
+
+def _add_in_child(directory):
+    metrics.Registry(directory).add({metrics.key('jobs_total', [['queue', 'child']]): 2, SHARED: 1})
+
+
+def test_registry_sums_the_files_of_every_process(tmp_path):
+    registry = metrics.Registry(str(tmp_path))
+    registry.add({metrics.key('jobs_total', [['queue', 'parent']]): 1, SHARED: 1})
+    child = multiprocessing.get_context('fork').Process(target=_add_in_child, args=(str(tmp_path),))
+    child.start()
+    child.join()
+    registry.add({SHARED: 1})
+
+    assert len(list(tmp_path.glob('metrics-*.db'))) == 2
+    values = registry.collect()
+    assert values[SHARED] == 3
+    assert values[metrics.key('jobs_total', [['queue', 'child']])] == 2
+    assert metrics.render(values, {'jobs_total': ('counter', 'Jobs')}, {}) == (
+        '# HELP jobs_total Jobs\n# TYPE jobs_total counter\n'
+        'jobs_total{queue="child"} 2.0\njobs_total{queue="parent"} 1.0\njobs_total{queue="shared"} 3.0\n'
+    )
+
+
+def test_process_values_grow_past_their_first_mapping(tmp_path):
+    values = metrics.ProcessValues(str(tmp_path / 'metrics-1.db'))
+    values.add({'key-{0}-{1}'.format(i, 'x' * 100): i for i in range(2000)})
+    values.add({'key-7-{0}'.format('x' * 100): 0.5})
+    read = metrics.read_values(str(tmp_path / 'metrics-1.db'))
+    assert len(read) == 2000
+    assert read['key-7-{0}'.format('x' * 100)] == 7.5
+
+
+def test_histogram_buckets_are_cumulative():
+    values = {}
+    for observed in (0.003, 0.02, 0.02, 20):
+        for value_key, amount in metrics.histogram_amounts('latency', [['route', '/']], observed, (0.01, 0.1)).items():
+            values[value_key] = values.get(value_key, 0) + amount
+    assert metrics.render(values, {'latency': ('histogram', 'Latency')}, {'latency': (0.01, 0.1)}).splitlines()[2:] == [
+        'latency_bucket{route="/",le="0.01"} 1.0',
+        'latency_bucket{route="/",le="0.1"} 3.0',
+        'latency_bucket{route="/",le="+Inf"} 4.0',
+        'latency_sum{route="/"} 20.043',
+        'latency_count{route="/"} 4.0',
+    ]
+
+
+def test_metrics_can_be_turned_off():
+    unmetered = create_app(load_config({'APP_ENV': 'test', 'METRICS_ENABLED': 'false'}))
+    assert unmetered.test_client().get('/metrics').status_code == 404
@@ -0,0 +1,43 @@
+import zlib
+
+from flask_migrate import Migrate, downgrade, upgrade
+
+from core import create_app, db
+from core.config import load_config
+
+MIGRATIONS = 'core/migrations'
+SHORT = 'short essay'
+LONG = 'A PARAGRAPH WORTH COMPRESSING ' * 10
+
+
+def migrated_app(path, revision):
+    app = create_app(load_config({'APP_ENV': 'test', 'DATABASE_URL': 'sqlite:///' + str(path)}))
+    Migrate(app, db)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision=revision)
+    return app
+
+
+def test_content_blobs_round_trip_raw_and_compressed_contents(tmp_path):
+    app = migrated_app(tmp_path / 'store.sqlite3', '9c3e5a7d1b42')
+    with app.app_context():
+        first, second = db.session.execute(db.text('SELECT id FROM assignments ORDER BY id LIMIT 2')).scalars()
+        db.session.execute(db.text('UPDATE assignment_contents SET content = :content WHERE assignment_id = :id'), [
+            {'id': first, 'content': SHORT}, {'id': second, 'content': LONG},
+        ])
+        db.session.commit()
+        before = dict(db.session.execute(db.text('SELECT assignment_id, content FROM assignment_contents')).all())
+
+        upgrade(directory=MIGRATIONS, revision='a41f0c6e2d87')
+        blobs = dict(db.session.execute(db.text(
+            'SELECT assignment_id, data FROM assignment_contents JOIN content_blobs ON hash = content_hash'
+        )).all())
+        assert blobs[first] == b'\x00' + SHORT.encode('utf8')
+        assert zlib.decompress(blobs[second]).decode('utf8') == LONG
+        # no blob is larger than its text plus the raw marker
+        assert not db.session.execute(db.text('SELECT COUNT(*) FROM content_blobs WHERE LENGTH(data) > size + 1')).scalar()
+
+        downgrade(directory=MIGRATIONS, revision='9c3e5a7d1b42')
+        after = dict(db.session.execute(db.text('SELECT assignment_id, content FROM assignment_contents')).all())
+        assert after == before
+        db.session.remove()
@@ -1,5 +1,8 @@
+import base64
+import json
 from unittest.mock import patch
-from core.models.assignments import AssignmentStateEnum, GradeEnum
+from core import db
+from core.models.assignments import Assignment, AssignmentGradeCount, AssignmentStateEnum, GradeEnum
 from core.models.teachers import Teacher  # Added for teacher-related test
 
 
@@ -126,3 +129,288 @@ def test_get_teachers_invalid_principal_id(client):
     )
     assert response.status_code == 400
     assert "Invalid X-Principal header" in response.json["message"]
+
+
+def test_get_assignments_paginated(client, h_principal):
+    """
+    Walking the pages with the returned cursor yields every assignment exactly once, in (updated_at, id) order
+    """
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'limit': 1000})
+    assert response.status_code == 200
+    expected_ids = [assignment['id'] for assignment in response.json['data']]
+
+    seen_ids = []
+    cursor = None
+    while True:
+        query_string = {'limit': 2}
+        if cursor:
+            query_string['cursor'] = cursor
+        response = client.get('/principal/assignments', headers=h_principal, query_string=query_string)
+        assert response.status_code == 200
+        assert len(response.json['data']) <= 2
+        seen_ids.extend(assignment['id'] for assignment in response.json['data'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen_ids == expected_ids
+
+
+def test_get_assignments_invalid_cursor(client, h_principal):
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'invalid cursor'
+
+    # ids that are no integer or do not fit a 64-bit one
+    for url, key in [
+        ('/principal/assignments', '["2021-09-17T03:14:01", 1e400]'),
+        ('/principal/assignments', '["2021-09-17T03:14:01", {0}]'.format(2 ** 63)),
+        ('/principal/assignments/search', '[-1.5, 1e400]'),
+        ('/principal/assignments/search', '[1e400, {0}]'.format(-2 ** 63 - 1)),
+    ]:
+        cursor = base64.urlsafe_b64encode(key.encode('utf8')).decode('ascii')
+        response = client.get(url, headers=h_principal, query_string={'cursor': cursor, 'q': 'essay'})
+        assert response.status_code == 400
+        assert response.json['message'] == 'invalid cursor'
+
+
+def test_get_assignments_invalid_limit(client, h_principal):
+    for limit in (0, 1001, 'abc', '1.5', ''):
+        response = client.get('/principal/assignments', headers=h_principal, query_string={'limit': limit})
+
+        assert response.status_code == 400
+        assert response.json['message'] == 'limit should be between 1 and 1000'
+
+
+def test_bulk_grade_assignments(client, h_principal):
+    """
+    Principals can re-grade graded assignments in bulk, drafts are reported back
+    """
+    response = client.post(
+        '/principal/assignments/grade/bulk',
+        json={
+            'assignments': [
+                {'id': 4, 'grade': GradeEnum.A.value},
+                {'id': 5, 'grade': GradeEnum.A.value}
+            ]
+        },
+        headers=h_principal
+    )
+
+    assert response.status_code == 200
+    first, second = response.json['data']
+    assert first == {'id': 4, 'grade': GradeEnum.A, 'success': True, 'message': None}
+    assert second['success'] is False
+    assert second['message'] == 'only SUBMITTED or GRADED assignments can be graded'
+
+
+def test_bulk_grade_assignments_empty(client, h_principal):
+    response = client.post(
+        '/principal/assignments/grade/bulk',
+        json={'assignments': []},
+        headers=h_principal
+    )
+
+    assert response.status_code == 400
+
+
+def test_import_assignments(client, h_principal):
+    """
+    Valid lines are imported, every invalid line is reported with its line number
+    """
+    lines = [
+        json.dumps({'student_id': 1, 'content': 'IMPORTED 1'}),
+        '',
+        json.dumps({'student_id': 2, 'teacher_id': 1, 'content': 'IMPORTED 2', 'state': 'SUBMITTED'}),
+        '{not json',
+        json.dumps({'student_id': 1}),
+        json.dumps({'student_id': 99999, 'content': 'IMPORTED 3'}),
+        json.dumps({'student_id': 1, 'teacher_id': 1, 'content': 'IMPORTED 4', 'state': 'GRADED'}),
+    ]
+    response = client.post(
+        '/principal/assignments/import',
+        data='\n'.join(lines),
+        headers=h_principal,
+        content_type='application/x-ndjson'
+    )
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [event['line'] for event in events if 'line' in event] == [4, 5, 6, 7]
+    assert events[-1] == {'summary': {'lines': 7, 'imported': 2, 'failed': 4}}
+
+    imported = Assignment.filter(Assignment.content.in_(['IMPORTED 1', 'IMPORTED 2'])).all()
+    assert sorted((a.student_id, a.state) for a in imported) == [(1, 'DRAFT'), (2, 'SUBMITTED')]
+    for assignment in imported:
+        db.session.delete(assignment)
+    db.session.commit()
+
+
+def test_import_assignments_with_explicit_and_generated_ids(client, h_principal):
+    """
+    Each content lands on the assignment its line created, whether the line gave an id or not
+    """
+    explicit_id = db.session.query(db.func.max(Assignment.id)).scalar() + 50
+    lines = [
+        {'student_id': 1, 'content': 'GENERATED BEFORE'},
+        {'id': explicit_id, 'student_id': 1, 'content': 'EXPLICIT'},
+        {'student_id': 2, 'content': 'GENERATED AFTER'},
+        {'id': explicit_id - 20, 'student_id': 2, 'content': 'EXPLICIT IN A GAP'},
+    ]
+    response = client.post(
+        '/principal/assignments/import',
+        data='\n'.join(json.dumps(line) for line in lines),
+        headers=h_principal,
+        content_type='application/x-ndjson'
+    )
+    assert response.status_code == 200
+    assert json.loads(response.data.decode().splitlines()[-1])['summary']['imported'] == 4
+
+    imported = {a.content: a for a in Assignment.filter(Assignment.content.in_([line['content'] for line in lines]))}
+    assert imported['EXPLICIT'].id == explicit_id
+    assert imported['EXPLICIT IN A GAP'].id == explicit_id - 20
+    assert imported['GENERATED AFTER'].id > explicit_id
+    assert [imported[line['content']].student_id for line in lines] == [line['student_id'] for line in lines]
+    for assignment in imported.values():
+        db.session.delete(assignment)
+    db.session.commit()
+
+
+def test_get_assignments_streamed(client, h_principal):
+    """
+    The streamed listing holds the same assignments as the paginated one, in one JSON document
+    """
+    paged = client.get('/principal/assignments', headers=h_principal, query_string={'limit': 1000})
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'stream': 'true'})
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.json == {'data': paged.json['data']}
+
+
+def test_grade_reports(client, h_principal):
+    """
+    The reports follow grading as it happens, without re-reading the assignments
+    """
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+
+    response = client.get('/principal/assignments/reports/grades', headers=h_principal)
+    assert response.status_code == 200
+    for grade in GradeEnum:
+        assert response.json['data'][grade.value] == Assignment.filter(
+            Assignment.state == AssignmentStateEnum.GRADED, Assignment.grade == grade
+        ).count()
+    grades_before = response.json['data']
+
+    submitted = Assignment(student_id=1, teacher_id=2, content='REPORTED', state=AssignmentStateEnum.SUBMITTED)
+    db.session.add(submitted)
+    db.session.commit()
+    submitted_id = submitted.id
+
+    client.post('/principal/assignments/grade', json={'id': submitted_id, 'grade': 'D'}, headers=h_principal)
+    client.post(
+        '/principal/assignments/grade/bulk',
+        json={'assignments': [{'id': submitted_id, 'grade': 'C'}]},
+        headers=h_principal
+    )
+
+    grades_after = client.get('/principal/assignments/reports/grades', headers=h_principal).json['data']
+    assert grades_after['C'] == grades_before['C'] + 1
+    assert grades_after['D'] == grades_before['D']
+
+    response = client.get('/principal/assignments/reports/teachers', headers=h_principal)
+    assert response.status_code == 200
+    teachers = response.json['data']
+    assert [teacher['graded'] for teacher in teachers] == sorted((teacher['graded'] for teacher in teachers), reverse=True)
+    assert sum(teacher['grades']['C'] for teacher in teachers) == grades_after['C']
+
+    Assignment.filter(Assignment.id == submitted_id).delete(synchronize_session='fetch')
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+
+
+def test_search_assignments(client, h_principal, h_teacher_2):
+    """
+    Search finds submitted assignments by their words, best match first, and follows edits and deletes
+    """
+    contents = [
+        'Photosynthesis converts light. Photosynthesis feeds plants. Photosynthesis everywhere.',
+        'A short note mentioning photosynthesis once among many other unrelated words here',
+        'Nothing to see in this essay',
+    ]
+    ids = []
+    for content in contents:
+        assignment = Assignment(student_id=1, teacher_id=2, content=content, state=AssignmentStateEnum.SUBMITTED)
+        db.session.add(assignment)
+        db.session.flush()
+        ids.append(assignment.id)
+    draft = Assignment(student_id=1, content='photosynthesis draft', state=AssignmentStateEnum.DRAFT)
+    db.session.add(draft)
+    db.session.flush()
+    ids.append(draft.id)
+    db.session.commit()
+
+    response = client.get('/principal/assignments/search', headers=h_principal, query_string={'q': 'PHOTOSYNTHESIS', 'limit': 1})
+    assert response.status_code == 200
+    assert [a['id'] for a in response.json['data']] == [ids[0]]
+    response = client.get(
+        '/principal/assignments/search',
+        headers=h_principal,
+        query_string={'q': 'photosynthesis', 'limit': 1, 'cursor': response.json['next_cursor']}
+    )
+    assert [a['id'] for a in response.json['data']] == [ids[1]]
+    assert response.json['next_cursor'] is None
+
+    # terms are matched as words, operators and quotes are searched as text
+    response = client.get('/teacher/assignments/search', headers=h_teacher_2, query_string={'q': 'plants "light', 'content': 'none'})
+    assert response.status_code == 200
+    assert response.json['data'] == [
+        {k: v for k, v in a.items() if k != 'content'}
+        for a in client.get('/principal/assignments/search', headers=h_principal, query_string={'q': 'light plants'}).json['data']
+    ]
+
+    Assignment.filter(Assignment.id == ids[1]).update({Assignment.state: AssignmentStateEnum.DRAFT}, synchronize_session=False)
+    edited = Assignment.get_by_id(ids[1])
+    edited.content = 'Rewritten without the word'
+    Assignment.filter(Assignment.id == ids[0]).delete(synchronize_session='fetch')
+    db.session.commit()
+    response = client.get('/principal/assignments/search', headers=h_principal, query_string={'q': 'photosynthesis'})
+    assert response.json['data'] == []
+    response = client.get('/principal/assignments/search', headers=h_principal, query_string={'q': 'rewritten'})
+    assert response.json['data'] == []  # a draft again
+
+    response = client.get('/principal/assignments/search', headers=h_principal, query_string={'q': '  '})
+    assert response.status_code == 400
+    assert response.json['error'] == 'ValidationError'
+
+    Assignment.filter(Assignment.id.in_(ids[1:])).delete(synchronize_session='fetch')
+    db.session.commit()
+
+
+def test_get_assignments_not_modified_until_graded(client, h_principal):
+    response = client.get('/principal/assignments', headers=h_principal, query_string={'content': 'none'})
+    etag = response.headers['ETag']
+    assert response.headers['Vary'] == 'X-Principal'
+
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag}, query_string={'content': 'none'})
+    assert response.status_code == 304
+
+    submitted = Assignment(student_id=1, teacher_id=2, content='ETAG', state=AssignmentStateEnum.SUBMITTED)
+    db.session.add(submitted)
+    db.session.commit()
+    assignment_id = submitted.id
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag}, query_string={'content': 'none'})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    # writes to existing rows move max(updated_at)
+    client.post('/principal/assignments/grade', headers=h_principal, json={'id': assignment_id, 'grade': 'B'})
+    response = client.get('/principal/assignments', headers={**h_principal, 'If-None-Match': etag}, query_string={'content': 'none'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    Assignment.filter(Assignment.id == assignment_id).delete(synchronize_session='fetch')
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
@@ -0,0 +1,89 @@
+import json
+import pstats
+
+from core import create_app, load_api
+from core.apis import profiling as request_profiling
+from core.commands import profiles
+from core.config import load_config
+from core.libs import profiling
+
+SECRET = 'profiling-test-secret'
+
+
+def profiling_app(directory, **settings):
+    return create_app(load_config(dict(
+        {'APP_ENV': 'test', 'PROFILER_SECRET': SECRET, 'PROFILER_DIR': str(directory)}, **settings
+    )))
+
+
+def test_a_signed_request_is_profiled_under_its_request_id(tmp_path, h_principal):
+    client = profiling_app(tmp_path).test_client()
+    headers = dict(h_principal, **{'X-Profile': profiling.make_token(SECRET, 60), 'X-Request-Id': 'slow-listing-1'})
+    response = client.get('/principal/assignments', headers=headers, query_string={'limit': 3})
+    assert response.status_code == 200
+    assert response.headers['X-Request-Id'] == 'slow-listing-1'
+
+    details = json.loads((tmp_path / 'slow-listing-1.json').read_text())
+    assert details['endpoint'] == 'principal_assignments_resources.list_assignments'
+    assert (details['status'], details['trigger'], details['path']) == (200, 'header', '/principal/assignments?limit=3')
+    functions = pstats.Stats(str(tmp_path / 'slow-listing-1.pstats')).stats
+    assert any(name == 'list_assignments' for _, _, name in functions)
+
+
+def test_a_cached_hit_does_not_replay_the_profiled_request_id(tmp_path, h_principal):
+    client = profiling_app(tmp_path).test_client()
+    profiled = client.get('/principal/assignments', query_string={'limit': 4}, headers=dict(
+        h_principal, **{'X-Profile': profiling.make_token(SECRET, 60), 'X-Request-Id': 'req-aaa'}
+    ))
+    assert (profiled.headers['X-Cache'], profiled.headers['X-Request-Id']) == ('MISS', 'req-aaa')
+
+    hit = client.get('/principal/assignments', query_string={'limit': 4}, headers=dict(h_principal, **{'X-Request-Id': 'req-bbb'}))
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert 'X-Request-Id' not in hit.headers
+    assert [path.name for path in tmp_path.glob('*.pstats')] == ['req-aaa.pstats']
+
+
+def test_unsigned_or_expired_requests_are_not_profiled(tmp_path, h_principal):
+    client = profiling_app(tmp_path).test_client()
+    for token in (None, profiling.make_token('another secret', 60), profiling.make_token(SECRET, -10), 'garbage'):
+        headers = dict(h_principal, **({'X-Profile': token} if token else {}))
+        response = client.get('/principal/assignments', headers=headers)
+        assert response.status_code == 200 and 'X-Request-Id' not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_sampled_and_streamed_requests_get_generated_ids(tmp_path, h_principal):
+    client = profiling_app(tmp_path, PROFILER_SECRET='', PROFILER_SAMPLE_RATE='1').test_client()
+    response = client.get(
+        '/principal/assignments', headers=dict(h_principal, **{'X-Request-Id': '../escape'}),
+        query_string={'stream': 'true'},
+    )
+    request_id = response.headers['X-Request-Id']
+    assert request_id != '../escape'
+    response.get_data()
+    assert not (tmp_path / (request_id + '.json')).exists()
+    response.close()
+    assert json.loads((tmp_path / (request_id + '.json')).read_text())['trigger'] == 'sample'
+
+
+def test_no_hooks_without_a_secret_or_a_rate():
+    app = create_app(load_config({'APP_ENV': 'test'}))
+    load_api(app)
+    assert request_profiling.start_request not in app.before_request_funcs[None]
+
+
+def test_profiles_commands(tmp_path, h_principal):
+    app = profiling_app(tmp_path)
+    runner = app.test_cli_runner()
+    token = runner.invoke(profiles, ['token', '--ttl', '60']).output.strip()
+    assert profiling.verify_token(SECRET, token)
+
+    headers = dict(h_principal, **{'X-Profile': token, 'X-Request-Id': 'cli-1'})
+    assert app.test_client().get('/principal/assignments', headers=headers).status_code == 200
+
+    listed = runner.invoke(profiles, ['list'])
+    assert listed.exit_code == 0
+    assert 'cli-1' in listed.output and 'GET /principal/assignments (header)' in listed.output
+    shown = runner.invoke(profiles, ['show', 'cli-1', '--sort', 'tottime', '--limit', '5'])
+    assert shown.exit_code == 0 and 'tottime' in shown.output
+    assert runner.invoke(profiles, ['show', 'missing']).exit_code != 0
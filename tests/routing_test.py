@@ -0,0 +1,92 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from core import db
+from core.config import load_config
+from core.libs import routing
+from tests import app
+
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_get_requests_read_from_read_engine(client, h_student_1):
+    with app.app_context():
+        primary, read_engine = db.engine, routing.get_read_engine(app)
+    assert read_engine is not None and read_engine is not primary
+
+    with captured_statements(primary) as written, captured_statements(read_engine) as read:
+        response = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 3})
+    assert response.status_code == 200
+    assert read and not written
+
+    with captured_statements(primary) as written, captured_statements(read_engine) as read:
+        response = client.post('/student/assignments', headers=h_student_1, json={'content': 'ROUTED'})
+    assert response.status_code == 200
+    assert written and not read
+    db.session.execute(text('DELETE FROM assignments WHERE id = :id'), {'id': response.json['data']['id']})
+    db.session.commit()
+
+
+def _create_database(path, name):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE origin (name TEXT)')
+        connection.execute('INSERT INTO origin VALUES (?)', (name,))
+    connection.close()
+
+
+def test_router_with_two_sqlite_files(tmp_path):
+    _create_database(str(tmp_path / 'primary.sqlite3'), 'primary')
+    _create_database(str(tmp_path / 'replica.sqlite3'), 'replica')
+    routed_app = Flask(__name__)
+    routed_app.config.from_mapping(load_config({
+        'APP_ENV': 'test',
+        'DATABASE_URL': 'sqlite:///{0}'.format(tmp_path / 'primary.sqlite3'),
+        'DATABASE_READ_URL': 'sqlite:///{0}'.format(tmp_path / 'replica.sqlite3'),
+    }))
+    routed_db = routing.RoutingSQLAlchemy(routed_app)
+    select_origin = text('SELECT name FROM origin')
+
+    with routed_app.app_context():
+        session = routed_db.session()
+        assert session.execute(select_origin).scalar() == 'primary'
+
+        routing.use_read_engine(session)
+        assert session.execute(select_origin).scalar() == 'replica'
+        assert not session.autoflush
+        with pytest.raises(OperationalError, match='readonly'):
+            session.execute(text("INSERT INTO origin VALUES ('written')"))
+        session.rollback()
+
+        routing.use_primary_engine(session)
+        session.execute(text("INSERT INTO origin VALUES ('written')"))
+        session.commit()
+        assert session.execute(text('SELECT count(*) FROM origin')).scalar() == 2
+        routed_db.session.remove()
+        routed_db.get_engine().dispose()
+        routing.get_read_engine(routed_app).dispose()
+
+
+def test_read_only_url_of_sqlite_files():
+    url = routing.read_only_url('sqlite:///./store.sqlite3', '/srv/app/core')
+    assert str(url) == 'sqlite:///file:/srv/app/core/store.sqlite3?mode=ro&uri=true'
+    assert str(routing.read_only_url('sqlite:////data/replica.sqlite3', '/srv')) == (
+        'sqlite:///file:/data/replica.sqlite3?mode=ro&uri=true'
+    )
+    assert str(routing.read_only_url('postgresql://replica/app', '/srv')) == 'postgresql://replica/app'
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+from flask import jsonify
+from core import db
+from core.apis import responses
+from core.apis.assignments import serializer
+from core.apis.assignments.schema import AssignmentSchema
+from core.models.assignments import (
+    CONTENT_PREVIEW_LENGTH, Assignment, AssignmentRecord, AssignmentStateEnum, ContentModeEnum, GradeEnum
+)
+from tests import app
+
+
+UNICODE_ASSIGNMENT = dict(
+    id=10 ** 6, student_id=1, teacher_id=2, content='Éssay – “quoted” \\ </script>   😀\n',
+    state=AssignmentStateEnum.GRADED, grade=GradeEnum.C,
+    created_at=datetime(2021, 9, 17, 3, 14, 1, 580126), updated_at=datetime(2021, 9, 17, 3, 20)
+)
+
+
+def sample_assignments():
+    """(Assignments, the same assignments as AssignmentRecords), in listing order"""
+    assignments = Assignment.filter().order_by(Assignment.updated_at, Assignment.id).all()
+    assignments.append(Assignment(**UNICODE_ASSIGNMENT))
+    records = Assignment.get_page(Assignment.filter())
+    records.append(AssignmentRecord(**UNICODE_ASSIGNMENT))
+    return assignments, records
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_responses_are_byte_identical_to_schema_dumps(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(responses, 'orjson', None)
+    assignments, records = sample_assignments()
+
+    with app.test_request_context():
+        expected = jsonify(data=AssignmentSchema().dump(assignments, many=True), next_cursor=None).get_data()
+        actual = responses.APIResponse.respond(data=serializer.dump_many(records), next_cursor=None).get_data()
+        assert actual == expected
+
+        expected = jsonify(data=AssignmentSchema().dump(assignments[-1])).get_data()
+        assert responses.APIResponse.respond(data=serializer.dump(assignments[-1])).get_data() == expected
+
+        expected = jsonify(data=AssignmentSchema(exclude=('content',)).dump(assignments[-1])).get_data()
+        actual = responses.APIResponse.respond(data=serializer.get_dumper(ContentModeEnum.NONE)(records[-1])).get_data()
+        assert actual == expected
+
+        # reports are keyed by enums, which orjson does not take
+        counts = dict.fromkeys(GradeEnum, 0)
+        assert responses.APIResponse.respond(data=counts).get_data() == jsonify(data=counts).get_data()
+
+
+def test_stream_matches_respond():
+    _, records = sample_assignments()
+
+    with app.test_request_context():
+        streamed = b''.join(responses.APIResponse.stream(records, serializer.get_dumper(), chunk_rows=2).response)
+        assert streamed == responses.APIResponse.respond(data=serializer.dump_many(records)).get_data()
+
+
+@pytest.mark.parametrize('content_mode', list(ContentModeEnum))
+def test_listings_read_records_without_loading_assignments(content_mode):
+    db.session.expunge_all()
+
+    records = Assignment.get_page(Assignment.query_by_principal(), content_mode=content_mode)
+    streamed = list(Assignment.iter_all(Assignment.query_by_principal(), batch_size=2, content_mode=content_mode))
+
+    assert records and streamed == records
+    assert all(isinstance(record, AssignmentRecord) for record in records)
+    assert not db.session.identity_map
+    for record in records:
+        content = Assignment.get_by_id(record.id).content
+        expected = {
+            ContentModeEnum.FULL: content,
+            ContentModeEnum.PREVIEW: content[:CONTENT_PREVIEW_LENGTH],
+            ContentModeEnum.NONE: None
+        }[content_mode]
+        assert record.content == expected
@@ -0,0 +1,75 @@
+import json
+
+from core import create_app, db
+from core.config import load_config
+from core.libs import slow_queries
+from core.models.assignments import Assignment
+
+
+def logging_app(path, **settings):
+    return create_app(load_config(dict(
+        {'APP_ENV': 'test', 'SLOW_QUERY_LOG': str(path), 'SLOW_QUERY_SECONDS': '0', 'RESPONSE_CACHE_BACKEND': 'null'},
+        **settings
+    )))
+
+
+def read_lines(path):
+    with open(path, encoding='utf8') as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def listing_entries(lines):
+    return [line for line in lines if line['statement'].startswith('SELECT assignments.id')]
+
+
+def test_slow_statements_are_logged_with_their_endpoint_and_plan(tmp_path, h_principal):
+    path = tmp_path / 'slow.jsonl'
+    client = logging_app(path).test_client()
+    for _ in range(2):
+        assert client.get('/principal/assignments', headers=h_principal, query_string={'limit': 3}).status_code == 200
+
+    first, second = listing_entries(read_lines(path))
+    assert first['endpoint'] == 'principal_assignments_resources.list_assignments'
+    assert first['method'] == 'GET'
+    assert first['duration_seconds'] >= 0
+    # the types of the parameters, never their values
+    assert 'int' in first['parameters'] and 3 not in first['parameters']
+    assert any('assignments' in line for line in first['plan'])
+    # the plan is written once per file, later lines point at it
+    assert second['plan_id'] == first['plan_id'] and 'plan' not in second
+
+
+def test_statements_under_the_threshold_are_not_logged(tmp_path, h_principal):
+    path = tmp_path / 'slow.jsonl'
+    client = logging_app(path, SLOW_QUERY_SECONDS='60').test_client()
+    assert client.get('/principal/assignments', headers=h_principal).status_code == 200
+    assert not path.exists()
+
+
+def test_commands_and_executemany_are_logged(tmp_path):
+    path = tmp_path / 'slow.jsonl'
+    app = logging_app(path)
+    with app.app_context():
+        db.session.remove()
+        db.session.execute(db.text('SELECT id FROM assignments WHERE id IN (:first, :second)'), {'first': 1, 'second': 'x'})
+        db.session.execute(db.text('UPDATE assignments SET state = state WHERE id = :id'), [{'id': 1}, {'id': 2}])
+        db.session.rollback()
+
+    by_id, many = read_lines(path)
+    assert by_id['parameters'] == ['int', 'str'] and by_id['command'] is None and 'endpoint' not in by_id
+    assert many['parameters'] == {'rows': 2, 'each': ['int']}
+
+
+def test_the_log_rotates_and_the_new_file_repeats_the_plan(tmp_path):
+    path = tmp_path / 'slow.jsonl'
+    app = logging_app(path, SLOW_QUERY_LOG_MAX_BYTES='2000', SLOW_QUERY_LOG_BACKUPS='2')
+    with app.app_context():
+        for _ in range(20):
+            Assignment.query.filter(Assignment.id == 1).all()
+    slow_queries.get_log(app).close()
+
+    assert (tmp_path / 'slow.jsonl.1').exists() and (tmp_path / 'slow.jsonl.2').exists()
+    assert not (tmp_path / 'slow.jsonl.3').exists()
+    for rotated in (path, tmp_path / 'slow.jsonl.1'):
+        lines = [line for line in read_lines(rotated) if 'plan_id' in line]
+        assert 'plan' in lines[0] and all('plan' not in line for line in lines[1:])
@@ -0,0 +1,32 @@
+import pytest
+from core import db
+from core.libs import sqlite
+from tests import app
+
+
+def test_overrides_apply_on_top_of_profile():
+    pragmas = sqlite.get_pragmas('wal', 'busy_timeout = 10000, synchronous=full,')
+    assert pragmas == dict(sqlite.PROFILES['wal'], busy_timeout=10000, synchronous='FULL')
+
+
+@pytest.mark.parametrize('profile, overrides', [
+    ('fast', ''),
+    ('wal', 'page_size=4096'),
+    ('wal', 'journal_mode=WAL; DROP TABLE assignments'),
+    ('wal', 'mmap_size=lots'),
+    ('wal', 'busy_timeout'),
+])
+def test_invalid_pragmas_are_refused(profile, overrides):
+    with pytest.raises(ValueError):
+        sqlite.get_pragmas(profile, overrides)
+
+
+def test_connections_use_configured_profile():
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            for name, value in app.config['SQLITE_PRAGMAS'].items():
+                if name == 'journal_mode' or isinstance(value, int):
+                    assert str(connection.execute('PRAGMA {0}'.format(name)).fetchone()[0]).upper() == str(value)
+        finally:
+            connection.close()
@@ -1,5 +1,15 @@
-from core.models.assignments import Assignment
+import base64
+import hashlib
+import zlib
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+from core import db
+from core.models.assignments import Assignment, ContentBlob, CONTENT_PREVIEW_LENGTH
+from core.libs import compression
 from core.libs.exceptions import FyleError
+from core.libs.principal import AuthPrincipal
 
 def test_get_assignments_student_1(client, h_student_1):
     response = client.get(
@@ -149,3 +159,222 @@ def test_upsert_function_directly(client, h_student_1, mocker):
     result = Assignment.upsert(updated_assignment)
 
     assert result.content == "New Updated Content"
+
+def test_get_assignments_student_1_paginated(client, h_student_1):
+    for content in ['PAGE 1', 'PAGE 2', 'PAGE 3']:
+        client.post('/student/assignments', headers=h_student_1, json={'content': content})
+
+    response = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 2})
+    assert response.status_code == 200
+    first_page = response.json['data']
+    assert len(first_page) == 2
+    assert response.json['next_cursor'] is not None
+
+    response = client.get(
+        '/student/assignments',
+        headers=h_student_1,
+        query_string={'limit': 2, 'cursor': response.json['next_cursor']}
+    )
+    assert response.status_code == 200
+    second_page = response.json['data']
+    assert {a['id'] for a in first_page}.isdisjoint(a['id'] for a in second_page)
+    for assignment in second_page:
+        assert assignment['student_id'] == 1
+        assert (assignment['updated_at'], assignment['id']) > (first_page[-1]['updated_at'], first_page[-1]['id'])
+
+def test_bulk_submit_assignments(client, h_student_1):
+    draft_ids = []
+    for content in ['BULK 1', 'BULK 2']:
+        response = client.post('/student/assignments', headers=h_student_1, json={'content': content})
+        draft_ids.append(response.json['data']['id'])
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json={'assignments': [
+            {'id': draft_ids[0], 'teacher_id': 1},
+            {'id': draft_ids[1], 'teacher_id': 2},
+            {'id': 3, 'teacher_id': 2},
+            {'id': draft_ids[0], 'teacher_id': 2},
+            {'id': 99999, 'teacher_id': 1},
+        ]}
+    )
+    assert response.status_code == 200
+    results = response.json['data']
+    assert [result['success'] for result in results] == [True, True, False, False, False]
+    assert results[2]['message'] == 'This assignment belongs to some other student'
+    assert results[3]['message'] == 'assignment is repeated in this batch'
+    assert results[4]['message'] == 'No assignment with this id was found'
+
+    submitted = {a.id: a for a in Assignment.filter(Assignment.id.in_(draft_ids))}
+    assert (submitted[draft_ids[0]].state, submitted[draft_ids[0]].teacher_id) == ('SUBMITTED', 1)
+    assert (submitted[draft_ids[1]].state, submitted[draft_ids[1]].teacher_id) == ('SUBMITTED', 2)
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json={'assignments': [{'id': draft_ids[0], 'teacher_id': 1}]}
+    )
+    assert response.json['data'][0]['message'] == 'only a draft assignment can be submitted'
+
+
+def test_bulk_submit_unknown_teacher(client, h_student_1):
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': 'BULK 3'})
+    assignment_id = response.json['data']['id']
+
+    response = client.post(
+        '/student/assignments/submit/bulk',
+        headers=h_student_1,
+        json={'assignments': [{'id': assignment_id, 'teacher_id': 99999}]}
+    )
+    assert response.status_code == 200
+    assert response.json['data'][0]['message'] == 'No teacher with this id was found'
+    assert Assignment.get_by_id(assignment_id).state == 'DRAFT'
+
+
+def test_bulk_submit_reports_a_concurrently_submitted_assignment(update_after_first_read):
+    drafts = [Assignment(student_id=1, content='BULK RACE {0}'.format(i)) for i in range(2)]
+    db.session.add_all(drafts)
+    db.session.commit()
+    draft_ids = [draft.id for draft in drafts]
+
+    # another request submits the first one to teacher 2 once the batch was validated
+    update_after_first_read(draft_ids[0], state='SUBMITTED', teacher_id=2)
+    results = Assignment.submit_many(
+        [(draft_ids[0], 1), (draft_ids[1], 1)], AuthPrincipal(user_id=1, student_id=1)
+    )
+    db.session.commit()
+
+    assert [result['success'] for result in results] == [False, True]
+    assert results[0]['message'] == 'assignment was changed by another request, please retry'
+    assert Assignment.get_by_id(draft_ids[0]).teacher_id == 2
+    assert (Assignment.get_by_id(draft_ids[1]).state, Assignment.get_by_id(draft_ids[1]).teacher_id) == ('SUBMITTED', 1)
+
+
+def test_get_assignments_student_1_streamed(client, h_student_1):
+    paged = client.get('/student/assignments', headers=h_student_1, query_string={'limit': 1000})
+    response = client.get('/student/assignments', headers=h_student_1, query_string={'stream': 'true'})
+
+    assert response.status_code == 200
+    assert response.json == {'data': paged.json['data']}
+
+
+def test_upsert_stale_assignment(client, h_student_1):
+    """
+    An edit based on a read that another request has since changed is refused, not applied over it
+    """
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': 'STALE'})
+    assignment_id = response.json['data']['id']
+
+    assignment = Assignment.get_by_id(assignment_id)
+    db.session.expunge(assignment)
+    db.session.rollback()
+
+    # another worker submits it in the meantime
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(Assignment.__table__).where(Assignment.id == assignment_id).values(
+                state='SUBMITTED', teacher_id=1, version=Assignment.version + 1
+            )
+        )
+
+    db.session.add(assignment)
+    assignment.content = 'STALE EDIT'
+    with pytest.raises(StaleDataError):
+        db.session.flush()
+    db.session.rollback()
+
+    assert Assignment.get_by_id(assignment_id).content == 'STALE'
+
+
+def test_get_assignments_content_modes(client, h_student_1):
+    long_content = 'LONG ' * 100
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': long_content})
+    assignment_id = response.json['data']['id']
+
+    listings = {}
+    for content_mode in ['full', 'preview', 'none']:
+        response = client.get('/student/assignments', headers=h_student_1, query_string={'content': content_mode})
+        assert response.status_code == 200
+        listings[content_mode] = {a['id']: a for a in response.json['data']}
+
+    assert listings['full'][assignment_id]['content'] == long_content
+    assert listings['preview'][assignment_id]['content'] == long_content[:CONTENT_PREVIEW_LENGTH]
+    assert 'content' not in listings['none'][assignment_id]
+    assert listings['none'][assignment_id]['state'] == 'DRAFT'
+
+    response = client.get('/student/assignments', headers=h_student_1, query_string={'content': 'all'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'ValidationError'
+
+
+def test_edit_content_touches_assignment(client, h_student_1):
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': 'FIRST DRAFT'})
+    created = response.json['data']
+
+    response = client.post(
+        '/student/assignments',
+        headers=h_student_1,
+        json={'id': created['id'], 'content': 'SECOND DRAFT'}
+    )
+    assert response.status_code == 200
+    assert response.json['data']['content'] == 'SECOND DRAFT'
+    assert response.json['data']['updated_at'] > created['updated_at']
+    assert Assignment.get_by_id(created['id']).version == 2
+
+
+def test_same_content_is_stored_once(client, h_student_1, h_student_2):
+    shared_content = 'SHARED BOILERPLATE ' * 50
+    ids = []
+    for headers in [h_student_1, h_student_2]:
+        response = client.post('/student/assignments', headers=headers, json={'content': shared_content})
+        assert response.json['data']['content'] == shared_content
+        ids.append(response.json['data']['id'])
+
+    blob = ContentBlob.query.get(compression.content_hash(shared_content))
+    assert blob.ref_count == 2
+    assert blob.size == len(shared_content)
+    assert len(blob.data) < blob.size
+
+    # an edit moves the reference to a new blob
+    client.post('/student/assignments', headers=h_student_1, json={'id': ids[0], 'content': 'EDITED'})
+    db.session.expire_all()
+    assert ContentBlob.query.get(compression.content_hash(shared_content)).ref_count == 1
+    assert Assignment.get_by_id(ids[0]).content == 'EDITED'
+
+    # the last reference going away deletes the blob
+    Assignment.filter(Assignment.id.in_(ids)).delete(synchronize_session='fetch')
+    db.session.commit()
+    assert ContentBlob.query.get(compression.content_hash(shared_content)) is None
+    assert ContentBlob.query.get(compression.content_hash('EDITED')) is None
+
+
+def test_short_or_incompressible_content_is_stored_raw(client, h_student_1):
+    contents = {
+        'short': 'SHORT ANSWER',
+        'incompressible': base64.b64encode(hashlib.sha256(b'seed').digest() * 3).decode('ascii'),
+        'repetitive': 'REPEATED PARAGRAPH ' * 20,
+    }
+    ids = {}
+    for name, content in contents.items():
+        response = client.post('/student/assignments', headers=h_student_1, json={'content': content})
+        ids[name] = response.json['data']['id']
+
+    blobs = {name: ContentBlob.query.get(compression.content_hash(content)) for name, content in contents.items()}
+    for name in ('short', 'incompressible'):
+        assert blobs[name].data == compression.RAW_MARKER + contents[name].encode('utf8')
+    assert len(blobs['repetitive'].data) < blobs['repetitive'].size
+
+    # raw and compressed blobs read back alike, in Python and through inflate()
+    for name, content in contents.items():
+        db.session.expire_all()
+        assert Assignment.get_by_id(ids[name]).content == content
+        assert db.session.execute(
+            db.text('SELECT inflate(data) FROM content_blobs WHERE hash = :hash'), {'hash': blobs[name].hash}
+        ).scalar() == content
+
+    # blobs written before the raw marker are bare zlib streams
+    assert compression.decompress(zlib.compress(b'SHORT ANSWER')) == 'SHORT ANSWER'
+
+    Assignment.filter(Assignment.id.in_(ids.values())).delete(synchronize_session='fetch')
+    db.session.commit()
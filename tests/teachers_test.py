@@ -1,5 +1,9 @@
-from core.models.assignments import Assignment
+import pytest
+from sqlalchemy import event
+from core.models.assignments import Assignment, AssignmentGradeCount
 from core import db
+from core.apis.decorators import AuthPrincipal
+from core.libs.exceptions import FyleError
 def test_get_assignments_teacher_1(client, h_teacher_1):
     response = client.get(
         '/teacher/assignments',
@@ -148,15 +152,26 @@ def test_grade_assignment_success(client, h_teacher_1):
     db.session.commit()
 
     # Grade the assignment
-    response = client.post('/teacher/assignments/grade', json={
-        "assignment_id": assignment.id,
-        "grade": "A"
-    }, headers=h_teacher_1)
+    assignment_id = assignment.id
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=unused-argument,too-many-arguments
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.post('/teacher/assignments/grade', json={
+            "assignment_id": assignment_id,
+            "grade": "A"
+        }, headers=h_teacher_1)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
 
     # Validate the response
     assert response.status_code == 200
+    # the compare-and-set UPDATE is the first statement to read the assignment
+    assert next(s for s in statements if 'assignments' in s and 'assignment_grade_counts' not in s).startswith('UPDATE')
     data = response.json['data']
-    assert data['id'] == assignment.id
+    assert data['id'] == assignment_id
     assert data['grade'] == "A"
     assert data['state'] == "GRADED"
 
@@ -206,4 +221,185 @@ def test_grade_assignment_internal_error(client, h_teacher_1, mocker):
     assert response.status_code == 500
     data = response.json
     assert data["error"] == "InternalServerError"
-    assert "Database error" in data["message"]
\ No newline at end of file
+    assert "Database error" in data["message"]
+
+def test_list_assignments_last_page(client, h_teacher_1):
+    """
+    A page that holds every remaining assignment has no next cursor
+    """
+    response = client.get('/teacher/assignments', headers=h_teacher_1, query_string={'limit': 1000})
+
+    assert response.status_code == 200
+    assert response.json['next_cursor'] is None
+
+
+def test_bulk_grade_assignments(client, h_teacher_1):
+    """
+    Grades what can be graded and reports every other item with its reason
+    """
+    submitted = [
+        Assignment(student_id=1, teacher_id=1, content="Bulk assignment", state="SUBMITTED")
+        for _ in range(3)
+    ]
+    other_teacher = Assignment(student_id=1, teacher_id=2, content="Bulk assignment", state="SUBMITTED")
+    graded = Assignment(student_id=1, teacher_id=1, content="Bulk assignment", state="GRADED", grade="B")
+    db.session.add_all(submitted + [other_teacher, graded])
+    db.session.commit()
+    submitted_ids = [assignment.id for assignment in submitted]
+    other_teacher_id, graded_id = other_teacher.id, graded.id
+
+    response = client.post('/teacher/assignments/grade/bulk', json={
+        "assignments": [
+            {"id": submitted_ids[0], "grade": "A"},
+            {"id": submitted_ids[1], "grade": "B"},
+            {"id": submitted_ids[2], "grade": "A"},
+            {"id": other_teacher_id, "grade": "A"},
+            {"id": graded_id, "grade": "A"},
+            {"id": 999999, "grade": "A"},
+            {"id": submitted_ids[0], "grade": "C"},
+        ]
+    }, headers=h_teacher_1)
+
+    assert response.status_code == 200
+    results = response.json['data']
+    assert [result['success'] for result in results] == [True, True, True, False, False, False, False]
+    assert results[3]['message'] == 'This assignment is not assigned to the current teacher'
+    assert results[4]['message'] == 'only SUBMITTED assignments can be graded'
+    assert results[5]['message'] == 'No assignment with this id was found'
+    assert results[6]['message'] == 'assignment is repeated in this batch'
+
+    submitted = [Assignment.get_by_id(_id) for _id in submitted_ids]
+    assert [(a.state, a.grade) for a in submitted] == [('GRADED', 'A'), ('GRADED', 'B'), ('GRADED', 'A')]
+    assert Assignment.get_by_id(other_teacher_id).state == 'SUBMITTED'
+    assert Assignment.get_by_id(graded_id).grade == 'B'
+
+    # keep the graded counts the SQL tests rely on untouched
+    Assignment.filter(Assignment.id.in_(submitted_ids + [other_teacher_id, graded_id])).delete(synchronize_session='fetch')
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+
+
+def test_bulk_grade_reports_a_concurrently_graded_assignment(update_after_first_read):
+    """
+    An assignment graded by another request after the batch was validated is reported, and only
+    the grades actually written reach the grade counts
+    """
+    submitted = [Assignment(student_id=1, teacher_id=1, content="Bulk race", state="SUBMITTED") for _ in range(2)]
+    db.session.add_all(submitted)
+    db.session.commit()
+    submitted_ids = [assignment.id for assignment in submitted]
+    counts = AssignmentGradeCount.get_counts_by_teacher()[1]
+
+    # the principal grades the first one B in the meantime, its count is left to that request
+    update_after_first_read(submitted_ids[0], state='GRADED', grade='B')
+    results = Assignment.mark_grades(
+        [(submitted_ids[0], 'A'), (submitted_ids[1], 'A')], AuthPrincipal(user_id=3, teacher_id=1)
+    )
+    db.session.commit()
+
+    assert [result['success'] for result in results] == [False, True]
+    assert results[0]['message'] == 'assignment was changed by another request, please retry'
+    assert Assignment.get_by_id(submitted_ids[0]).grade == 'B'
+    after = AssignmentGradeCount.get_counts_by_teacher()[1]
+    assert (after['A'] - counts['A'], after['B'] - counts['B']) == (1, 0)
+
+    Assignment.filter(Assignment.id.in_(submitted_ids)).delete(synchronize_session='fetch')
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+
+
+def test_bulk_grade_assignments_invalid_payload(client, h_teacher_1):
+    response = client.post('/teacher/assignments/grade/bulk', json={
+        "assignments": [{"id": 1, "grade": "E"}]
+    }, headers=h_teacher_1)
+
+    assert response.status_code == 400
+    assert response.json['error'] == 'ValidationError'
+
+
+def test_list_assignments_streamed(client, h_teacher_2):
+    paged = client.get('/teacher/assignments', headers=h_teacher_2, query_string={'limit': 1000})
+    response = client.get('/teacher/assignments', headers=h_teacher_2, query_string={'stream': '1'})
+
+    assert response.status_code == 200
+    assert response.json == {'data': paged.json['data']}
+    for assignment in response.json['data']:
+        assert assignment['teacher_id'] == 2
+
+
+def test_mark_grade_tells_failures_apart():
+    """
+    A grade that does not apply changes nothing, and the error says which condition failed
+    """
+    assignment = Assignment(student_id=1, teacher_id=1, content="CAS assignment", state="SUBMITTED")
+    db.session.add(assignment)
+    db.session.commit()
+    assignment_id, version = assignment.id, assignment.version
+
+    with pytest.raises(FyleError) as error:
+        Assignment.mark_grade(_id=assignment_id, grade='A', auth_principal=AuthPrincipal(user_id=4, teacher_id=2))
+    assert error.value.message == 'This assignment is not assigned to the current teacher'
+
+    with pytest.raises(FyleError) as error:
+        Assignment.mark_grade(_id=999999, grade='A', auth_principal=AuthPrincipal(user_id=3, teacher_id=1))
+    assert error.value.status_code == 404
+
+    graded = Assignment.mark_grade(_id=assignment_id, grade='A', auth_principal=AuthPrincipal(user_id=3, teacher_id=1))
+    assert (graded.state, graded.grade, graded.version) == ('GRADED', 'A', version + 1)
+
+    with pytest.raises(FyleError) as error:
+        Assignment.mark_grade(_id=assignment_id, grade='B', auth_principal=AuthPrincipal(user_id=3, teacher_id=1))
+    assert error.value.message == 'Only SUBMITTED assignments can be graded'
+
+    db.session.rollback()
+    Assignment.filter(Assignment.id == assignment_id).delete(synchronize_session='fetch')
+    AssignmentGradeCount.rebuild()
+    db.session.commit()
+
+
+def test_list_assignments_without_content(client, h_teacher_1):
+    response = client.get('/teacher/assignments', headers=h_teacher_1, query_string={'content': 'none', 'stream': 'true'})
+    assert response.status_code == 200
+    data = response.json['data']
+    assert data
+    for assignment in data:
+        assert 'content' not in assignment
+        assert assignment['teacher_id'] == 1
+
+    # the fixture contents are shorter than a preview
+    full = client.get('/teacher/assignments', headers=h_teacher_1).json['data']
+    response = client.get('/teacher/assignments', headers=h_teacher_1, query_string={'content': 'preview'})
+    assert response.status_code == 200
+    assert response.json['data'] == full
+
+
+def test_list_assignments_not_modified(client, h_teacher_2, h_student_1, mocker):
+    response = client.get('/teacher/assignments', headers=h_teacher_2)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    # an unchanged listing is answered from the validator alone
+    get_page = mocker.patch('core.models.assignments.Assignment.get_page')
+    response = client.get('/teacher/assignments', headers={**h_teacher_2, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+    get_page.assert_not_called()
+    mocker.stopall()
+
+    # other query params are another response
+    response = client.get('/teacher/assignments', headers={**h_teacher_2, 'If-None-Match': etag}, query_string={'limit': 1})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    response = client.post('/student/assignments', headers=h_student_1, json={'content': 'ETAG'})
+    assignment_id = response.json['data']['id']
+    client.post('/student/assignments/submit', headers=h_student_1, json={'id': assignment_id, 'teacher_id': 2})
+
+    response = client.get('/teacher/assignments', headers={**h_teacher_2, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert assignment_id in [a['id'] for a in response.json['data']]
+
+    Assignment.filter(Assignment.id == assignment_id).delete(synchronize_session='fetch')
+    db.session.commit()